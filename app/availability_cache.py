@@ -0,0 +1,59 @@
+import os
+from datetime import datetime
+from cachetools import TTLCache
+from app import versions
+from app.calendar_sync import busy_digest
+
+CACHE_SIZE = int(os.getenv("AVAILABILITY_CACHE_SIZE", 4096))
+# upper bound on staleness for changes that bump no version
+# (an abandoned bulk claim expiring)
+CACHE_TTL = float(os.getenv("AVAILABILITY_CACHE_TTL", 300))
+
+# (provider_id, start, end, after, limit) -> (etag, encoded JSON body)
+_cache = TTLCache(maxsize=CACHE_SIZE, ttl=CACHE_TTL)
+stats = {"hits": 0, "misses": 0, "not_modified": 0, "stale": 0}
+
+Key = tuple[str, datetime, datetime, datetime | None, int | None]
+
+async def current_etag(provider_id: str) -> str:
+  """
+  Validator for every availability response of a provider: the Mongo
+  version (bumped by bookings, releases and the slot generator, shared by
+  all workers) plus a fingerprint of the cached Google busy time.
+  Read it before computing a response, so a change that lands mid-query
+  leaves the entry tagged with the older version.
+  """
+  current = await versions.get(provider_id)
+  return f'W/"{current["version"]}-{busy_digest(provider_id)}"'
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+  if if_none_match is None:
+    return False
+  if if_none_match.strip() == "*":
+    return True
+  # weak comparison: W/ prefixes are ignored
+  opaque = etag.removeprefix("W/")
+  return opaque in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
+def get(key: Key, etag: str) -> bytes | None:
+  entry = _cache.get(key)
+  if entry is None:
+    stats["misses"] += 1
+    return None
+  if entry[0] != etag:
+    stats["stale"] += 1
+    stats["misses"] += 1
+    return None
+  stats["hits"] += 1
+  return entry[1]
+
+def put(key: Key, etag: str, body: bytes):
+  _cache[key] = (etag, body)
+
+def cache_stats() -> dict:
+  total = stats["hits"] + stats["misses"]
+  return {
+    **stats,
+    "size": len(_cache),
+    "hit_ratio": stats["hits"] / total if total else 0.0,
+  }
@@ -0,0 +1,108 @@
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from pymongo import UpdateOne
+from app.db import mongo
+from app.utils import AEST, day_key
+
+# Free-slot counters per provider per clinic-local day,
+#   {"provider_id", "day": "YYYY-MM-DD", "free": int}
+# kept in step with the availability collection by whoever inserts or
+# deletes slots (seeding, claims, releases), so the date picker never has
+# to scan slots. rebuild() recomputes them from availability for repair.
+# Google busy time is not subtracted; these are the bookable slots in Mongo.
+summary = mongo.availability_summary
+# {"_id": "availability_summary", "built_at"} once the initial build ran
+migrations = mongo.migrations
+MARKER = "availability_summary"
+
+def local_midnight(day: date) -> datetime:
+  return datetime.combine(day, datetime.min.time(), tzinfo=AEST).astimezone(timezone.utc)
+
+def count_by_day(slots) -> Counter:
+  return Counter((slot["provider_id"], day_key(slot["start"])) for slot in slots)
+
+async def adjust(counts: Counter, sign: int = 1):
+  """Add (sign=1) or remove (sign=-1) slot counts, one bulk write."""
+  ops = [
+    UpdateOne(
+      {"provider_id": provider_id, "day": day},
+      {"$inc": {"free": sign * n}},
+      upsert=True
+    )
+    for (provider_id, day), n in counts.items() if n
+  ]
+  if ops:
+    await summary.bulk_write(ops, ordered=False)
+
+async def slots_added(slots):
+  await adjust(count_by_day(slots), 1)
+
+async def slots_removed(slots):
+  await adjust(count_by_day(slots), -1)
+
+async def fetch(provider_ids: list[str], first_day: str, last_day: str) -> dict[str, dict[str, int]]:
+  """{provider_id: {day: free}} for days in [first_day, last_day]."""
+  result = {pid: {} for pid in provider_ids}
+  async for doc in summary.find(
+    {"provider_id": {"$in": provider_ids}, "day": {"$gte": first_day, "$lte": last_day}},
+    {"_id": 0, "provider_id": 1, "day": 1, "free": 1}
+  ).sort("day", 1):
+    result[doc["provider_id"]][doc["day"]] = doc["free"]
+  return result
+
+async def rebuild(provider_ids: list[str], start: datetime, end: datetime) -> int:
+  """
+  Recompute the counters for slots starting in [start, end) from the
+  availability collection: zero the days in range, then one aggregation
+  groups slots by clinic-local day and $merges the counts back.
+  Returns how many (provider, day) counters were written.
+  """
+  await summary.update_many(
+    {"provider_id": {"$in": provider_ids}, "day": {"$gte": day_key(start), "$lt": day_key(end)}},
+    {"$set": {"free": 0}}
+  )
+  pipeline = [
+    {"$match": {
+      "provider_id": {"$in": provider_ids},
+      "start": {"$gte": start, "$lt": end},
+      # slots held by an unfinished bulk claim are not free
+      "claimed_until": {"$not": {"$gt": datetime.now(timezone.utc)}},
+    }},
+    {"$group": {
+      "_id": {
+        "provider_id": "$provider_id",
+        "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$start", "timezone": AEST.key}},
+      },
+      "free": {"$sum": 1},
+    }},
+    {"$project": {"_id": 0, "provider_id": "$_id.provider_id", "day": "$_id.day", "free": 1}},
+    {"$merge": {
+      "into": "availability_summary",
+      "on": ["provider_id", "day"],
+      "whenMatched": "merge",
+      "whenNotMatched": "insert",
+    }},
+  ]
+  await mongo.availability.aggregate(pipeline).to_list(None)
+  return await summary.count_documents(
+    {"provider_id": {"$in": provider_ids}, "day": {"$gte": day_key(start), "$lt": day_key(end)}}
+  )
+
+async def ensure_built(provider_ids: list[str], days_ahead: int) -> int | None:
+  """
+  The counters only follow changes, so slots that existed before them
+  (an existing deployment's generated horizon) were never counted. Build
+  them once from availability for today through days_ahead; the marker
+  records that this happened. Returns the counters written, or None when
+  they were already built.
+  """
+  if await migrations.find_one({"_id": MARKER}):
+    return None
+  today = datetime.now(AEST).date()
+  written = await rebuild(
+    provider_ids, local_midnight(today), local_midnight(today + timedelta(days=days_ahead + 1))
+  )
+  await migrations.update_one(
+    {"_id": MARKER}, {"$set": {"built_at": datetime.now(timezone.utc)}}, upsert=True
+  )
+  return written
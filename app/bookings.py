@@ -0,0 +1,104 @@
+import asyncio
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+from app.db import mongo
+from app.utils import to_utc
+from app.slots import claim_slots, release_slots
+from app.provider_registry import registry
+from app.mail_outbox import enqueue_appointment_emails
+from app import calendar_outbox, llm_cache, versions
+
+async def book_many(bookings: list[dict]) -> tuple[list[dict], list[dict]]:
+  """
+  Book many appointments at once: validate together, claim every slot
+  with bulk writes, insert appointments (with their pending calendar
+  sync) in one insert_many and queue all emails together; the calendar
+  outbox creates the Google events through the batch endpoint.
+
+  `bookings` are {"provider_id", "start", "end", "notes", "patient"}
+  dicts. Each item succeeds or fails on its own; returns one
+  {"appointment_id", "error"} per item, in order, and the claimed slots
+  that were given back (callers may offer them to the waitlist). Once
+  the appointments are saved nothing raises: later steps only log.
+  """
+  results: list[dict | None] = [None] * len(bookings)
+  def fail(i: int, error: str):
+    results[i] = {"appointment_id": None, "error": error}
+
+  # validate the whole batch up front
+  pending, seen = {}, set()
+  for i, booking in enumerate(bookings):
+    appt = dict(booking)
+    appt["start"], appt["end"] = to_utc(appt["start"]), to_utc(appt["end"])
+    provider = registry.get(appt["provider_id"])
+    key = (appt["provider_id"], appt["start"], appt["end"])
+    if provider is None:
+      fail(i, "Provider not found")
+    elif appt["start"] >= appt["end"]:
+      fail(i, "start must be before end")
+    elif key in seen:
+      fail(i, "Duplicate of an earlier item in this batch")
+    else:
+      seen.add(key)
+      appt["provider_name"] = provider["name"]
+      appt["_id"] = ObjectId()
+      appt.update(calendar_outbox.new_sync_state())
+      pending[i] = appt
+
+  # claim all requested slots with bulk writes
+  claimed = await claim_slots([
+    (a["provider_id"], a["start"], a["end"]) for a in pending.values()
+  ])
+  slots = {}
+  for i, appt in list(pending.items()):
+    slot = claimed.get((appt["provider_id"], appt["start"], appt["end"]))
+    if slot is None:
+      fail(i, "Slot is no longer available")
+      del pending[i]
+    else:
+      slots[i] = slot
+
+  # insert the appointments in one unordered write
+  if pending:
+    try:
+      await mongo.appointments.insert_many(list(pending.values()), ordered=False)
+    except BulkWriteError as e:
+      order = list(pending)
+      for err in e.details.get("writeErrors", []):
+        i = order[err["index"]]
+        fail(i, f"Failed to save appointment: {err.get('errmsg')}")
+        del pending[i]
+    except Exception as e:
+      # nothing is known to be saved: clean up and fail every item
+      await mongo.appointments.delete_many({"_id": {"$in": [a["_id"] for a in pending.values()]}})
+      for i in pending:
+        fail(i, f"Failed to save appointment: {e}")
+      pending = {}
+
+  # the Google events are created by the calendar outbox in batches
+  for i, appt in pending.items():
+    results[i] = {"appointment_id": str(appt["_id"]), "error": None}
+  if pending:
+    calendar_outbox.outbox.wake()
+
+  # give back every slot whose booking did not go through
+  released = [slot for i, slot in slots.items() if i not in pending]
+  try:
+    await release_slots(released)
+  except Exception as e:
+    # the bookings stand; the slots stay out of availability until re-seeded
+    print(f"⚠️ Releasing {len(released)} slots failed: {e}")
+    released = []
+
+  # invalidate caches, bump versions and queue all emails together
+  for appt in pending.values():
+    llm_cache.invalidate_slot(appt["provider_id"], appt["start"])
+  outcomes = await asyncio.gather(
+    versions.bump_many(a["provider_id"] for a in pending.values()),
+    enqueue_appointment_emails([(a["patient"]["email"], a) for a in pending.values()]),
+    return_exceptions=True,
+  )
+  for step, outcome in zip(("Version bump", "Email enqueue"), outcomes):
+    if isinstance(outcome, Exception):
+      print(f"⚠️ {step} failed after booking {len(pending)} appointments: {outcome}")
+  return results, released
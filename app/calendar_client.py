@@ -1,31 +1,224 @@
 import os
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
+import json
+import random
+import asyncio
+from uuid import uuid4
 from datetime import datetime
+from urllib.parse import quote
+import httpx
+from fastapi.concurrency import run_in_threadpool
+from app import metrics
 
 SCOPES = [
   "https://www.googleapis.com/auth/calendar.readonly",  # fetch existing events
   "https://www.googleapis.com/auth/calendar.events",    # create/update events
 ]
 
-# load service account credentials
-creds = service_account.Credentials.from_service_account_file(
-    os.getenv("GOOGLE_APPLICATION_CREDENTIALS"), scopes=SCOPES
-)
-service = build("calendar", "v3", credentials=creds)
+# point this at a local fake server to run without Google
+BASE_URL = os.getenv("GOOGLE_CALENDAR_BASE_URL", "https://www.googleapis.com")
+MAX_CONCURRENCY = int(os.getenv("GOOGLE_CALENDAR_MAX_CONCURRENCY", 10))
+MAX_RETRIES = int(os.getenv("GOOGLE_CALENDAR_MAX_RETRIES", 4))
+TIMEOUT = float(os.getenv("GOOGLE_CALENDAR_TIMEOUT", 10))
+# Google accepts up to 1000 calls per batch but recommends staying small
+BATCH_SIZE = 50
+RETRY_STATUSES = {429, 500, 502, 503, 504}
 
-# checks the provider's calendar and returns all available slots in the given window
+# service account credentials, loaded on first use (optional when using a
+# fake server); google-auth is only imported when they are needed
+_creds_file = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
+_creds = None
+
+_http: httpx.AsyncClient | None = None
+_semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+_token_lock = asyncio.Lock()
+
+class CalendarError(Exception):
+  def __init__(self, status: int, detail: str):
+    super().__init__(f"Google Calendar returned {status}: {detail}")
+    self.status = status
+    self.detail = detail
+
+def _client() -> httpx.AsyncClient:
+  # one pooled connection set shared by every call on this worker
+  global _http
+  if _http is None:
+    _http = httpx.AsyncClient(
+      base_url=BASE_URL,
+      timeout=TIMEOUT,
+      limits=httpx.Limits(
+        max_connections=MAX_CONCURRENCY,
+        max_keepalive_connections=MAX_CONCURRENCY
+      ),
+    )
+  return _http
+
+async def aclose():
+  global _http
+  if _http is not None:
+    await _http.aclose()
+    _http = None
+
+def _credentials():
+  global _creds
+  if _creds is None and _creds_file:
+    from google.oauth2 import service_account
+    _creds = service_account.Credentials.from_service_account_file(_creds_file, scopes=SCOPES)
+  return _creds
+
+async def _auth_headers() -> dict:
+  creds = _credentials()
+  if creds is None:
+    return {}
+  if not creds.valid:
+    async with _token_lock:
+      if not creds.valid:
+        from google.auth.transport.requests import Request
+        # token refresh is a blocking HTTP call, keep it off the loop
+        await run_in_threadpool(creds.refresh, Request())
+  return {"Authorization": f"Bearer {creds.token}"}
+
+def _backoff(attempt: int, resp: httpx.Response | None = None) -> float:
+  retry_after = resp.headers.get("Retry-After") if resp is not None else None
+  if retry_after and retry_after.isdigit():
+    return float(retry_after)
+  # exponential backoff with full jitter, capped at 32s
+  return random.uniform(0, min(32.0, 0.5 * 2 ** attempt))
+
+@metrics.timed("calendar", "request")
+async def _request(method: str, url: str, headers: dict | None = None, **kwargs) -> httpx.Response:
+  """
+  Send one request with bounded concurrency, retrying 429/5xx and
+  transport errors with backoff. Raises CalendarError on other failures.
+  """
+  for attempt in range(MAX_RETRIES + 1):
+    all_headers = {**(headers or {}), **await _auth_headers()}
+    try:
+      async with _semaphore:
+        resp = await _client().request(method, url, headers=all_headers, **kwargs)
+    except httpx.TransportError:
+      if attempt == MAX_RETRIES:
+        raise
+      await asyncio.sleep(_backoff(attempt))
+      continue
+    if resp.status_code in RETRY_STATUSES and attempt < MAX_RETRIES:
+      await asyncio.sleep(_backoff(attempt, resp))
+      continue
+    if resp.status_code >= 400:
+      raise CalendarError(resp.status_code, resp.text)
+    return resp
+
+def _events_path(calendar_id: str) -> str:
+  return f"/calendar/v3/calendars/{quote(calendar_id, safe='')}/events"
+
+def _iso(value) -> str:
+  return value.isoformat() if isinstance(value, datetime) else value
+
+# --- batch endpoint ---
+
+def _encode_batch(calls: list[tuple[str, str, dict | None]], boundary: str) -> bytes:
+  parts = []
+  for i, (method, path, body) in enumerate(calls):
+    payload = json.dumps(body) if body is not None else ""
+    parts.append(
+      f"--{boundary}\r\n"
+      "Content-Type: application/http\r\n"
+      f"Content-ID: <item-{i}>\r\n\r\n"
+      f"{method} {path} HTTP/1.1\r\n"
+      "Content-Type: application/json\r\n\r\n"
+      f"{payload}\r\n"
+    )
+  parts.append(f"--{boundary}--\r\n")
+  return "".join(parts).encode()
+
+def _decode_batch(resp: httpx.Response) -> dict[int, tuple[int, dict]]:
+  """
+  Map each Content-ID index to the (status, json body) of its sub-response.
+  A reply that is not multipart (e.g. a plain error page) raises a
+  CalendarError with a retryable 502 status.
+  """
+  ctype = resp.headers.get("Content-Type", "")
+  if "boundary=" not in ctype:
+    raise CalendarError(502, f"batch response is not multipart ({ctype or 'no Content-Type'}): {resp.text[:200]}")
+  boundary = ctype.split("boundary=", 1)[1].split(";", 1)[0].strip().strip('"')
+  results = {}
+  for part in resp.text.split(f"--{boundary}"):
+    part = part.strip()
+    if not part or part == "--":
+      continue
+    outer, _, inner = part.replace("\r\n", "\n").partition("\n\n")
+    content_id = next(
+      line.split(":", 1)[1].strip()
+      for line in outer.split("\n") if line.lower().startswith("content-id:")
+    )
+    index = int(content_id.strip("<>").rsplit("-", 1)[1])
+    status_line, _, rest = inner.partition("\n")
+    status = int(status_line.split()[1])
+    _, _, body = rest.partition("\n\n")
+    body = body.strip()
+    results[index] = (status, json.loads(body) if body else {})
+  return results
+
+async def _batch(calls: list[tuple[str, str, dict | None]]) -> list:
+  """
+  Run calls through Google's batch endpoint, BATCH_SIZE at a time.
+  Sub-requests failing with 429/5xx are retried in a later batch.
+  Returns, per call, the JSON body on success or a CalendarError.
+  """
+  results: list = [None] * len(calls)
+  pending = list(range(len(calls)))
+  for attempt in range(MAX_RETRIES + 1):
+    retry = []
+    for start in range(0, len(pending), BATCH_SIZE):
+      chunk = pending[start:start + BATCH_SIZE]
+      boundary = f"batch_{uuid4().hex}"
+      resp = await _request(
+        "POST", "/batch/calendar/v3",
+        content=_encode_batch([calls[i] for i in chunk], boundary),
+        headers={"Content-Type": f"multipart/mixed; boundary={boundary}"},
+      )
+      try:
+        decoded = _decode_batch(resp)
+      except CalendarError as e:
+        # unreadable reply: every call in the chunk gets the error (and a retry)
+        decoded = {pos: (e.status, {"error": e.detail}) for pos in range(len(chunk))}
+      for pos, i in enumerate(chunk):
+        status, body = decoded.get(pos, (500, {"error": "missing batch response"}))
+        if status < 400:
+          results[i] = body
+        elif status in RETRY_STATUSES and attempt < MAX_RETRIES:
+          retry.append(i)
+        else:
+          results[i] = CalendarError(status, json.dumps(body))
+    if not retry:
+      break
+    pending = retry
+    await asyncio.sleep(_backoff(attempt))
+  return results
+
+# --- calendar operations ---
+
+async def list_events(calendar_id: str, **params) -> dict:
+  # a single page of events.list; callers handle pageToken/syncToken
+  resp = await _request("GET", _events_path(calendar_id), params=params)
+  return resp.json()
+
+# checks the provider's calendar and returns all events in the given window
 # calendar_id : provider's calendar email or id
 # time_min, time_max : window to check availability
 async def fetch_google_availability(calendar_id: str, time_min: datetime, time_max: datetime):
-  # retrieve events in the given window
-  events = service.events().list(
-    calendarId=calendar_id,
-    timeMin=time_min.isoformat(),
-    timeMax=time_max.isoformat(),
-    singleEvents=True,
-    orderBy="startTime",
-  ).execute()
+  items = []
+  params = {
+    "timeMin": time_min.isoformat(),
+    "timeMax": time_max.isoformat(),
+    "singleEvents": "true",
+    "orderBy": "startTime",
+  }
+  while True:
+    page = await list_events(calendar_id, **params)
+    items.extend(page.get("items", []))
+    if "nextPageToken" not in page:
+      break
+    params["pageToken"] = page["nextPageToken"]
 
   # returning a list of dictionaries
   return [
@@ -34,62 +227,99 @@ async def fetch_google_availability(calendar_id: str, time_min: datetime, time_m
       "start": ev["start"]["dateTime"],
       "end": ev["end"]["dateTime"],
     }
-    for ev in events.get("items", [])
+    for ev in items
+    if "dateTime" in ev.get("start", {})
   ]
 
-# creates a new calendar event for the booked appointment in the given calendar id
-async def book_google_event(calendar_id: str, appointment: dict):
+def appointment_event_id(appointment: dict) -> str:
+  # Google event ids must be 5-1024 base32hex chars (0-9, a-v); an ObjectId's
+  # hex form already is one, so the appointment id doubles as the event id
+  # and retrying an insert can never create a second event
+  return str(appointment["_id"])
+
+def appointment_event_body(appointment: dict, event_id: str | None = None) -> dict:
   """
   Expects appointment to include:
     - 'patient': dict with field 'name'
     - 'start', 'end': datetime objects (or ISO strings)
     - 'notes': optional string description
   """
-  # Ensure start/end are ISO-formatted strings
-  start_val = appointment["start"]
-  end_val = appointment["end"]
-  start_iso = start_val.isoformat() if isinstance(start_val, datetime) else start_val
-  end_iso = end_val.isoformat() if isinstance(end_val, datetime) else end_val
-
   body = {
     "summary": f"Appointment with {appointment['patient']['name']}",
     "description": appointment.get("notes", ""),
-    "start": {"dateTime": start_iso},
-    "end": {"dateTime": end_iso},
+    "start": {"dateTime": _iso(appointment["start"])},
+    "end": {"dateTime": _iso(appointment["end"])},
   }
+  if event_id:
+    body["id"] = event_id
+  return body
 
+# creates a new calendar event for the booked appointment in the given calendar id
+async def book_google_event(calendar_id: str, appointment: dict):
   # insert the event and return the created event object (includes 'htmlLink')
-  event = service.events().insert(calendarId=calendar_id, body=body).execute()
-  return event
+  resp = await _request(
+    "POST", _events_path(calendar_id), json=appointment_event_body(appointment)
+  )
+  return resp.json()
+
+async def get_event(calendar_id: str, event_id: str) -> dict:
+  resp = await _request("GET", f"{_events_path(calendar_id)}/{quote(event_id, safe='')}")
+  return resp.json()
+
+def availability_event_body(slot: dict) -> dict:
+  # transparency='transparent' so it's treated as free time
+  return {
+    "summary": "Available slot",
+    "start": {"dateTime": _iso(slot["start"])},
+    "end": {"dateTime": _iso(slot["end"])},
+    "transparency": "transparent",
+  }
 
 async def create_availability_event(calendar_id: str, slot: dict):
   """
   Creates an 'Available' event on the provider's calendar.
-  Use transparency='transparent' so it's treated as free time.
   """
-  body = {
-    "summary": "Available slot",
-    "start": {"dateTime": slot["start"]},
-    "end": {"dateTime": slot["end"]},
-    "transparency": "transparent",
-  }
-  return service.events().insert(calendarId=calendar_id, body=body).execute()
+  resp = await _request(
+    "POST", _events_path(calendar_id), json=availability_event_body(slot)
+  )
+  return resp.json()
 
-async def delete_availability_event(calendar_id: str, slot: dict):
+async def batch_insert_events(events: list[tuple[str, dict]]) -> list:
   """
-  Finds any 'Available slot' events in the given window and removes them.
+  Insert many (calendar_id, event body) pairs via the batch endpoint.
+  Returns the created event or a CalendarError for each pair, in order.
   """
-  events = service.events().list(
-    calendarId=calendar_id,
-    timeMin=slot["start"],
-    timeMax=slot["end"],
-    singleEvents=True
-  ).execute().get("items", [])
-
-  for ev in events:
-    if ev.get("summary") == "Available slot":
-      service.events().delete(
-        calendarId=calendar_id,
-        eventId=ev["id"]
-      ).execute()
+  return await _batch([
+    ("POST", _events_path(calendar_id), body) for calendar_id, body in events
+  ])
 
+async def batch_delete_events(events: list[tuple[str, str]]) -> list:
+  # deletes (calendar_id, event_id) pairs; 404/410 mean already gone
+  results = await _batch([
+    ("DELETE", f"{_events_path(calendar_id)}/{quote(event_id, safe='')}", None)
+    for calendar_id, event_id in events
+  ])
+  return [
+    {} if isinstance(r, CalendarError) and r.status in (404, 410) else r
+    for r in results
+  ]
+
+async def delete_availability_event(calendar_id: str, slot: dict):
+  """
+  Finds any 'Available slot' events in the given window (every page) and
+  removes them.
+  """
+  params = {"timeMin": _iso(slot["start"]), "timeMax": _iso(slot["end"]), "singleEvents": "true"}
+  to_delete = []
+  while True:
+    page = await list_events(calendar_id, **params)
+    to_delete.extend(
+      (calendar_id, ev["id"])
+      for ev in page.get("items", [])
+      if ev.get("summary") == "Available slot"
+    )
+    if "nextPageToken" not in page:
+      break
+    params["pageToken"] = page["nextPageToken"]
+  if to_delete:
+    await batch_delete_events(to_delete)
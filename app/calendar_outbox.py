@@ -0,0 +1,58 @@
+import os
+import asyncio
+from app.db import mongo
+from app.outbox import Outbox
+from app.calendar_client import (
+  CalendarError, appointment_event_id, appointment_event_body,
+  batch_insert_events, get_event, delete_availability_event,
+)
+
+CALENDAR_SYNC_BATCH_SIZE = int(os.getenv("CALENDAR_SYNC_BATCH_SIZE", 50))
+CALENDAR_SYNC_MAX_ATTEMPTS = int(os.getenv("CALENDAR_SYNC_MAX_ATTEMPTS", 10))
+# also remove "Available slot" events covering booked times (off by default,
+# as before: only calendars that publish availability events need it)
+DELETE_AVAILABILITY_EVENTS = os.getenv("CALENDAR_DELETE_AVAILABILITY_EVENTS", "false").lower() == "true"
+
+# Appointments are pushed to Google after they are committed: each one
+# embeds its sync state under "calendar_sync" (written in the same insert,
+# so the booking and its pending sync are one atomic write) and this
+# worker creates the events in batches, writing event_id/event_link back.
+
+async def _event_for(appt: dict, result) -> dict | Exception:
+  event_id = appointment_event_id(appt)
+  if isinstance(result, CalendarError) and result.status == 409:
+    # an earlier attempt already created it: same id, so fetch the link
+    try:
+      result = await get_event(appt["provider_id"], event_id)
+    except CalendarError as e:
+      return e
+  if isinstance(result, Exception):
+    return result
+  return {"event_id": result.get("id", event_id), "event_link": result.get("htmlLink")}
+
+async def _cleanup(appt: dict, outcome):
+  if isinstance(outcome, Exception) or not DELETE_AVAILABILITY_EVENTS:
+    return outcome
+  try:
+    await delete_availability_event(appt["provider_id"], appt)
+  except Exception as e:
+    # the appointment event exists; retrying re-fetches it via the 409 path
+    return e
+  return outcome
+
+async def _push(appts: list[dict]) -> list:
+  results = await batch_insert_events([
+    (a["provider_id"], appointment_event_body(a, appointment_event_id(a))) for a in appts
+  ])
+  outcomes = await asyncio.gather(*(_event_for(a, r) for a, r in zip(appts, results)))
+  return await asyncio.gather(*(_cleanup(a, o) for a, o in zip(appts, outcomes)))
+
+outbox = Outbox(
+  mongo.appointments, _push, prefix="calendar_sync.",
+  batch_size=CALENDAR_SYNC_BATCH_SIZE, max_attempts=CALENDAR_SYNC_MAX_ATTEMPTS,
+  name="calendar sync"
+)
+
+def new_sync_state() -> dict:
+  # embedded in an appointment before it is inserted
+  return {"calendar_sync": outbox.new_state()}
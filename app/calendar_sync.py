@@ -0,0 +1,118 @@
+import os
+import asyncio
+import hashlib
+from datetime import datetime, date, time, timedelta, timezone
+from app.provider_registry import registry
+from app.calendar_client import list_events, CalendarError
+from app.utils import AEST, to_utc
+
+# seconds between incremental syncs; 0 disables the background refresh
+SYNC_INTERVAL = float(os.getenv("CALENDAR_SYNC_INTERVAL", 60))
+# events that ended this long ago are dropped from the cache
+RETENTION = timedelta(days=1)
+
+# provider_id -> {"events": {event_id: (start, end)}, "sync_token": str | None,
+#                 "digest": str}
+_calendars: dict[str, dict] = {}
+
+def _event_time(value: dict) -> datetime:
+  if "dateTime" in value:
+    return to_utc(value["dateTime"])
+  # all-day events block the whole clinic-local day
+  return datetime.combine(date.fromisoformat(value["date"]), time(), tzinfo=AEST).astimezone(timezone.utc)
+
+def _busy_interval(ev: dict) -> tuple[datetime, datetime] | None:
+  # cancelled and transparent ("Available slot") events do not block time
+  if ev.get("status") == "cancelled" or ev.get("transparency") == "transparent":
+    return None
+  if "start" not in ev or "end" not in ev:
+    return None
+  return _event_time(ev["start"]), _event_time(ev["end"])
+
+async def _read_changes(provider_id: str, params: dict, events: dict) -> tuple[bool, str | None]:
+  # applies every page of one events.list to `events`; returns
+  # (anything changed, nextSyncToken)
+  changed = False
+  while True:
+    page = await list_events(provider_id, **params)
+    for ev in page.get("items", []):
+      interval = _busy_interval(ev)
+      if interval is None:
+        changed |= events.pop(ev["id"], None) is not None
+      elif events.get(ev["id"]) != interval:
+        events[ev["id"]] = interval
+        changed = True
+    if "nextPageToken" not in page:
+      return changed, page.get("nextSyncToken")
+    params["pageToken"] = page["nextPageToken"]
+
+async def sync_provider(provider_id: str) -> bool:
+  """
+  Refresh one provider's busy intervals with an incremental events.list
+  using the stored syncToken, falling back to a full sync when there is
+  no token or Google answers 410 Gone. A full sync starts at the cache's
+  retention cutoff rather than the start of the calendar's history.
+  Returns True if anything changed.
+  """
+  state = _calendars.setdefault(provider_id, {"events": {}, "sync_token": None})
+  while True:
+    token = state["sync_token"]
+    events = dict(state["events"]) if token else {}
+    params = {"singleEvents": "true", "maxResults": 2500}
+    if token:
+      # the token carries the timeMin of the full sync that issued it
+      params["syncToken"] = token
+    else:
+      params["timeMin"] = (datetime.now(timezone.utc) - RETENTION).isoformat()
+    try:
+      changed, state["sync_token"] = await _read_changes(provider_id, params, events)
+    except CalendarError as e:
+      if e.status == 410 and token:
+        # sync token expired: throw the cache away and start over
+        state["sync_token"] = None
+        continue
+      raise
+    changed |= not token
+    break
+
+  cutoff = datetime.now(timezone.utc) - RETENTION
+  state["events"] = {k: v for k, v in events.items() if v[1] > cutoff}
+  if changed:
+    state["digest"] = _digest(state["events"])
+  return changed
+
+def _digest(events: dict) -> str:
+  # content hash, so workers holding the same busy time agree on it
+  intervals = sorted(f"{s.isoformat()}/{e.isoformat()}" for s, e in events.values())
+  return hashlib.sha256("|".join(intervals).encode()).hexdigest()[:12]
+
+def busy_digest(provider_id: str) -> str:
+  """Fingerprint of the provider's cached busy time, for response caches."""
+  return _calendars.get(provider_id, {}).get("digest", "none")
+
+def busy_intervals(provider_id: str, start: datetime, end: datetime) -> list[dict]:
+  """Cached Google busy time overlapping [start, end), in filter_conflicts shape."""
+  events = _calendars.get(provider_id, {}).get("events", {})
+  return [
+    {"start": s, "end": e}
+    for s, e in events.values()
+    if s < end and e > start
+  ]
+
+async def sync_all() -> list[str]:
+  # returns the providers whose busy time changed
+  changed = []
+  for provider_id in registry.ids():
+    try:
+      if await sync_provider(provider_id):
+        changed.append(provider_id)
+    except Exception as e:
+      # keep serving the last known busy time
+      print(f"⚠️ Calendar sync failed for {provider_id}: {e}")
+  return changed
+
+async def run_sync_loop():
+  # refreshes every provider forever; started from main.lifespan
+  while True:
+    await sync_all()
+    await asyncio.sleep(SYNC_INTERVAL)
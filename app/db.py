@@ -1,13 +1,182 @@
 import os
+import asyncio
+from datetime import datetime, timezone
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, monitoring
+from pymongo.errors import OperationFailure
 from dotenv import load_dotenv
 import certifi
+from app import metrics
 
 load_dotenv()
 
-client = AsyncIOMotorClient(
-  os.getenv("MONGO_URI"),
-  tls=True,
-  tlsCAFile=certifi.where()
-)
-mongo = client.scheduler_db
+class _QueryTimer(monitoring.CommandListener):
+  # every Motor query, timed by the driver itself; Motor runs PyMongo on a
+  # thread pool with the caller's context copied, so requests see it too
+  def started(self, event):
+    pass
+
+  def succeeded(self, event):
+    metrics.observe("mongo", event.command_name, event.duration_micros / 1e6)
+
+  def failed(self, event):
+    metrics.observe("mongo", event.command_name, event.duration_micros / 1e6, error=True)
+
+# Atlas needs TLS; MONGO_TLS=false for a plain local mongod
+MONGO_TLS = os.getenv("MONGO_TLS", "true").lower() == "true"
+DB_NAME = "scheduler_db"
+# delivered mail (patient name, email, appointment time) is deleted after this
+MAIL_RETENTION_DAYS = float(os.getenv("MAIL_OUTBOX_RETENTION_DAYS", 7))
+
+_client: AsyncIOMotorClient | None = None
+
+def get_client() -> AsyncIOMotorClient:
+  """
+  The Motor client, created on first use rather than at import: a
+  mongodb+srv URI is resolved when the client is built, which would
+  otherwise slow every worker's import and fail it when DNS is down.
+  """
+  global _client
+  if _client is None:
+    tls_options = {"tls": True, "tlsCAFile": certifi.where()} if MONGO_TLS else {"tls": False}
+    # tz_aware so dates come back as UTC datetimes instead of naive ones
+    _client = AsyncIOMotorClient(
+      os.getenv("MONGO_URI"),
+      **tls_options,
+      tz_aware=True,
+      tzinfo=timezone.utc,
+      event_listeners=[_QueryTimer()]
+    )
+  return _client
+
+def close_client():
+  global _client
+  if _client is not None:
+    _client.close()
+    _client = None
+  # collections bound to the old client are looked up again on next use
+  for collection in vars(mongo).values():
+    collection._collection = None
+
+class _LazyCollection:
+  # stands in for a Motor collection until the first call on it
+  __slots__ = ("_name", "_collection")
+
+  def __init__(self, name: str):
+    self._name = name
+    self._collection = None
+
+  def __getattr__(self, attr):
+    if self._collection is None:
+      self._collection = get_client()[DB_NAME][self._name]
+    return getattr(self._collection, attr)
+
+class _LazyDatabase:
+  # `mongo.availability` etc. can be bound at import time without a client
+  def __getattr__(self, name: str) -> _LazyCollection:
+    if name.startswith("_"):
+      raise AttributeError(name)
+    collection = _LazyCollection(name)
+    setattr(self, name, collection)
+    return collection
+
+mongo = _LazyDatabase()
+
+async def ping(timeout: float = 2.0) -> bool:
+  try:
+    await asyncio.wait_for(get_client().admin.command("ping"), timeout)
+    return True
+  except Exception:
+    return False
+
+async def ensure_indexes():
+  """Create the range indexes used by the window-bounded queries."""
+  for coll in (mongo.availability, mongo.appointments):
+    await coll.create_index(
+      [("provider_id", ASCENDING), ("start", ASCENDING), ("end", ASCENDING)]
+    )
+  # one slot per provider per start time; seeding upserts on this key
+  await mongo.availability.create_index(
+    [("provider_id", ASCENDING), ("start", ASCENDING)], unique=True
+  )
+  # bulk claims read back and delete their slots by token
+  await mongo.availability.create_index("claim", sparse=True)
+  await mongo.providers.create_index("id", unique=True)
+  # outbox polling: due documents and lease lookups
+  await mongo.mail_outbox.create_index([("status", ASCENDING), ("next_attempt_at", ASCENDING)])
+  await mongo.mail_outbox.create_index("lease", sparse=True)
+  # TTL on done_at: only delivered mail expires, dead letters stay for inspection
+  retention = int(MAIL_RETENTION_DAYS * 86400)
+  try:
+    await mongo.mail_outbox.create_index("done_at", expireAfterSeconds=retention)
+  except OperationFailure as e:
+    if e.code != 85:  # IndexOptionsConflict
+      raise
+    # retention changed since the index was built: update it in place
+    await get_client()[DB_NAME].command(
+      "collMod", "mail_outbox",
+      index={"keyPattern": {"done_at": 1}, "expireAfterSeconds": retention}
+    )
+  # calendar outbox state embedded in appointments
+  await mongo.appointments.create_index(
+    [("calendar_sync.status", ASCENDING), ("calendar_sync.next_attempt_at", ASCENDING)], sparse=True
+  )
+  await mongo.appointments.create_index("calendar_sync.lease", sparse=True)
+  # one free-slot counter per provider per day ($merge target of the rebuild)
+  await mongo.availability_summary.create_index(
+    [("provider_id", ASCENDING), ("day", ASCENDING)], unique=True
+  )
+
+def overlapping(provider_id: str, start: datetime, end: datetime) -> dict:
+  # appointments that overlap [start, end) for the given provider
+  return {
+    "provider_id": provider_id,
+    "start": {"$lt": end},
+    "end":   {"$gt": start}
+  }
+
+def within(provider_id: str, start: datetime, end: datetime) -> dict:
+  # availability slots that lie fully inside [start, end]
+  return {
+    "provider_id": provider_id,
+    "start": {"$gte": start},
+    "end":   {"$lte": end}
+  }
+
+def free_slots_pipeline(provider_ids: list[str], start: datetime, end: datetime) -> list[dict]:
+  """
+  Aggregation over availability that returns, for every listed provider,
+  the slots inside [start, end] not overlapped by an appointment.
+  Appointments are joined with a window-bounded $lookup, so a single
+  query replaces one availability + one appointments query per provider.
+  """
+  return [
+    {"$match": {
+      "provider_id": {"$in": provider_ids},
+      "start": {"$gte": start},
+      "end":   {"$lte": end}
+    }},
+    {"$lookup": {
+      "from": "appointments",
+      "let": {"pid": "$provider_id", "s": "$start", "e": "$end"},
+      "pipeline": [
+        # constant bounds first so the (provider_id, start, end) index applies
+        {"$match": {
+          "provider_id": {"$in": provider_ids},
+          "start": {"$lt": end},
+          "end":   {"$gt": start}
+        }},
+        {"$match": {"$expr": {"$and": [
+          {"$eq": ["$provider_id", "$$pid"]},
+          {"$lt": ["$start", "$$e"]},
+          {"$gt": ["$end", "$$s"]}
+        ]}}},
+        {"$limit": 1},
+        {"$project": {"_id": 1}}
+      ],
+      "as": "clash"
+    }},
+    {"$match": {"clash": {"$size": 0}}},
+    {"$project": {"_id": 0, "provider_id": 1, "start": 1, "end": 1}},
+    {"$sort": {"start": 1, "provider_id": 1}}
+  ]
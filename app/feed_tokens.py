@@ -0,0 +1,31 @@
+import os
+import sys
+import hmac
+import hashlib
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Calendar feeds carry patient names and visit reasons, so each provider's
+# feed URL includes a token derived from this secret; without it set every
+# feed is off. Rotating the secret revokes all feed URLs at once.
+FEED_SECRET = os.getenv("ICS_FEED_SECRET", "")
+
+def feed_token(provider_id: str) -> str:
+  return hmac.new(FEED_SECRET.encode(), provider_id.encode(), hashlib.sha256).hexdigest()[:32]
+
+def token_valid(provider_id: str, token: str | None) -> bool:
+  if not FEED_SECRET or not token:
+    return False
+  return hmac.compare_digest(feed_token(provider_id), token)
+
+def feed_path(provider_id: str) -> str:
+  return f"/providers/{provider_id}/calendar.ics?token={feed_token(provider_id)}"
+
+if __name__ == "__main__":
+  # print the subscription path to hand to each provider
+  #   python -m app.feed_tokens dr.smith@example.com ...
+  if not FEED_SECRET:
+    sys.exit("Set ICS_FEED_SECRET first")
+  for provider_id in sys.argv[1:]:
+    print(feed_path(provider_id))
@@ -0,0 +1,84 @@
+import os
+import json
+import hashlib
+from collections import defaultdict
+from datetime import datetime
+from cachetools import TTLCache
+
+CACHE_SIZE = int(os.getenv("RECOMMEND_CACHE_SIZE", 1024))
+CACHE_TTL = float(os.getenv("RECOMMEND_CACHE_TTL", 600))
+
+# (provider_id, start) -> keys of cached entries that offered that slot
+_by_slot: dict[tuple[str, datetime], set[str]] = defaultdict(set)
+stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+def _forget(key: str, slot_keys):
+  for slot_key in slot_keys:
+    keys = _by_slot.get(slot_key)
+    if keys is not None:
+      keys.discard(key)
+      if not keys:
+        del _by_slot[slot_key]
+
+class _RecommendationCache(TTLCache):
+  # TTLCache evicts expired entries first, then least recently used ones;
+  # both paths also drop the entry from the slot index
+  def popitem(self):
+    key, (slot_keys, value) = super().popitem()
+    _forget(key, slot_keys)
+    return key, (slot_keys, value)
+
+  def expire(self, time=None):
+    expired = super().expire(time)
+    for key, (slot_keys, _) in expired:
+      _forget(key, slot_keys)
+    return expired
+
+# key -> (slot keys, recommendations)
+_cache = _RecommendationCache(maxsize=CACHE_SIZE, ttl=CACHE_TTL)
+
+def cache_key(patient: dict, slots: list[dict]) -> str:
+  """
+  Canonical hash of the patient's preferences/conditions and the exact
+  free-slot set; key order and slot order do not matter.
+  """
+  canonical = json.dumps({
+    "preferences": dict(sorted(patient.get("preferences", {}).items())),
+    "conditions": patient.get("conditions", "").strip().lower(),
+    "slots": sorted(
+      (s["provider_id"], s["start"].isoformat(), s["end"].isoformat())
+      for s in slots
+    ),
+  }, separators=(",", ":"))
+  return hashlib.sha256(canonical.encode()).hexdigest()
+
+def get(key: str):
+  entry = _cache.get(key)
+  if entry is None:
+    stats["misses"] += 1
+    return None
+  stats["hits"] += 1
+  return entry[1]
+
+def put(key: str, slots: list[dict], value):
+  slot_keys = [(s["provider_id"], s["start"]) for s in slots]
+  _cache[key] = (slot_keys, value)
+  for slot_key in slot_keys:
+    _by_slot[slot_key].add(key)
+
+def invalidate_slot(provider_id: str, start: datetime):
+  # drop every cached recommendation that was built from this slot
+  for key in list(_by_slot.get((provider_id, start), ())):
+    entry = _cache.pop(key, None)
+    if entry is not None:
+      _forget(key, entry[0])
+      stats["invalidations"] += 1
+  _by_slot.pop((provider_id, start), None)
+
+def cache_stats() -> dict:
+  total = stats["hits"] + stats["misses"]
+  return {
+    **stats,
+    "size": len(_cache),
+    "hit_ratio": stats["hits"] / total if total else 0.0,
+  }
@@ -1,42 +1,216 @@
-import os, re, json
-from openai import OpenAI
-from fastapi.concurrency import run_in_threadpool
+import os, re, json, time, asyncio
+from collections import deque
+from app import llm_cache, metrics
+from app.ranking import rank_slots, encode_slots, fallback_recommendations
 
-# instantiate the new client
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# LLM_ENABLED=false (or no API key, see llm_available) makes the local
+# ranker answer alone
+LLM_ENABLED = os.getenv("LLM_ENABLED", "true").lower() != "false"
+# per-call deadline (queueing included) and cap on concurrent upstream calls
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 8))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))
+
+# the async client is built on first use (OPENAI_BASE_URL points it at a
+# fake server); without an API key recommendations use the ranker alone
+_client = None
+
+def _openai():
+  global _client
+  if _client is None:
+    from openai import AsyncOpenAI
+    _client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+  return _client
+
+def llm_available() -> bool:
+  return LLM_ENABLED and bool(os.getenv("OPENAI_API_KEY"))
+
+_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+# cache key -> task of the upstream call identical requests are sharing
+_inflight: dict[str, asyncio.Task] = {}
+_latencies = deque(maxlen=1000)
+_counters = {"calls": 0, "coalesced": 0, "failures": 0, "waiting": 0, "in_flight": 0}
+
+def llm_stats() -> dict:
+  recent = sorted(_latencies)
+  def pct(p):
+    return round(recent[min(len(recent) - 1, int(p * len(recent)))], 1) if recent else None
+  return {
+    **_counters,
+    "latency_ms": {"p50": pct(0.50), "p95": pct(0.95), "max": pct(1.0)},
+  }
 
 PROMPT = """
 You are a healthcare scheduler.
 Patient profile:
 {patient}
 
-Available slots:
+Candidate slots (pre-filtered; s1 is the best match, s2 the next, …):
 {slots}
 
-Suggest up to 3 optimal appointment times as JSON. Respond with ONLY a JSON array (no prose, no code fences):
-[{{"start":"…","end":"…","reason":"…"}}, …]
+Pick up to 3 optimal appointment slots. Respond with ONLY a JSON array (no prose, no code fences):
+[{{"id":"s1","reason":"…"}}, …]
 """
 
-async def recommend_slots(patient: dict, slots: list[dict]) -> str:
-  # formatting the prompt with patient and slot data
-  content = PROMPT.format(patient=patient, slots=slots)
-  # calling OpenAI asynchronously
-  resp = await run_in_threadpool(
-    client.chat.completions.create,
-    model="gpt-4o-mini",
-    messages=[{"role": "user", "content": content}],
-    max_tokens=300,
-  )
-  raw = resp.choices[0].message.content
+@metrics.timed("recommend")
+async def recommend_slots(patient: dict, slots: list[dict]) -> list[dict]:
+  if not isinstance(patient, dict):
+    patient = patient.model_dump()
+  # identical profile + identical free slots -> reuse the earlier answer
+  key = llm_cache.cache_key(patient, slots)
+  cached = llm_cache.get(key)
+  if cached is not None:
+    return cached
 
+  preferences = patient.get("preferences", {})
+  ranked = rank_slots(preferences, slots)
+  if not ranked or not llm_available():
+    return fallback_recommendations(preferences, ranked)
+
+  # identical concurrent requests share one upstream call
+  task = _inflight.get(key)
+  if task is None:
+    task = asyncio.ensure_future(_ask_and_cache(key, patient, slots, ranked))
+    _inflight[key] = task
+    task.add_done_callback(lambda _: _inflight.pop(key, None))
+  else:
+    _counters["coalesced"] += 1
+  try:
+    # shielded so one caller going away does not cancel the others
+    return await asyncio.shield(task)
+  except Exception as e:
+    # timeouts, API errors or unusable output: the ranker answers on its own
+    print(f"⚠️ LLM recommendation failed, using ranked fallback: {e}")
+    return fallback_recommendations(preferences, ranked)
+
+async def _ask_and_cache(key: str, patient: dict, slots: list[dict], ranked: list[dict]) -> list[dict]:
+  try:
+    suggestions = await _ask_llm(patient, ranked)
+  except Exception:
+    _counters["failures"] += 1
+    raise
+  llm_cache.put(key, slots, suggestions)
+  return suggestions
+
+def _parse_choices(raw: str) -> list[dict]:
   # extract JSON array
   # look for a standalone array; if fences exist, strip them
   m = re.search(r"(\[\s*(?:.|\s)*\])", raw)
   json_text = m.group(1) if m else raw.strip()
-
-  # 4) Parse and return
   try:
     return json.loads(json_text)
   except json.JSONDecodeError:
     # in case the model still hallucinates extra text, try a looser strip
     return json.loads(raw.strip())
+
+@metrics.timed("openai", "chat.completions")
+async def _complete(content: str) -> str:
+  """
+  One chat completion under the concurrency cap. LLM_TIMEOUT is a deadline
+  for the whole call, so time spent queueing shortens the request timeout.
+  The semaphore is only released by the `async with` that acquired it, so
+  a timeout can never leak a permit.
+  """
+  _counters["waiting"] += 1
+  queued = True
+  try:
+    async with asyncio.timeout(LLM_TIMEOUT):
+      async with _semaphore:
+        _counters["waiting"] -= 1
+        queued = False
+        _counters["in_flight"] += 1
+        _counters["calls"] += 1
+        started = time.perf_counter()
+        try:
+          resp = await _openai().chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[{"role": "user", "content": content}],
+            max_tokens=300,
+          )
+          return resp.choices[0].message.content
+        finally:
+          _counters["in_flight"] -= 1
+          _latencies.append((time.perf_counter() - started) * 1000)
+  finally:
+    if queued:
+      _counters["waiting"] -= 1
+
+async def _ask_llm(patient: dict, ranked: list[dict]) -> list[dict]:
+  # only the scheduling-relevant profile goes to the model (and into the
+  # cache key), so cached answers never carry another patient's name
+  profile = {
+    "preferences": patient.get("preferences", {}),
+    "conditions": patient.get("conditions", ""),
+  }
+  # formatting the prompt with the compact per-day slot encoding
+  encoded, ids = encode_slots(ranked)
+  content = PROMPT.format(patient=profile, slots=encoded)
+  # calling OpenAI asynchronously
+  choices = _parse_choices(await _complete(content))
+
+  # map short ids back to the real slots, ignoring unknown/repeated ids
+  suggestions, seen = [], set()
+  for choice in choices:
+    slot = ids.get(str(choice.get("id", "")))
+    if slot is None or choice["id"] in seen:
+      continue
+    seen.add(choice["id"])
+    suggestions.append({
+      "start": slot["start"],
+      "end": slot["end"],
+      "reason": choice.get("reason", ""),
+    })
+  if not suggestions:
+    raise ValueError(f"no usable slot ids in LLM reply: {choices!r}")
+  return suggestions[:3]
+
+ALLOCATE_PROMPT = """
+You are a healthcare scheduler filling freed appointment slots from a waitlist.
+Slots:
+{slots}
+
+Patients, each with the slots that suit them about equally well (first listed is the current pick):
+{patients}
+
+Choose one slot per patient, never the same slot for two patients. Respond with ONLY a JSON array (no prose, no code fences):
+[{{"patient":"p1","id":"s1"}}, …]
+"""
+
+async def allocate_ties(cases: list[tuple[dict, list[dict]]]) -> list[dict | None]:
+  """
+  One completion that breaks ties for many waitlisted patients at once.
+  `cases` are (patient, near-equal slot options); returns the chosen slot
+  per case, or None where the reply gave nothing usable. Slots picked twice
+  go to the first patient that asked; callers still enforce uniqueness.
+  """
+  options = sorted(
+    {(s["provider_id"], s["start"]): s for _, opts in cases for s in opts}.values(),
+    key=lambda s: s["start"]
+  )
+  encoded, ids = encode_slots(options)
+  slot_ids = {(s["provider_id"], s["start"]): sid for sid, s in ids.items()}
+  lines = []
+  for i, (patient, opts) in enumerate(cases):
+    # scheduling-relevant profile only, as for single recommendations
+    profile = {"preferences": patient.get("preferences", {}), "conditions": patient.get("conditions", "")}
+    choices = ", ".join(slot_ids[(s["provider_id"], s["start"])] for s in opts)
+    lines.append(f"p{i + 1} {json.dumps(profile)}: {choices}")
+  content = ALLOCATE_PROMPT.format(slots=encoded, patients="\n".join(lines))
+  reply = _parse_choices(await _complete(content))
+
+  picks: list[dict | None] = [None] * len(cases)
+  taken = set()
+  for choice in reply:
+    try:
+      i = int(str(choice.get("patient", "")).lstrip("p")) - 1
+    except ValueError:
+      continue
+    slot = ids.get(str(choice.get("id", "")))
+    if not 0 <= i < len(cases) or slot is None or picks[i] is not None:
+      continue
+    key = (slot["provider_id"], slot["start"])
+    # only one of the patient's own options, and each slot once
+    if key in taken or all((s["provider_id"], s["start"]) != key for s in cases[i][1]):
+      continue
+    taken.add(key)
+    picks[i] = slot
+  return picks
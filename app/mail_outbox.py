@@ -0,0 +1,66 @@
+import os
+import asyncio
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from app.db import mongo
+from app.outbox import Outbox
+from app.utils_mail import SmtpSession, build_appointment_message
+
+MAIL_BATCH_SIZE = int(os.getenv("MAIL_BATCH_SIZE", 50))
+MAIL_MAX_ATTEMPTS = int(os.getenv("MAIL_MAX_ATTEMPTS", 8))
+
+# smtplib is blocking: all sends run on one dedicated thread that owns the
+# connection, so web requests never wait on SMTP and never share its thread
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="smtp")
+_session = SmtpSession()
+
+def _email_payload(to_email: str, appt: dict) -> dict:
+  # only what build_appointment_message needs, snapshotted at booking time
+  return {
+    "to": to_email,
+    "appt": {
+      "provider_name": appt["provider_name"],
+      "patient": {"name": appt["patient"]["name"]},
+      "start": appt["start"],
+      "end": appt["end"],
+      "notes": appt.get("notes", ""),
+    },
+    "created_at": datetime.now(timezone.utc),
+  }
+
+def _send_all(docs: list[dict]) -> list:
+  outcomes = []
+  for doc in docs:
+    try:
+      _session.send(build_appointment_message(doc["to"], doc["appt"]))
+      outcomes.append(None)
+    except Exception as e:
+      # drop the connection so the next message starts from a clean one
+      _session.close()
+      outcomes.append(e)
+  return outcomes
+
+async def _deliver(docs: list[dict]) -> list:
+  loop = asyncio.get_running_loop()
+  return await loop.run_in_executor(_executor, _send_all, docs)
+
+outbox = Outbox(
+  mongo.mail_outbox, _deliver,
+  batch_size=MAIL_BATCH_SIZE, max_attempts=MAIL_MAX_ATTEMPTS, name="mail outbox"
+)
+
+async def enqueue_appointment_emails(items: list[tuple[str, dict]]):
+  """Queue confirmation emails for (to_email, appointment) pairs."""
+  if not items:
+    return
+  await mongo.mail_outbox.insert_many([
+    {**_email_payload(to_email, appt), **outbox.new_state()}
+    for to_email, appt in items
+  ])
+  outbox.wake()
+
+async def enqueue_appointment_email(to_email: str, appt: dict):
+  await enqueue_appointment_emails([(to_email, appt)])
+
+async def shutdown():
+  await asyncio.get_running_loop().run_in_executor(_executor, _session.close)
@@ -1,30 +1,42 @@
 import os
-from fastapi import FastAPI
+import time
+# cold-start clock: covers importing the app as well as the lifespan work
+_process_started = time.perf_counter()
+import asyncio
+from fastapi import Depends, FastAPI
 from dotenv import load_dotenv
-from app.routes import availability, recommend, booking
+from app.routes import availability, recommend, booking, providers, health, metrics as metrics_route
+from app.routes import waitlist as waitlist_route
+from app import calendar_client, calendar_outbox, calendar_sync, mail_outbox, slot_generator, metrics, waitlist
+from app import availability_summary
 from contextlib import asynccontextmanager
-from app.db import mongo
+from app.db import ensure_indexes, close_client
+from app.migrations import migrate_iso_dates
 from app.sample_data import sample_providers
-from app.utils import generate_monthly_slots
+from app.seeding import seed_providers
+from app.provider_registry import registry
 
 load_dotenv()
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-  # --- STARTUP: seed data once ---
-  # providers
-  if await mongo.providers.count_documents({}) == 0:
-    await mongo.providers.insert_many(sample_providers)
-
-  # seed availability slots throughout the month
-  monthly_slots = generate_monthly_slots(sample_providers)
-  if await mongo.availability.count_documents({}) == 0:
-    for slot in monthly_slots:
-      try:
-        # insert into Mongo
-        await mongo.availability.insert_one(slot)
-      except Exception as e:
-        print(f"⚠️ Rolled back availability for {slot['provider_id']} at {slot['start']}: {e}")
+# seconds a worker may take from import to ready before we warn about it
+STARTUP_BUDGET = float(os.getenv("STARTUP_BUDGET_SECONDS", 5))
+# how long startup waits on Mongo before serving (not ready) and retrying
+STARTUP_DB_TIMEOUT = float(os.getenv("STARTUP_DB_TIMEOUT", 10))
+
+async def prepare_database():
+  # convert legacy ISO-string dates, then build the range indexes
+  migrated = await migrate_iso_dates()
+  if migrated:
+    print(f"Migrated {migrated} documents to UTC dates")
+  await ensure_indexes()
+  await waitlist.ensure_indexes()
+  # providers are upserts, so only missing documents are written
+  await seed_providers(sample_providers)
+  await registry.load()
+  # per-day free-slot counters for slots that predate them (runs once)
+  built = await availability_summary.ensure_built(registry.ids(), slot_generator.HORIZON_DAYS + 1)
+  if built is not None:
+    print(f"Built {built} availability summary counters")
 
   # appointments with rollback on failure
   # if await mongo.appointments.count_documents({}) == 0:
@@ -39,13 +51,90 @@ async def lifespan(app: FastAPI):
   #           await mongo.appointments.delete_one({"_id": inserted_id})
   #       print(f"⚠️ Rolled back seed for {appt['provider_id']}: {e}")
 
+async def generate_slots():
+  # availability out to the rolling horizon from each provider's schedule
+  # template, in the background so it does not hold up serving
+  started = time.perf_counter()
+  seeded = sum((await slot_generator.extend_all()).values())
+  print(f"Slot generation wrote {seeded} slots in {time.perf_counter() - started:.2f}s")
+
+  if slot_generator.GENERATOR_INTERVAL > 0:
+    await slot_generator.run_generator_loop()
+
+def start_workers(app: FastAPI):
+  # background workers: confirmation emails, Google event creation,
+  # waitlist auto-fill, the provider registry's change-stream watcher,
+  # the slot generator and Google busy-time cache
+  app.state.tasks += [
+    asyncio.create_task(mail_outbox.outbox.run()),
+    asyncio.create_task(calendar_outbox.outbox.run()),
+    asyncio.create_task(waitlist.run()),
+    asyncio.create_task(registry.watch()),
+    asyncio.create_task(generate_slots()),
+  ]
+  if calendar_sync.SYNC_INTERVAL > 0:
+    app.state.tasks.append(asyncio.create_task(calendar_sync.run_sync_loop()))
+  app.state.ready = True
+  app.state.startup_seconds = round(time.perf_counter() - _process_started, 3)
+  print(f"Ready in {app.state.startup_seconds:.2f}s")
+  if app.state.startup_seconds > STARTUP_BUDGET:
+    print(f"⚠️ Startup took {app.state.startup_seconds:.2f}s, over the {STARTUP_BUDGET:.1f}s budget")
+
+async def retry_startup(app: FastAPI):
+  # Mongo was unreachable at boot: keep serving liveness and retry
+  delay = 1.0
+  while True:
+    await asyncio.sleep(delay)
+    try:
+      await prepare_database()
+    except Exception as e:
+      app.state.startup_error = str(e)
+      delay = min(delay * 2, 30.0)
+      continue
+    app.state.startup_error = None
+    start_workers(app)
+    return
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+  # --- STARTUP ---
+  app.state.ready = False
+  app.state.startup_seconds = None
+  app.state.startup_error = None
+  app.state.tasks = []
+  try:
+    await asyncio.wait_for(prepare_database(), STARTUP_DB_TIMEOUT)
+  except Exception as e:
+    app.state.startup_error = str(e) or type(e).__name__
+    print(f"⚠️ Database not ready, serving without it and retrying: {app.state.startup_error}")
+    app.state.tasks.append(asyncio.create_task(retry_startup(app)))
+  else:
+    start_workers(app)
+
   # yield control to FastAPI so it starts serving
   yield
 
+  # --- SHUTDOWN ---
+  for task in app.state.tasks:
+    task.cancel()
+  await asyncio.gather(*app.state.tasks, return_exceptions=True)
+  await calendar_client.aclose()
+  await mail_outbox.shutdown()
+  close_client()
+
 app = FastAPI(
   title="Smart Scheduler",
   lifespan=lifespan
 )
-app.include_router(availability.router)
-app.include_router(recommend.router)
-app.include_router(booking.router)
+# per-stage timings in a Server-Timing header, request counts for /metrics
+app.add_middleware(metrics.TimingMiddleware)
+# everything that needs the database or the provider registry is 503
+# until startup has finished (e.g. while Mongo is still unreachable)
+needs_ready = [Depends(health.require_ready)]
+app.include_router(availability.router, dependencies=needs_ready)
+app.include_router(recommend.router, dependencies=needs_ready)
+app.include_router(booking.router, dependencies=needs_ready)
+app.include_router(providers.router, dependencies=needs_ready)
+app.include_router(waitlist_route.router, dependencies=needs_ready)
+app.include_router(metrics_route.router)
+app.include_router(health.router)
@@ -0,0 +1,179 @@
+import time
+import inspect
+import functools
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Small in-process Prometheus registry: per-stage latency histograms and
+# counters, plus per-request totals for the Server-Timing header.
+# Observing is a bisect and a few additions under a lock, so it is cheap
+# enough to leave on everywhere.
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Histogram:
+  def __init__(self):
+    self.counts = [0] * (len(BUCKETS) + 1)
+    self.sum = 0.0
+    self.count = 0
+
+  def observe(self, seconds: float):
+    self.counts[bisect_left(BUCKETS, seconds)] += 1
+    self.sum += seconds
+    self.count += 1
+
+_lock = threading.Lock()
+# (stage, op) -> Histogram; stage errors and HTTP requests are counters
+_stages: dict[tuple[str, str], Histogram] = {}
+_errors: dict[tuple[str, str], int] = {}
+_requests: dict[tuple[str, str, str], int] = {}
+_request_latency: dict[str, Histogram] = {}
+
+# stage -> [total seconds, calls] for the request being served
+_timings: ContextVar[dict | None] = ContextVar("timings", default=None)
+
+def observe(stage: str, op: str, seconds: float, error: bool = False):
+  with _lock:
+    hist = _stages.get((stage, op))
+    if hist is None:
+      hist = _stages[(stage, op)] = Histogram()
+    hist.observe(seconds)
+    if error:
+      _errors[(stage, op)] = _errors.get((stage, op), 0) + 1
+    timings = _timings.get()
+    if timings is not None:
+      total = timings.setdefault(stage, [0.0, 0])
+      total[0] += seconds
+      total[1] += 1
+
+@contextmanager
+def timer(stage: str, op: str = ""):
+  started = time.perf_counter()
+  error = False
+  try:
+    yield
+  except BaseException:
+    error = True
+    raise
+  finally:
+    observe(stage, op, time.perf_counter() - started, error)
+
+def timed(stage: str, op: str | None = None):
+  """Decorator timing every call of a sync or async function as `stage`."""
+  def decorate(fn):
+    name = op or fn.__name__
+    if inspect.iscoroutinefunction(fn):
+      @functools.wraps(fn)
+      async def wrapper(*args, **kwargs):
+        with timer(stage, name):
+          return await fn(*args, **kwargs)
+    else:
+      @functools.wraps(fn)
+      def wrapper(*args, **kwargs):
+        with timer(stage, name):
+          return fn(*args, **kwargs)
+    return wrapper
+  return decorate
+
+def server_timing(timings: dict, total: float) -> str:
+  parts = [
+    f'{stage};dur={seconds * 1e3:.1f};desc="{calls} call{"s" if calls != 1 else ""}"'
+    for stage, (seconds, calls) in timings.items()
+  ]
+  parts.append(f"total;dur={total * 1e3:.1f}")
+  return ", ".join(parts)
+
+class TimingMiddleware:
+  """
+  ASGI middleware: collects stage timings for each request, adds them as
+  a Server-Timing header and counts requests per handler and status.
+  """
+  def __init__(self, app):
+    self.app = app
+
+  async def __call__(self, scope, receive, send):
+    if scope["type"] != "http":
+      return await self.app(scope, receive, send)
+    timings = {}
+    token = _timings.set(timings)
+    started = time.perf_counter()
+    status = "500"
+
+    async def send_with_timing(message):
+      nonlocal status
+      if message["type"] == "http.response.start":
+        status = str(message["status"])
+        header = server_timing(timings, time.perf_counter() - started)
+        message["headers"] = [*message.get("headers", []), (b"server-timing", header.encode())]
+      await send(message)
+
+    try:
+      await self.app(scope, receive, send_with_timing)
+    finally:
+      _timings.reset(token)
+      # the router stores the matched endpoint in the scope; unmatched
+      # paths share one label so cardinality stays bounded
+      endpoint = scope.get("endpoint")
+      handler = getattr(endpoint, "__name__", "unmatched")
+      with _lock:
+        key = (handler, scope["method"], status)
+        _requests[key] = _requests.get(key, 0) + 1
+        hist = _request_latency.get(handler)
+        if hist is None:
+          hist = _request_latency[handler] = Histogram()
+        hist.observe(time.perf_counter() - started)
+
+def _escape(value) -> str:
+  return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(**labels) -> str:
+  return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+def _histogram_lines(name: str, hist: Histogram, **labels) -> list[str]:
+  lines, cumulative = [], 0
+  for bound, count in zip(BUCKETS, hist.counts):
+    cumulative += count
+    lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {cumulative}")
+  lines.append(f"{name}_bucket{_labels(**labels, le='+Inf')} {hist.count}")
+  lines.append(f"{name}_sum{_labels(**labels)} {hist.sum}")
+  lines.append(f"{name}_count{_labels(**labels)} {hist.count}")
+  return lines
+
+def render(extra_counters: dict[str, dict[str, float]] | None = None) -> str:
+  """Prometheus text exposition format (version 0.0.4)."""
+  with _lock:
+    lines = [
+      "# HELP scheduler_stage_duration_seconds Time spent in external stages (Mongo, Google Calendar, OpenAI, SMTP, conflict filtering).",
+      "# TYPE scheduler_stage_duration_seconds histogram",
+    ]
+    for (stage, op), hist in sorted(_stages.items()):
+      lines += _histogram_lines("scheduler_stage_duration_seconds", hist, stage=stage, op=op)
+    lines += [
+      "# HELP scheduler_stage_errors_total Stage calls that raised.",
+      "# TYPE scheduler_stage_errors_total counter",
+    ]
+    lines += [
+      f"scheduler_stage_errors_total{_labels(stage=stage, op=op)} {count}"
+      for (stage, op), count in sorted(_errors.items())
+    ]
+    lines += [
+      "# HELP scheduler_http_requests_total HTTP requests by handler, method and status.",
+      "# TYPE scheduler_http_requests_total counter",
+    ]
+    lines += [
+      f"scheduler_http_requests_total{_labels(handler=h, method=m, status=s)} {count}"
+      for (h, m, s), count in sorted(_requests.items())
+    ]
+    lines += [
+      "# HELP scheduler_http_request_duration_seconds HTTP request latency by handler.",
+      "# TYPE scheduler_http_request_duration_seconds histogram",
+    ]
+    for handler, hist in sorted(_request_latency.items()):
+      lines += _histogram_lines("scheduler_http_request_duration_seconds", hist, handler=handler)
+  # counters kept by other modules (caches, LLM), exported as-is
+  for name, values in (extra_counters or {}).items():
+    lines.append(f"# TYPE {name} counter")
+    lines += [f"{name}{_labels(kind=kind)} {value}" for kind, value in sorted(values.items())]
+  return "\n".join(lines) + "\n"
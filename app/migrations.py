@@ -0,0 +1,32 @@
+from pymongo import UpdateOne
+from app.db import mongo
+from app.utils import to_utc
+
+BATCH_SIZE = 1000
+
+async def migrate_iso_dates() -> int:
+  """
+  Convert legacy ISO-string start/end fields on availability and appointments
+  into UTC BSON dates. Only documents still holding strings are touched, so
+  this is safe to run on every startup.
+  """
+  migrated = 0
+  for coll in (mongo.availability, mongo.appointments):
+    cursor = coll.find(
+      {"$or": [{"start": {"$type": "string"}}, {"end": {"$type": "string"}}]},
+      {"start": 1, "end": 1}
+    )
+    ops = []
+    async for doc in cursor:
+      ops.append(UpdateOne(
+        {"_id": doc["_id"]},
+        {"$set": {"start": to_utc(doc["start"]), "end": to_utc(doc["end"])}}
+      ))
+      if len(ops) >= BATCH_SIZE:
+        await coll.bulk_write(ops, ordered=False)
+        migrated += len(ops)
+        ops = []
+    if ops:
+      await coll.bulk_write(ops, ordered=False)
+      migrated += len(ops)
+  return migrated
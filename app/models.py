@@ -1,11 +1,18 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import List, Dict
+from typing import List, Dict, Optional
+
+class ScheduleTemplate(BaseModel):
+  # weekly working hours, e.g. {"mon": [["09:00", "12:00"], ["13:00", "17:00"]]}
+  timezone: str = "Australia/Melbourne"
+  slot_minutes: int = 30
+  weekly: Dict[str, List[List[str]]]
 
 class Provider(BaseModel):
   id: str
   name: str
   specialties: List[str]
+  schedule: Optional[ScheduleTemplate] = None
 
 class PatientProfile(BaseModel):
   id: str
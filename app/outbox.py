@@ -0,0 +1,143 @@
+import asyncio
+import random
+from uuid import uuid4
+from datetime import datetime, timedelta, timezone
+from pymongo import UpdateOne
+
+PENDING = "pending"
+CLAIMED = "claimed"
+DONE = "done"
+DEAD = "dead"
+
+class Outbox:
+  """
+  Durable Mongo-backed work queue.
+
+  Each document carries its delivery state under ``prefix`` (``status``,
+  ``attempts``, ``next_attempt_at``, ``lease_until``, ``lease``,
+  ``last_error``). ``run`` claims due documents in batches under a lease,
+  hands them to ``handler`` and records the outcome: done, retried with
+  exponential backoff, or dead-lettered after ``max_attempts``. Claims
+  whose lease expired (e.g. the worker died) are picked up again.
+
+  ``handler(docs)`` returns one entry per doc: None on success, an
+  Exception on failure, or a dict of fields to ``$set`` on success.
+  """
+  def __init__(
+    self, collection, handler, *, prefix: str = "", batch_size: int = 50,
+    max_attempts: int = 8, base_delay: float = 5.0, lease_seconds: float = 120.0,
+    poll_interval: float = 2.0, name: str = "outbox"
+  ):
+    self.collection = collection
+    self.handler = handler
+    self.prefix = prefix
+    self.batch_size = batch_size
+    self.max_attempts = max_attempts
+    self.base_delay = base_delay
+    self.lease_seconds = lease_seconds
+    self.poll_interval = poll_interval
+    self.name = name
+    self._wakeup = asyncio.Event()
+
+  def _f(self, field: str) -> str:
+    return f"{self.prefix}{field}"
+
+  def new_state(self) -> dict:
+    # state for a freshly enqueued document
+    return {
+      "status": PENDING,
+      "attempts": 0,
+      "next_attempt_at": datetime.now(timezone.utc),
+      "last_error": None,
+    }
+
+  def wake(self):
+    # called after enqueueing so the worker does not wait for the next poll
+    self._wakeup.set()
+
+  def _due(self, now: datetime) -> dict:
+    return {"$or": [
+      {self._f("status"): PENDING, self._f("next_attempt_at"): {"$lte": now}},
+      {self._f("status"): CLAIMED, self._f("lease_until"): {"$lt": now}},
+    ]}
+
+  async def claim(self) -> list[dict]:
+    now = datetime.now(timezone.utc)
+    ids = [
+      doc["_id"] async for doc in
+      self.collection.find(self._due(now), {"_id": 1})
+        .sort(self._f("next_attempt_at"), 1).limit(self.batch_size)
+    ]
+    if not ids:
+      return []
+    # re-check the due filter so two workers never claim the same doc
+    lease = uuid4().hex
+    await self.collection.update_many(
+      {"_id": {"$in": ids}, **self._due(now)},
+      {"$set": {
+        self._f("status"): CLAIMED,
+        self._f("lease"): lease,
+        self._f("lease_until"): now + timedelta(seconds=self.lease_seconds),
+      }}
+    )
+    return await self.collection.find({self._f("lease"): lease}).to_list(None)
+
+  def _retry_delay(self, attempts: int) -> timedelta:
+    delay = self.base_delay * 2 ** (attempts - 1)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+  async def _record(self, docs: list[dict], outcomes: list):
+    now = datetime.now(timezone.utc)
+    ops = []
+    for doc, outcome in zip(docs, outcomes):
+      state = doc.get(self.prefix.rstrip("."), {}) if self.prefix else doc
+      attempts = state.get("attempts", 0) + 1
+      if isinstance(outcome, Exception):
+        dead = attempts >= self.max_attempts
+        update = {
+          self._f("status"): DEAD if dead else PENDING,
+          self._f("attempts"): attempts,
+          self._f("last_error"): str(outcome)[:500],
+          self._f("next_attempt_at"): now + self._retry_delay(attempts),
+        }
+        if dead:
+          print(f"⚠️ {self.name}: dead-lettered {doc['_id']} after {attempts} attempts: {outcome}")
+      else:
+        update = {
+          **(outcome or {}),
+          self._f("status"): DONE,
+          self._f("attempts"): attempts,
+          self._f("done_at"): now,
+          self._f("last_error"): None,
+        }
+      ops.append(UpdateOne(
+        {"_id": doc["_id"], self._f("lease"): state.get("lease")},
+        {"$set": update, "$unset": {self._f("lease"): "", self._f("lease_until"): ""}}
+      ))
+    if ops:
+      await self.collection.bulk_write(ops, ordered=False)
+
+  async def process_once(self) -> int:
+    docs = await self.claim()
+    if not docs:
+      return 0
+    try:
+      outcomes = await self.handler(docs)
+    except Exception as e:
+      outcomes = [e] * len(docs)
+    await self._record(docs, outcomes)
+    return len(docs)
+
+  async def run(self):
+    # drains due work, then sleeps until woken or the next poll
+    while True:
+      self._wakeup.clear()
+      try:
+        while await self.process_once():
+          pass
+      except Exception as e:
+        print(f"⚠️ {self.name} worker error: {e}")
+      try:
+        await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+      except asyncio.TimeoutError:
+        pass
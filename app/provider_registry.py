@@ -0,0 +1,102 @@
+import os
+import asyncio
+from pymongo.errors import OperationFailure, PyMongoError
+from app.db import mongo
+
+# used when the server cannot open change streams (standalone mongod)
+POLL_INTERVAL = float(os.getenv("PROVIDER_POLL_INTERVAL", 30))
+
+class ProviderRegistry:
+  """
+  In-memory provider directory indexed by id and by specialty.
+  Loaded once at startup and kept current by ``watch``.
+  """
+  def __init__(self):
+    self.by_id: dict[str, dict] = {}
+    self.by_specialty: dict[str, dict[str, dict]] = {}
+    # Mongo _id -> provider id, needed to apply change-stream deletes
+    self._ids: dict = {}
+
+  def _rebuild(self, docs: list[dict]):
+    by_id, ids = {}, {}
+    for doc in docs:
+      if not isinstance(doc.get("id"), str) or not doc["id"]:
+        # one bad document must not take the whole directory down
+        print(f"⚠️ Skipping provider document without an id: {doc.get('_id')}")
+        continue
+      ids[doc["_id"]] = doc["id"]
+      by_id[doc["id"]] = {k: v for k, v in doc.items() if k != "_id"}
+    by_specialty: dict[str, dict[str, dict]] = {}
+    for provider in by_id.values():
+      for specialty in provider.get("specialties") or []:
+        if not isinstance(specialty, str):
+          continue
+        by_specialty.setdefault(specialty.lower(), {})[provider["id"]] = provider
+    # swap whole indexes so readers never see a half-built directory
+    self.by_id, self.by_specialty, self._ids = by_id, by_specialty, ids
+
+  async def load(self):
+    self._rebuild(await mongo.providers.find({}).to_list(None))
+
+  def _apply(self, change: dict):
+    docs = {oid: {"_id": oid, **self.by_id[pid]} for oid, pid in self._ids.items()}
+    oid = change["documentKey"]["_id"]
+    if change["operationType"] == "delete":
+      docs.pop(oid, None)
+    elif change.get("fullDocument"):
+      docs[oid] = change["fullDocument"]
+    self._rebuild(list(docs.values()))
+
+  def get(self, provider_id: str) -> dict | None:
+    return self.by_id.get(provider_id)
+
+  def ids(self) -> list[str]:
+    return list(self.by_id)
+
+  def find(self, specialty: str | None = None) -> list[dict]:
+    if specialty is None:
+      return list(self.by_id.values())
+    return list(self.by_specialty.get(specialty.lower(), {}).values())
+
+  async def _poll(self):
+    while True:
+      await asyncio.sleep(POLL_INTERVAL)
+      try:
+        await self.load()
+      except PyMongoError as e:
+        print(f"⚠️ Provider reload failed: {e}")
+
+  async def watch(self):
+    """
+    Follow the providers collection with a change stream; fall back to
+    periodic reloads on servers without change streams.
+    """
+    while True:
+      try:
+        async with mongo.providers.watch(full_document="updateLookup") as stream:
+          # reload once the stream is open so nothing between load and
+          # watch is missed
+          await self.load()
+          async for change in stream:
+            if change["operationType"] in ("insert", "update", "replace", "delete"):
+              try:
+                self._apply(change)
+              except Exception as e:
+                # keep following the stream; the directory stays as it was
+                print(f"⚠️ Provider change skipped ({change['operationType']}): {e!r}")
+            elif change["operationType"] in ("drop", "rename", "invalidate"):
+              await self.load()
+              break
+      except OperationFailure as e:
+        # 40573: change streams are only supported on replica sets
+        print(f"Provider change stream unavailable ({e.code}), polling every {POLL_INTERVAL:.0f}s")
+        await self._poll()
+      except PyMongoError as e:
+        print(f"⚠️ Provider change stream interrupted: {e}")
+        await asyncio.sleep(1)
+      except Exception as e:
+        # anything else would end the watcher silently: log and reopen
+        print(f"⚠️ Provider watcher failed, restarting: {e!r}")
+        await asyncio.sleep(1)
+
+registry = ProviderRegistry()
@@ -0,0 +1,109 @@
+import os
+from collections import defaultdict
+from datetime import datetime, timezone
+from app.utils import AEST
+
+# how many candidates survive pre-ranking and go to the LLM
+TOP_K = int(os.getenv("RECOMMEND_TOP_K", 12))
+# at most this many candidates per day, so the shortlist spans several days
+PER_DAY = 3
+
+# preferences that rule a slot out entirely (keys of PatientInfo.preferences)
+HARD_FILTERS = {
+  "morning_only":   lambda local: local.hour < 12,
+  "afternoon_only": lambda local: local.hour >= 12,
+  "weekdays_only":  lambda local: local.weekday() < 5,
+  "weekends_only":  lambda local: local.weekday() >= 5,
+}
+
+# preferences that only nudge the score
+SOFT_BONUS = {
+  "prefers_morning":   lambda local: local.hour < 12,
+  "prefers_afternoon": lambda local: local.hour >= 12,
+  "prefers_early":     lambda local: local.hour < 10,
+  "prefers_late":      lambda local: local.hour >= 15,
+}
+
+PREFERENCE_CHECKS = {**HARD_FILTERS, **SOFT_BONUS}
+
+def passes_hard_preferences(preferences: dict, slot: dict) -> bool:
+  local = slot["start"].astimezone(AEST)
+  return all(
+    check(local)
+    for name, check in HARD_FILTERS.items()
+    if preferences.get(name)
+  )
+
+def score_slot(preferences: dict, slot: dict, now: datetime) -> float:
+  # sooner is better (one point per day), each matched soft preference +2
+  local = slot["start"].astimezone(AEST)
+  days_out = (slot["start"] - now).total_seconds() / 86400
+  bonus = sum(
+    2.0 for name, check in SOFT_BONUS.items()
+    if preferences.get(name) and check(local)
+  )
+  return bonus - days_out
+
+def rank_slots(preferences: dict, slots: list[dict], k: int = TOP_K) -> list[dict]:
+  """
+  Drop slots that violate hard preferences, score the rest and return the
+  best k (highest first), capped at PER_DAY per clinic-local day.
+  Ties are broken by start time so the result is deterministic.
+  """
+  now = datetime.now(timezone.utc)
+  candidates = sorted(
+    (s for s in slots if passes_hard_preferences(preferences, s)),
+    key=lambda s: (-score_slot(preferences, s, now), s["start"])
+  )
+  picked, per_day, overflow = [], defaultdict(int), []
+  for slot in candidates:
+    day = slot["start"].astimezone(AEST).date()
+    if per_day[day] < PER_DAY:
+      per_day[day] += 1
+      picked.append(slot)
+    else:
+      overflow.append(slot)
+    if len(picked) == k:
+      return picked
+  # not enough distinct days: top up with the best of the rest
+  return picked + overflow[:k - len(picked)]
+
+def encode_slots(ranked: list[dict]) -> tuple[str, dict[str, dict]]:
+  """
+  Compact prompt encoding: one line per clinic-local day with short ids
+  numbered in rank order, e.g. "Mon 12 May: s2 09:00, s1 10:30".
+  Returns the text and id -> slot.
+  """
+  ids = {f"s{i + 1}": slot for i, slot in enumerate(ranked)}
+  durations = {int((s["end"] - s["start"]).total_seconds() // 60) for s in ranked}
+  uniform = len(durations) == 1
+  by_day = defaultdict(list)
+  for slot_id, slot in sorted(ids.items(), key=lambda item: item[1]["start"]):
+    local = slot["start"].astimezone(AEST)
+    label = f"{slot_id} {local:%H:%M}"
+    if not uniform:
+      label += f"-{slot['end'].astimezone(AEST):%H:%M}"
+    by_day[local.strftime("%a %d %b")].append(label)
+  lines = [f"{day}: {', '.join(labels)}" for day, labels in by_day.items()]
+  if uniform and ranked:
+    lines.insert(0, f"(times are Melbourne local, each slot {durations.pop()} min)")
+  return "\n".join(lines), ids
+
+def describe(preferences: dict, slot: dict) -> str:
+  # short human reason used when the ranker answers on its own
+  local = slot["start"].astimezone(AEST)
+  matched = [
+    name.replace("_", " ")
+    for name, check in PREFERENCE_CHECKS.items()
+    if preferences.get(name) and check(local)
+  ]
+  when = f"{local:%A %d %B at %I:%M %p}"
+  if matched:
+    return f"Earliest fit for your preferences ({', '.join(matched)}): {when}"
+  return f"One of the earliest available appointments: {when}"
+
+def fallback_recommendations(preferences: dict, ranked: list[dict], n: int = 3) -> list[dict]:
+  return [
+    {"start": s["start"], "end": s["end"], "reason": describe(preferences, s)}
+    for s in ranked[:n]
+  ]
@@ -1,36 +1,225 @@
-from fastapi import APIRouter, HTTPException, Query
+import json
+import base64
+import calendar
+from datetime import date, datetime, timedelta
+from collections import defaultdict
+from typing import List, Literal, Optional
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from dateutil.parser import isoparse
-from app.db import mongo
-from app.utils import filter_conflicts
+from app.db import mongo, free_slots_pipeline
+from app.utils import AEST, BusyIndex, to_utc
+from app.slots import iter_free_slots
+from app.search import earliest_any, earliest_common
+from app.calendar_sync import busy_intervals
+from app.provider_registry import registry
+from app import availability_cache, availability_summary, metrics
 
 router = APIRouter(prefix="/availability")
 
+def _parse_window(start: str, end: str):
+  # validate dates
+  try:
+    return to_utc(isoparse(start)), to_utc(isoparse(end))
+  except ValueError:
+    raise HTTPException(400, "Invalid ISO date format")
+
+def _resolve_providers(provider_ids: list[str] | None, specialty: str | None) -> set[str]:
+  # explicit ids plus everyone with the specialty; unknown ids are a 404
+  ids = set(provider_ids or [])
+  if specialty:
+    ids.update(p["id"] for p in registry.find(specialty))
+  unknown = [pid for pid in ids if registry.get(pid) is None]
+  if unknown:
+    raise HTTPException(404, f"Provider not found: {', '.join(sorted(unknown))}")
+  if not ids:
+    raise HTTPException(400, "Pass provider_ids and/or a specialty with providers")
+  return ids
+
+def _parse_month(month: str | None) -> tuple[date, date]:
+  # first and last clinic-local day of a "YYYY-MM" month, default this one
+  try:
+    first = date.fromisoformat(f"{month}-01") if month else datetime.now(AEST).date().replace(day=1)
+  except ValueError:
+    raise HTTPException(400, "month must look like YYYY-MM")
+  return first, first.replace(day=calendar.monthrange(first.year, first.month)[1])
+
+@router.get("/summary")
+async def availability_summary_view(
+  provider_ids: Optional[List[str]] = Query(None, description="Repeat for several providers"),
+  specialty: Optional[str] = Query(None, description="E.g. 'cardiology'"),
+  month: Optional[str] = Query(None, description="YYYY-MM, defaults to the current month")
+):
+  """
+  Free-slot counts per provider per clinic-local day for a month, read
+  from incrementally maintained counters (one small indexed query).
+  """
+  ids = sorted(_resolve_providers(provider_ids, specialty))
+  first, last = _parse_month(month)
+  days = await availability_summary.fetch(ids, first.isoformat(), last.isoformat())
+  return {"month": first.strftime("%Y-%m"), "providers": days}
+
+@router.post("/summary/rebuild")
+async def rebuild_availability_summary(
+  provider_ids: Optional[List[str]] = Query(None, description="Defaults to every provider"),
+  specialty: Optional[str] = Query(None, description="E.g. 'cardiology'"),
+  month: Optional[str] = Query(None, description="YYYY-MM, defaults to the current month")
+):
+  """Recompute the month's counters from the availability collection (repair)."""
+  ids = sorted(_resolve_providers(provider_ids, specialty)) if provider_ids or specialty else registry.ids()
+  first, last = _parse_month(month)
+  start = availability_summary.local_midnight(first)
+  end = availability_summary.local_midnight(last + timedelta(days=1))
+  counters = await availability_summary.rebuild(list(ids), start, end)
+  return {"month": first.strftime("%Y-%m"), "providers": len(ids), "counters": counters}
+
+@router.get("/earliest")
+async def earliest_availability(
+  start: str = Query(..., description="ISO timestamp"),
+  end: Optional[str] = Query(None, description="ISO timestamp, defaults to start + 90 days"),
+  provider_ids: Optional[List[str]] = Query(None, description="Repeat for several providers"),
+  specialty: Optional[str] = Query(None, description="E.g. 'dermatology'"),
+  n: int = Query(5, ge=1, le=100, description="How many results"),
+  min_duration: int = Query(30, ge=5, le=480, description="Minutes"),
+  mode: Literal["any", "common"] = Query("any", description="any provider, or all of them at once")
+):
+  """
+  The earliest n free intervals of at least min_duration, either with any
+  of the providers or when all of them are free together. Reads stop as
+  soon as n results are found, so cost follows the answer, not the window.
+  """
+  ids = sorted(_resolve_providers(provider_ids, specialty))
+  dt_start = _parse_window(start, start)[0]
+  dt_end = _parse_window(end, end)[0] if end else dt_start + timedelta(days=90)
+  search = earliest_common if mode == "common" else earliest_any
+  return {"results": await search(ids, dt_start, dt_end, n, timedelta(minutes=min_duration))}
+
+@router.get("/")
+async def search_availability(
+  start: str = Query(..., description="ISO timestamp"),
+  end: str = Query(..., description="ISO timestamp"),
+  provider_ids: Optional[List[str]] = Query(None, description="Repeat for several providers"),
+  specialty: Optional[str] = Query(None, description="E.g. 'cardiology'"),
+  group_by: Literal["provider", "time"] = Query("provider")
+):
+  """
+  Free slots for several providers (explicit ids and/or a specialty)
+  computed with one aggregation instead of two queries per provider.
+  """
+  ids = _resolve_providers(provider_ids, specialty)
+  dt_start, dt_end = _parse_window(start, end)
+
+  slots = await mongo.availability.aggregate(
+    free_slots_pipeline(sorted(ids), dt_start, dt_end)
+  ).to_list(None)
+
+  # drop slots blocked by cached Google busy time, per provider
+  with metrics.timer("conflicts", "search_availability"):
+    busy = {pid: BusyIndex(busy_intervals(pid, dt_start, dt_end)) for pid in ids}
+    slots = [s for s in slots if not busy[s["provider_id"]].overlaps(s["start"], s["end"])]
+
+  if group_by == "time":
+    # one entry per time slot listing every provider free at that time
+    merged = defaultdict(list)
+    for s in slots:
+      merged[(s["start"], s["end"])].append(s["provider_id"])
+    return {"available": [
+      {"start": s, "end": e, "provider_ids": pids}
+      for (s, e), pids in merged.items()
+    ]}
+  grouped = {pid: [] for pid in sorted(ids)}
+  for s in slots:
+    grouped[s["provider_id"]].append(s)
+  return {"providers": grouped}
+
+@router.get("/stats")
+async def availability_stats():
+  return {"cache": availability_cache.cache_stats()}
+
+def encode_cursor(start: datetime) -> str:
+  return base64.urlsafe_b64encode(start.isoformat().encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> datetime:
+  try:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    return to_utc(base64.urlsafe_b64decode(padded).decode())
+  except ValueError:
+    raise HTTPException(400, "Invalid cursor")
+
+def _slot_json(slot: dict) -> dict:
+  return {
+    "provider_id": slot["provider_id"],
+    "start": slot["start"].isoformat(),
+    "end": slot["end"].isoformat(),
+  }
+
+async def _ndjson(slots, limit: int | None):
+  # one slot per line; when a page is cut short the last line holds the cursor
+  count, last = 0, None
+  try:
+    async for slot in slots:
+      if last is not None and count == limit:
+        # more slots follow the page: resume after the last one sent
+        yield json.dumps({"next": encode_cursor(last["start"])}) + "\n"
+        break
+      yield json.dumps(_slot_json(slot)) + "\n"
+      last = slot
+      count += 1
+  finally:
+    # closes the Motor cursor when the page ends early or the client leaves
+    await slots.aclose()
+
 @router.get("/{provider_id}")
 async def get_availability(
   provider_id: str,
+  request: Request,
   start: str = Query(..., description="ISO timestamp"),
-  end: str = Query(..., description="ISO timestamp")
+  end: str = Query(..., description="ISO timestamp"),
+  limit: Optional[int] = Query(None, ge=1, le=5000, description="Page size"),
+  after: Optional[str] = Query(None, description="Cursor from a previous page"),
+  format: Literal["json", "ndjson"] = Query("json", description="ndjson streams one slot per line")
 ):
-  # validate dates
+  if registry.get(provider_id) is None:
+    raise HTTPException(404, "Provider not found")
+
+  dt_start, dt_end = _parse_window(start, end)
+  after_dt = decode_cursor(after) if after else None
+
+  # unchanged provider version (and busy time): answer from the client's
+  # copy or the response cache without touching either collection
+  etag = await availability_cache.current_etag(provider_id)
+  headers = {"ETag": etag, "Cache-Control": "no-cache"}
+  if availability_cache.etag_matches(request.headers.get("if-none-match"), etag):
+    availability_cache.stats["not_modified"] += 1
+    return Response(status_code=304, headers=headers)
+
+  # free slots are filtered on the fly against the window's bookings
+  # plus any busy time from the provider's Google calendar (cached)
+  if format == "ndjson":
+    slots = iter_free_slots(provider_id, dt_start, dt_end, after_dt)
+    return StreamingResponse(_ndjson(slots, limit), media_type="application/x-ndjson", headers=headers)
+
+  key = (provider_id, dt_start, dt_end, after_dt, limit)
+  body = availability_cache.get(key, etag)
+  if body is not None:
+    return Response(body, media_type="application/json", headers=headers)
+
+  slots = iter_free_slots(provider_id, dt_start, dt_end, after_dt)
+
+  free_slots, next_cursor = [], None
   try:
-    dt_start = isoparse(start)
-    dt_end   = isoparse(end)
-  except ValueError:
-    raise HTTPException(400, "Invalid ISO date format")
-  
-  # load all seeded availability for this provider in the window
-  avail_docs = await mongo.availability.find({
-    "provider_id": provider_id,
-    "start": {"$gte": dt_start.isoformat()},
-    "end":   {"$lte": dt_end.isoformat()}
-  }, {"_id": 0}).to_list(None)
-
-  # load existing confirmed bookings
-  booked = await mongo.appointments.find({
-    "provider_id": provider_id
-  }, {"_id": 0}).to_list(None)
-
-  # filter out any slots that overlap a booking
-  free_slots = filter_conflicts(avail_docs, booked)
-
-  return {"available": free_slots}
+    async for slot in slots:
+      if limit is not None and len(free_slots) == limit:
+        next_cursor = encode_cursor(free_slots[-1]["start"])
+        break
+      free_slots.append(slot)
+  finally:
+    await slots.aclose()
+
+  response = {"available": free_slots}
+  if limit is not None:
+    response["next"] = next_cursor
+  body = json.dumps(jsonable_encoder(response), separators=(",", ":")).encode()
+  availability_cache.put(key, etag, body)
+  return Response(body, media_type="application/json", headers=headers)
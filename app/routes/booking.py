@@ -1,12 +1,18 @@
+import os
+import asyncio
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional, Dict
+from typing import Optional, Dict, List, Literal
+from bson import ObjectId
 from app.db import mongo
-from app.calendar_client import book_google_event
+from app import calendar_outbox
 from pydantic import EmailStr
-from fastapi import APIRouter, HTTPException, BackgroundTasks
-from app.utils_mail import send_appointment_email
+from app.mail_outbox import enqueue_appointment_email
+from app.utils import to_utc
+from app.slots import claim_slot, release_slot
+from app.provider_registry import registry
+from app import bookings, llm_cache, versions, waitlist
 
 router = APIRouter(prefix="/book")
 
@@ -32,65 +38,126 @@ class BookingRequest(BaseModel):
   )
   patient: PatientInfo
 
+CalendarStatus = Literal["pending", "claimed", "done", "dead"]
+
 class BookingResponse(BaseModel):
   appointment_id: str
   event_link: Optional[str] = Field(
     None,
-    description="URL to the booked Google Calendar event"
+    description="URL to the booked Google Calendar event, once synced"
+  )
+  calendar_status: CalendarStatus = Field(
+    "pending",
+    description="Google Calendar sync state; the event is created in the background"
   )
 
+BATCH_MAX = int(os.getenv("BATCH_BOOKING_MAX", 5000))
+
+class BatchBookingRequest(BaseModel):
+  bookings: List[BookingRequest] = Field(..., min_length=1, max_length=BATCH_MAX)
+
+class BatchItemResult(BaseModel):
+  index: int
+  status: Literal["booked", "failed"]
+  appointment_id: Optional[str] = None
+  event_link: Optional[str] = None
+  calendar_status: Optional[CalendarStatus] = None
+  error: Optional[str] = None
+
+class BatchBookingResponse(BaseModel):
+  booked: int
+  failed: int
+  results: List[BatchItemResult]
+
 @router.post("/", response_model=BookingResponse)
-async def book(appointment: BookingRequest, background_tasks: BackgroundTasks):
+async def book(appointment: BookingRequest):
   appt_data = appointment.model_dump()
+  # store as UTC BSON dates
+  appt_data["start"] = to_utc(appt_data["start"])
+  appt_data["end"] = to_utc(appt_data["end"])
   # get the provider's details
-  provider = await mongo.providers.find_one({
-    "id": appt_data["provider_id"]
-  })
+  provider = registry.get(appt_data["provider_id"])
   if not provider:
     raise HTTPException(404, "Provider not found")
   appt_data["provider_name"] = provider["name"]
-  res = await mongo.appointments.insert_one(appt_data)
 
+  # claim the slot first: removing it from availability is the lock,
+  # so concurrent requests for the same slot cannot both get here
+  slot = await claim_slot(appt_data["provider_id"], appt_data["start"], appt_data["end"])
+  if slot is None:
+    raise HTTPException(409, "Slot is no longer available")
+
+  # the appointment and its pending Google Calendar sync are one insert;
+  # the calendar outbox worker creates the event after we respond
+  appt_data.update(calendar_outbox.new_sync_state())
   try:
-    # create Google Calendar event
-    event = await book_google_event(
-      appt_data['provider_id'],
-      appt_data
-    )
-  except Exception as e:
-    # roll back if calendar booking fails
-    await mongo.appointments.delete_one({"_id": res.inserted_id})
-    raise HTTPException(
-      status_code=502,
-      detail=f"Failed to book on Google Calendar: {e}"
-    )
-
-  # remove that slot from our availability collection
-  await mongo.availability.delete_one({
-    "provider_id": appt_data["provider_id"],
-    "start": appt_data["start"].isoformat(),
-    "end": appt_data["end"].isoformat()
-  })
-
-  # schedule the email send in the background
-  background_tasks.add_task(
-    send_appointment_email,
-    appointment.patient.email,
-    appt_data,
+    res = await mongo.appointments.insert_one(appt_data)
+  except Exception:
+    # give the slot back, and to the waitlist if anyone wants it
+    await release_slot(slot)
+    waitlist.notify([slot])
+    raise
+  calendar_outbox.outbox.wake()
+
+  # cached recommendations that offered this slot are now stale,
+  # and calendar feed subscribers should see a new version
+  llm_cache.invalidate_slot(appt_data["provider_id"], appt_data["start"])
+  # bump the version and queue the confirmation email concurrently;
+  # the mail outbox worker sends it. The appointment is saved, so a
+  # failure here is logged rather than turned into a 500 the client
+  # would retry into a 409
+  outcomes = await asyncio.gather(
+    versions.bump(appt_data["provider_id"]),
+    enqueue_appointment_email(appointment.patient.email, appt_data),
+    return_exceptions=True,
   )
+  for step, outcome in zip(("Version bump", "Email enqueue"), outcomes):
+    if isinstance(outcome, Exception):
+      print(f"⚠️ {step} failed after booking {res.inserted_id}: {outcome}")
 
-  # remove the “Available slot” event from the provider’s calendar
-  # try:
-    # await delete_availability_event(
-    #   appt_data["provider_id"],
-    #   {"start": appt_data["start"].isoformat(), "end": appt_data["end"].isoformat()}
-    # )
-  # except Exception as e:
-  #   # log but do not rollback the booking
-  #   print(f"⚠️ Failed to delete availability event: {e}")
+  # removing the “Available slot” event from the provider’s calendar is
+  # done by the calendar outbox too (CALENDAR_DELETE_AVAILABILITY_EVENTS)
 
   # return to client
+  return BookingResponse(appointment_id=str(res.inserted_id))
+
+@router.get("/{appointment_id}", response_model=BookingResponse)
+async def booking_status(appointment_id: str):
+  # poll for the Google Calendar sync outcome and event link
+  if not ObjectId.is_valid(appointment_id):
+    raise HTTPException(404, "Appointment not found")
+  appt = await mongo.appointments.find_one(
+    {"_id": ObjectId(appointment_id)}, {"event_link": 1, "calendar_sync.status": 1}
+  )
+  if appt is None:
+    raise HTTPException(404, "Appointment not found")
   return BookingResponse(
-    appointment_id=str(res.inserted_id),
-    event_link=event.get("htmlLink")
+    appointment_id=appointment_id,
+    event_link=appt.get("event_link"),
+    # appointments booked before the outbox were synced inline
+    calendar_status=appt.get("calendar_sync", {}).get("status", "done")
+  )
+
+@router.post("/batch", response_model=BatchBookingResponse)
+async def book_batch(request: BatchBookingRequest):
+  """
+  Book many appointments at once (see app.bookings.book_many): slots are
+  claimed with bulk writes, appointments saved with one insert_many and
+  Google events created by the calendar outbox. Each item succeeds or
+  fails on its own.
+  """
+  outcomes, released = await bookings.book_many([b.model_dump() for b in request.bookings])
+  # slots given back may suit someone on the waitlist
+  waitlist.notify(released)
+  results = [
+    BatchItemResult(index=i, status="booked", appointment_id=o["appointment_id"], calendar_status="pending")
+    if o["appointment_id"] else
+    BatchItemResult(index=i, status="failed", error=o["error"])
+    for i, o in enumerate(outcomes)
+  ]
+  booked = sum(1 for r in results if r.status == "booked")
+  return BatchBookingResponse(
+    booked=booked,
+    failed=len(results) - booked,
+    results=results
   )
@@ -0,0 +1,37 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import JSONResponse
+from app.db import ping
+from app.provider_registry import registry
+
+router = APIRouter(prefix="/health")
+
+def require_ready(request: Request):
+  """
+  Dependency for routes that read the provider registry or Mongo: until
+  startup has finished the registry is empty, so answer 503 instead of
+  telling clients that real providers do not exist.
+  """
+  if not getattr(request.app.state, "ready", False):
+    raise HTTPException(503, "Service is starting, try again shortly", headers={"Retry-After": "5"})
+
+@router.get("/live")
+async def live():
+  # the process is up and the event loop answers
+  return {"status": "ok"}
+
+@router.get("/ready")
+async def ready(request: Request):
+  """503 until startup finished and while Mongo does not answer a ping."""
+  state = request.app.state
+  if not getattr(state, "ready", False):
+    return JSONResponse(
+      {"status": "starting", "error": getattr(state, "startup_error", None)},
+      status_code=503
+    )
+  if not await ping():
+    return JSONResponse({"status": "unavailable", "error": "database unreachable"}, status_code=503)
+  return {
+    "status": "ready",
+    "startup_seconds": state.startup_seconds,
+    "providers": len(registry.ids()),
+  }
@@ -0,0 +1,18 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app import metrics, llm_cache, availability_cache, waitlist
+from app.llm_client import llm_stats
+
+router = APIRouter()
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def prometheus_metrics():
+  """Prometheus scrape endpoint: stage latencies, requests and cache counters."""
+  llm = llm_stats()
+  body = metrics.render({
+    "scheduler_recommend_cache_total": llm_cache.stats,
+    "scheduler_availability_cache_total": availability_cache.stats,
+    "scheduler_llm_calls_total": {k: llm[k] for k in ("calls", "coalesced", "failures")},
+    "scheduler_waitlist_total": waitlist.stats,
+  })
+  return PlainTextResponse(body, media_type="text/plain; version=0.0.4; charset=utf-8")
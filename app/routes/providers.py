@@ -0,0 +1,98 @@
+import os
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from bson import ObjectId
+from cachetools import LRUCache
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from app.db import mongo
+from app import versions, feed_tokens
+from app.models import Provider
+from app.provider_registry import registry
+from app.utils import ICS_HEADER, ICS_FOOTER, generate_ics_event
+
+router = APIRouter(prefix="/providers")
+
+# how far back the feed reaches; future appointments are always included
+FEED_PAST_DAYS = int(os.getenv("ICS_FEED_PAST_DAYS", 90))
+# rendered VEVENT blocks, keyed on everything that goes into them
+_fragments: LRUCache = LRUCache(maxsize=int(os.getenv("ICS_FRAGMENT_CACHE_SIZE", 20000)))
+# events per streamed chunk
+CHUNK_EVENTS = 200
+
+def _fragment(appt: dict) -> str:
+  key = (appt["_id"], appt["start"], appt["end"], appt.get("notes"), appt["patient"]["name"])
+  ics = _fragments.get(key)
+  if ics is None:
+    # DTSTAMP from the ObjectId keeps the fragment stable between renders
+    stamp = appt["_id"].generation_time if isinstance(appt["_id"], ObjectId) else None
+    ics = generate_ics_event(
+      appt,
+      summary=f"Appointment with {appt['patient']['name']}",
+      dtstamp=stamp
+    )
+    _fragments[key] = ics
+  return ics
+
+async def _render_feed(provider_id: str):
+  # stream the VCALENDAR straight off the cursor, CHUNK_EVENTS at a time
+  since = datetime.now(timezone.utc) - timedelta(days=FEED_PAST_DAYS)
+  cursor = mongo.appointments.find(
+    {"provider_id": provider_id, "end": {"$gte": since}},
+    {"start": 1, "end": 1, "notes": 1, "patient.name": 1}
+  ).sort("start", 1).batch_size(CHUNK_EVENTS)
+  chunk = [ICS_HEADER]
+  async for appt in cursor:
+    chunk.append(_fragment(appt))
+    if len(chunk) >= CHUNK_EVENTS:
+      yield "".join(chunk)
+      chunk = []
+  chunk.append(ICS_FOOTER)
+  yield "".join(chunk)
+
+def _not_modified(request: Request, etag: str, updated_at: datetime | None) -> bool:
+  if_none_match = request.headers.get("if-none-match")
+  if if_none_match is not None:
+    return etag in (tag.strip() for tag in if_none_match.split(",")) or if_none_match.strip() == "*"
+  if_modified_since = request.headers.get("if-modified-since")
+  if if_modified_since and updated_at is not None:
+    try:
+      return updated_at.replace(microsecond=0) <= parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+      return False
+  return False
+
+@router.get("/", response_model=List[Provider])
+async def list_providers(
+  specialty: Optional[str] = Query(None, description="E.g. 'cardiology'")
+):
+  # served from the in-memory registry, no database round trip
+  return registry.find(specialty)
+
+@router.get("/{provider_id}/calendar.ics")
+async def provider_calendar(
+  provider_id: str,
+  request: Request,
+  token: Optional[str] = Query(None, description="Feed token (python -m app.feed_tokens)")
+):
+  # events name the patient and the reason for the visit: without the
+  # provider's token the feed does not exist, same answer as an unknown id
+  if not feed_tokens.token_valid(provider_id, token) or registry.get(provider_id) is None:
+    raise HTTPException(404, "Provider not found")
+
+  # the per-provider change version drives ETag/Last-Modified,
+  # so polling subscribers get a 304 without touching appointments
+  current = await versions.get(provider_id)
+  etag = f'"{current["version"]}"'
+  headers = {"ETag": etag, "Cache-Control": "no-cache"}
+  if current["updated_at"] is not None:
+    headers["Last-Modified"] = format_datetime(current["updated_at"], usegmt=True)
+  if _not_modified(request, etag, current["updated_at"]):
+    return Response(status_code=304, headers=headers)
+
+  return StreamingResponse(
+    _render_feed(provider_id),
+    media_type="text/calendar; charset=utf-8",
+    headers=headers
+  )
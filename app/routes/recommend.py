@@ -1,7 +1,10 @@
-from fastapi import APIRouter
-from app.db import mongo
-from app.utils import filter_conflicts
-from app.llm_client import recommend_slots
+from fastapi import APIRouter, HTTPException
+from app.db import mongo, overlapping, within
+from app.utils import filter_conflicts, to_utc
+from app.calendar_sync import busy_intervals
+from app.provider_registry import registry
+from app.llm_client import recommend_slots, llm_stats
+from app.llm_cache import cache_stats
 from datetime import datetime
 from pydantic import BaseModel, Field
 from typing import Dict, List
@@ -37,21 +40,32 @@ class RecommendResponse(BaseModel):
 
 @router.post("/", response_model=RecommendResponse)
 async def recommend(request: RecommendRequest):  
+  if registry.get(request.provider_id) is None:
+    raise HTTPException(404, "Provider not found")
+
   # gather availability & existing bookings
-  availabilities = await mongo.availability.find({
-    "provider_id": request.provider_id,
-    "start": {"$gte": request.start.isoformat()},
-    "end":   {"$lte": request.end.isoformat()}
-  }, {"_id": 0}).to_list(None)
+  window_start = to_utc(request.start)
+  window_end = to_utc(request.end)
+  availabilities = await mongo.availability.find(
+    within(request.provider_id, window_start, window_end), {"_id": 0}
+  ).to_list(None)
 
-  booked = await mongo.appointments.find({
-    "provider_id": request.provider_id
-  }, {"_id": 0}).to_list(None)
+  booked = await mongo.appointments.find(
+    overlapping(request.provider_id, window_start, window_end),
+    {"_id": 0, "start": 1, "end": 1}
+  ).to_list(None)
 
-  free_slots = filter_conflicts(availabilities, booked)
+  busy = busy_intervals(request.provider_id, window_start, window_end)
+  free_slots = filter_conflicts(availabilities, booked + busy)
 
   # ask the LLM, get back a List[dict]
   suggestions = await recommend_slots(request.patient, free_slots)
 
   # return parsed suggestions directly
   return RecommendResponse(recommendations=suggestions)
+
+
+@router.get("/stats")
+async def recommend_stats():
+  # cache hit/miss counters, LLM queue depth and latency on this worker
+  return {"cache": cache_stats(), "llm": llm_stats()}
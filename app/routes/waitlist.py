@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+from bson import ObjectId
+from fastapi import APIRouter, HTTPException, Query
+from pydantic import BaseModel, Field
+from app import waitlist
+from app.routes.booking import PatientInfo
+from app.provider_registry import registry
+
+router = APIRouter(prefix="/waitlist")
+
+class WaitlistRequest(BaseModel):
+  provider_id: str
+  patient: PatientInfo
+  notes: Optional[str] = Field(default="", description="Passed on to the appointment")
+
+@router.post("/")
+async def join_waitlist(request: WaitlistRequest):
+  """
+  Queue a patient for the provider's next suitable freed slot. Joining
+  books nothing by itself: only slots that open later are offered.
+  """
+  if registry.get(request.provider_id) is None:
+    raise HTTPException(404, "Provider not found")
+  entry = {
+    **request.model_dump(),
+    "status": waitlist.WAITING,
+    "created_at": datetime.now(timezone.utc),
+  }
+  res = await waitlist.entries.insert_one(entry)
+  ahead = await waitlist.entries.count_documents({
+    "provider_id": request.provider_id,
+    "status": {"$in": [waitlist.WAITING, waitlist.FILLING]},
+    "created_at": {"$lt": entry["created_at"]},
+  })
+  return {"waitlist_id": str(res.inserted_id), "position": ahead + 1}
+
+@router.get("/stats")
+async def stats():
+  return waitlist.waitlist_stats()
+
+@router.get("/")
+async def list_waitlist(provider_id: str = Query(...)):
+  # queue order; patient details stay out of listings
+  docs = await waitlist.entries.find(
+    {"provider_id": provider_id, "status": {"$in": [waitlist.WAITING, waitlist.FILLING]}},
+    {"status": 1, "created_at": 1}
+  ).sort("created_at", 1).to_list(None)
+  return {"waiting": [
+    {"waitlist_id": str(d["_id"]), "status": d["status"], "created_at": d["created_at"]}
+    for d in docs
+  ]}
+
+@router.get("/{waitlist_id}")
+async def waitlist_entry(waitlist_id: str):
+  if not ObjectId.is_valid(waitlist_id):
+    raise HTTPException(404, "Waitlist entry not found")
+  doc = await waitlist.entries.find_one(
+    {"_id": ObjectId(waitlist_id)},
+    {"provider_id": 1, "status": 1, "created_at": 1, "appointment_id": 1, "booked_at": 1}
+  )
+  if doc is None:
+    raise HTTPException(404, "Waitlist entry not found")
+  doc["waitlist_id"] = str(doc.pop("_id"))
+  return doc
+
+@router.delete("/{waitlist_id}")
+async def leave_waitlist(waitlist_id: str):
+  if not ObjectId.is_valid(waitlist_id):
+    raise HTTPException(404, "Waitlist entry not found")
+  res = await waitlist.entries.update_one(
+    {"_id": ObjectId(waitlist_id), "status": waitlist.WAITING},
+    {"$set": {"status": waitlist.CANCELLED}}
+  )
+  if res.modified_count == 0:
+    raise HTTPException(409, "Entry is not waiting (already booked, being filled or cancelled)")
+  return {"status": waitlist.CANCELLED}
+
+@router.post("/fill")
+async def fill_now(
+  provider_ids: Optional[List[str]] = Query(None, description="Defaults to every provider")
+):
+  """
+  Operator action: offer every free slot in the next WAITLIST_WINDOW_DAYS
+  (not just opened ones) to the providers' waitlists now.
+  """
+  ids = provider_ids or registry.ids()
+  unknown = [pid for pid in ids if registry.get(pid) is None]
+  if unknown:
+    raise HTTPException(404, f"Provider not found: {', '.join(sorted(unknown))}")
+  now = datetime.now(timezone.utc)
+  window = [(now, now + timedelta(days=waitlist.WINDOW_DAYS))]
+  results = await waitlist.fill({pid: window for pid in ids})
+  return {
+    "booked": [r for r in results if r["appointment_id"]],
+    "missed": [r for r in results if not r["appointment_id"]],
+  }
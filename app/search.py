@@ -0,0 +1,80 @@
+import heapq
+from contextlib import AsyncExitStack, aclosing
+from datetime import datetime, timedelta
+from app.slots import iter_free_slots
+
+async def iter_free_intervals(provider_id: str, start: datetime, end: datetime, min_duration: timedelta):
+  """
+  Maximal free intervals (back-to-back free slots merged) lasting at least
+  min_duration, in start order, built lazily from iter_free_slots.
+  """
+  current = None
+  async with aclosing(iter_free_slots(provider_id, start, end)) as slots:
+    async for slot in slots:
+      if current and slot["start"] <= current[1]:
+        current[1] = max(current[1], slot["end"])
+        continue
+      if current and current[1] - current[0] >= min_duration:
+        yield tuple(current)
+      current = [slot["start"], slot["end"]]
+  if current and current[1] - current[0] >= min_duration:
+    yield tuple(current)
+
+async def earliest_any(
+  provider_ids: list[str], start: datetime, end: datetime, n: int, min_duration: timedelta
+) -> list[dict]:
+  """
+  The n earliest free intervals across all providers: a heap-based k-way
+  merge over each provider's sorted interval stream, which stops pulling
+  from Mongo as soon as n results are out.
+  """
+  results = []
+  async with AsyncExitStack() as stack:
+    heap = []
+    for pid in provider_ids:
+      stream = await stack.enter_async_context(
+        aclosing(iter_free_intervals(pid, start, end, min_duration))
+      )
+      first = await anext(stream, None)
+      if first:
+        heapq.heappush(heap, (first[0], pid, first[1], stream))
+    while heap and len(results) < n:
+      s, pid, e, stream = heapq.heappop(heap)
+      results.append({"provider_id": pid, "start": s, "end": e})
+      following = await anext(stream, None)
+      if following:
+        heapq.heappush(heap, (following[0], pid, following[1], stream))
+  return results
+
+async def earliest_common(
+  provider_ids: list[str], start: datetime, end: datetime, n: int, min_duration: timedelta
+) -> list[dict]:
+  """
+  The n earliest intervals in which every provider is free for at least
+  min_duration. Sweeps all streams together: the overlap of the current
+  intervals is a candidate, then whichever interval ends first advances.
+  """
+  results = []
+  async with AsyncExitStack() as stack:
+    streams, current = {}, {}
+    for pid in provider_ids:
+      streams[pid] = await stack.enter_async_context(
+        aclosing(iter_free_intervals(pid, start, end, min_duration))
+      )
+      current[pid] = await anext(streams[pid], None)
+      if current[pid] is None:
+        return results
+    # heap of (interval end, provider) picks who advances next
+    ends = [(iv[1], pid) for pid, iv in current.items()]
+    heapq.heapify(ends)
+    while len(results) < n:
+      lo = max(iv[0] for iv in current.values())
+      hi = ends[0][0]
+      if hi - lo >= min_duration:
+        results.append({"provider_ids": provider_ids, "start": lo, "end": hi})
+      _, pid = heapq.heappop(ends)
+      current[pid] = await anext(streams[pid], None)
+      if current[pid] is None:
+        break
+      heapq.heappush(ends, (current[pid][1], pid))
+  return results
@@ -0,0 +1,85 @@
+from itertools import islice
+from collections import defaultdict
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from app.db import mongo
+from app.utils import BusyIndex
+from app import availability_summary
+
+CHUNK_SIZE = 1000
+DUPLICATE_KEY = 11000
+
+def chunked(items, size: int):
+  # yields lists of up to `size` items from any iterable
+  it = iter(items)
+  while chunk := list(islice(it, size)):
+    yield chunk
+
+async def _bulk_upsert(coll, ops: list) -> list[int]:
+  """
+  Run an unordered bulk write and return the positions of the operations
+  that inserted a document.
+  Duplicate-key errors mean another worker inserted the same key first,
+  which is exactly the outcome we want, so they are ignored.
+  """
+  try:
+    result = await coll.bulk_write(ops, ordered=False)
+    return list(result.upserted_ids)
+  except BulkWriteError as e:
+    errors = e.details.get("writeErrors", [])
+    if any(err.get("code") != DUPLICATE_KEY for err in errors):
+      raise
+    return [u["index"] for u in e.details.get("upserted", [])]
+
+async def seed_providers(providers: list[dict]) -> int:
+  ops = [
+    UpdateOne({"id": p["id"]}, {"$setOnInsert": p}, upsert=True)
+    for p in providers
+  ]
+  return len(await _bulk_upsert(mongo.providers, ops)) if ops else 0
+
+async def _booked_index(chunk: list[dict]) -> dict:
+  # per-provider index of appointments overlapping the chunk's time range
+  provider_ids = list({slot["provider_id"] for slot in chunk})
+  lo = min(slot["start"] for slot in chunk)
+  hi = max(slot["end"] for slot in chunk)
+  booked = defaultdict(list)
+  async for appt in mongo.appointments.find(
+    {"provider_id": {"$in": provider_ids}, "start": {"$lt": hi}, "end": {"$gt": lo}},
+    {"_id": 0, "provider_id": 1, "start": 1, "end": 1}
+  ):
+    booked[appt["provider_id"]].append(appt)
+  return {pid: BusyIndex(appts) for pid, appts in booked.items()}
+
+async def seed_availability(slots, chunk_size: int = CHUNK_SIZE) -> int:
+  """
+  Upsert availability slots keyed on (provider_id, start) in chunked,
+  unordered bulk writes. Existing slots are left untouched and slots that
+  already overlap an appointment are not re-created, so this is idempotent
+  and safe to run from several workers at once.
+  Returns the number of slots actually inserted; the per-day summary
+  counters are incremented for exactly those.
+  """
+  inserted = 0
+  for chunk in chunked(slots, chunk_size):
+    booked = await _booked_index(chunk)
+    new = []
+    for slot in chunk:
+      index = booked.get(slot["provider_id"])
+      if index and index.overlaps(slot["start"], slot["end"]):
+        continue
+      new.append(slot)
+    if not new:
+      continue
+    ops = [
+      UpdateOne(
+        {"provider_id": slot["provider_id"], "start": slot["start"]},
+        {"$setOnInsert": slot},
+        upsert=True
+      )
+      for slot in new
+    ]
+    upserted = await _bulk_upsert(mongo.availability, ops)
+    await availability_summary.slots_added(new[i] for i in upserted)
+    inserted += len(upserted)
+  return inserted
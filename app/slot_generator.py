@@ -0,0 +1,104 @@
+import os
+import asyncio
+from datetime import date, datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+from app.db import mongo
+from app.seeding import seed_availability
+from app.provider_registry import registry
+from app import versions, waitlist
+
+# how many days ahead bookable slots are kept, and how often to top up
+HORIZON_DAYS = int(os.getenv("AVAILABILITY_HORIZON_DAYS", 90))
+GENERATOR_INTERVAL = float(os.getenv("SLOT_GENERATOR_INTERVAL", 3600))
+
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+
+# used for providers without a "schedule" (the original clinic hours)
+DEFAULT_SCHEDULE = {
+  "timezone": "Australia/Melbourne",
+  "slot_minutes": 30,
+  "weekly": {
+    day: [["09:00", "12:00"], ["13:00", "17:00"]]
+    for day in WEEKDAYS[:5]
+  },
+}
+
+def _local_starts(day: date, begin: time, end: time, step: timedelta, tz: ZoneInfo):
+  """
+  Wall-clock slot starts between begin and end on `day`, as UTC instants.
+  Times skipped by a DST jump forward are left out; times repeated by a
+  jump back yield both real instants.
+  """
+  t = datetime.combine(day, begin)
+  stop = datetime.combine(day, end)
+  while t + step <= stop:
+    seen = set()
+    for fold in (0, 1):
+      local = t.replace(tzinfo=tz, fold=fold)
+      instant = local.astimezone(timezone.utc)
+      # a nonexistent local time does not survive the round trip
+      if instant.astimezone(tz).replace(tzinfo=None) == t and instant not in seen:
+        seen.add(instant)
+        yield instant
+    t += step
+
+def iter_template_slots(provider: dict, first_day: date, last_day: date):
+  """Lazily yield availability slots for [first_day, last_day] from the template."""
+  schedule = provider.get("schedule") or DEFAULT_SCHEDULE
+  tz = ZoneInfo(schedule.get("timezone", DEFAULT_SCHEDULE["timezone"]))
+  step = timedelta(minutes=schedule.get("slot_minutes", 30))
+  day = first_day
+  while day <= last_day:
+    for begin, end in schedule["weekly"].get(WEEKDAYS[day.weekday()], []):
+      for start in _local_starts(day, time.fromisoformat(begin), time.fromisoformat(end), step, tz):
+        yield {"provider_id": provider["id"], "start": start, "end": start + step}
+    day += timedelta(days=1)
+
+async def extend_provider(provider: dict) -> int:
+  """
+  Generate only the days between what was generated before and the
+  rolling horizon, feeding the lazy slot stream into bulk upserts.
+  Returns how many slots were inserted.
+  """
+  schedule = provider.get("schedule") or DEFAULT_SCHEDULE
+  today = datetime.now(ZoneInfo(schedule.get("timezone", DEFAULT_SCHEDULE["timezone"]))).date()
+  state = await mongo.generation_state.find_one({"_id": provider["id"]}) or {}
+  done = date.fromisoformat(state["generated_until"]) if "generated_until" in state else today
+  first_day = max(today, done) + timedelta(days=1)
+  last_day = today + timedelta(days=HORIZON_DAYS)
+  if first_day > last_day:
+    return 0
+  inserted = await seed_availability(iter_template_slots(provider, first_day, last_day))
+  if inserted:
+    # the new days may suit patients on the provider's waitlist
+    tz = ZoneInfo(schedule.get("timezone", DEFAULT_SCHEDULE["timezone"]))
+    waitlist.notify([{
+      "provider_id": provider["id"],
+      "start": datetime.combine(first_day, time(), tz).astimezone(timezone.utc),
+      "end": datetime.combine(last_day + timedelta(days=1), time(), tz).astimezone(timezone.utc),
+    }])
+  # ISO dates compare correctly as strings, so $max only moves forward
+  await mongo.generation_state.update_one(
+    {"_id": provider["id"]},
+    {"$max": {"generated_until": last_day.isoformat()}},
+    upsert=True
+  )
+  return inserted
+
+async def extend_all() -> dict[str, int]:
+  inserted = {}
+  for provider in registry.find():
+    try:
+      inserted[provider["id"]] = await extend_provider(provider)
+    except Exception as e:
+      print(f"⚠️ Slot generation failed for {provider['id']}: {e}")
+  changed = [pid for pid, count in inserted.items() if count]
+  if changed:
+    await versions.bump_many(changed)
+  return inserted
+
+async def run_generator_loop():
+  # keeps every provider's horizon topped up; started from main.lifespan
+  while True:
+    await asyncio.sleep(GENERATOR_INTERVAL)
+    await extend_all()
@@ -0,0 +1,141 @@
+import time
+import heapq
+from uuid import uuid4
+from datetime import datetime, timedelta, timezone
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from app.db import mongo, overlapping, within
+from app.seeding import DUPLICATE_KEY
+from app.utils import BusyIndex
+from app.calendar_sync import busy_intervals
+from app import versions, availability_summary, metrics
+
+# a bulk claim that was never finished (worker died) expires after this
+CLAIM_TTL = timedelta(minutes=5)
+CLAIM_CHUNK = 500
+
+SLOT_FIELDS = {"_id": 0, "provider_id": 1, "start": 1, "end": 1}
+
+def _unclaimed(now: datetime) -> dict:
+  # no claim at all, or one whose owner never finished it
+  return {"claimed_until": {"$not": {"$gt": now}}}
+
+async def claim_slot(provider_id: str, start: datetime, end: datetime) -> dict | None:
+  """
+  Atomically take an open slot out of availability in one round trip.
+  The unique (provider_id, start) index guarantees there is at most one
+  document to take, so of N concurrent callers exactly one gets it back;
+  the rest get None.
+  """
+  slot = await mongo.availability.find_one_and_delete({
+    "provider_id": provider_id,
+    "start": start,
+    "end": end,
+    **_unclaimed(datetime.now(timezone.utc))
+  })
+  if slot is not None:
+    await availability_summary.slots_removed([slot])
+  return slot
+
+async def claim_slots(keys: list[tuple[str, datetime, datetime]]) -> dict:
+  """
+  Bulk version of claim_slot for (provider_id, start, end) keys.
+  Marks the matching open slots with a claim token in one update_many,
+  reads back what this call won, then deletes those documents: three
+  round trips per chunk however many slots are requested.
+  Returns {(provider_id, start, end): slot document} for the winners.
+  """
+  claimed = {}
+  for i in range(0, len(keys), CLAIM_CHUNK):
+    chunk = keys[i:i + CLAIM_CHUNK]
+    now = datetime.now(timezone.utc)
+    token = uuid4().hex
+    await mongo.availability.update_many(
+      {
+        "$or": [{"provider_id": p, "start": s, "end": e} for p, s, e in chunk],
+        **_unclaimed(now)
+      },
+      {"$set": {"claim": token, "claimed_until": now + CLAIM_TTL}}
+    )
+    won = await mongo.availability.find({"claim": token}).to_list(None)
+    if won:
+      await mongo.availability.delete_many({"claim": token})
+      await availability_summary.slots_removed(won)
+    for slot in won:
+      slot.pop("claim", None)
+      slot.pop("claimed_until", None)
+      claimed[(slot["provider_id"], slot["start"], slot["end"])] = slot
+  return claimed
+
+async def release_slot(slot: dict):
+  # undo a claim when a later booking step fails
+  try:
+    await mongo.availability.insert_one(slot)
+    await availability_summary.slots_added([slot])
+  except DuplicateKeyError:
+    # already back (e.g. re-seeded meanwhile): nothing to undo
+    pass
+  # readers may have cached the window while the slot was claimed
+  await versions.bump(slot["provider_id"])
+
+async def release_slots(slots: list[dict]):
+  if not slots:
+    return
+  try:
+    await mongo.availability.insert_many(slots, ordered=False)
+    back = slots
+  except BulkWriteError as e:
+    # duplicates are slots that are already back
+    errors = e.details.get("writeErrors", [])
+    if any(err.get("code") != DUPLICATE_KEY for err in errors):
+      raise
+    duplicates = {err["index"] for err in errors}
+    back = [slot for i, slot in enumerate(slots) if i not in duplicates]
+  await availability_summary.slots_added(back)
+  await versions.bump_many(s["provider_id"] for s in slots)
+
+async def iter_free_slots(
+  provider_id: str, start: datetime, end: datetime,
+  after: datetime | None = None, batch_size: int = 100
+):
+  """
+  Yield the provider's free slots in start order.
+  Availability and appointments are both read as start-sorted cursors and
+  swept together: bookings enter a heap once they start before the
+  current slot ends and leave it once they end before the current slot
+  starts, so memory stays bounded by the bookings in flight and a caller
+  that stops early only pays for what it consumed. Cached Google busy
+  time is checked with an in-memory interval index. The time spent on
+  overlap checks (Mongo reads excluded) is recorded as the "conflicts"
+  stage, once per stream.
+  """
+  google = BusyIndex(busy_intervals(provider_id, start, end))
+  query = within(provider_id, start, end)
+  if after is not None:
+    query["start"]["$gt"] = after
+  slots = mongo.availability.find(query, SLOT_FIELDS).sort("start", 1).batch_size(batch_size)
+  bookings = mongo.appointments.find(
+    overlapping(provider_id, after or start, end), {"_id": 0, "start": 1, "end": 1}
+  ).sort("start", 1).batch_size(batch_size)
+
+  active: list[tuple[datetime, datetime]] = []  # heap of (end, start)
+  upcoming = await anext(bookings, None)
+  spent = 0.0
+  try:
+    async for slot in slots:
+      while upcoming is not None and upcoming["start"] < slot["end"]:
+        heapq.heappush(active, (upcoming["end"], upcoming["start"]))
+        upcoming = await anext(bookings, None)
+      started = time.perf_counter()
+      while active and active[0][0] <= slot["start"]:
+        heapq.heappop(active)
+      free = (
+        not any(b_start < slot["end"] for _, b_start in active)
+        and not google.overlaps(slot["start"], slot["end"])
+      )
+      spent += time.perf_counter() - started
+      if free:
+        yield slot
+  finally:
+    metrics.observe("conflicts", "iter_free_slots", spent)
+    await slots.close()
+    await bookings.close()
@@ -1,97 +1,129 @@
-from datetime import datetime, timedelta, date, timezone
+from datetime import datetime, timezone
 from zoneinfo import ZoneInfo
-import calendar
+from bisect import bisect_left
 import uuid
+from app import metrics
 
 AEST = ZoneInfo("Australia/Melbourne")
 
-# returns True if slot overlaps any existing appointment.
-def is_conflict(slot: dict, existing: list[dict]) -> bool:
-  # takes an ISO-formatted date/time string
-  # & parses it into a datetime.datetime object
-  start_new = datetime.fromisoformat(slot["start"])
-  end_new = datetime.fromisoformat(slot["end"])
+# accepts either an ISO-formatted string or a datetime
+def to_datetime(value) -> datetime:
+  if isinstance(value, datetime):
+    return value
+  return datetime.fromisoformat(value)
 
-  for appointment in existing:
-    start_existing = datetime.fromisoformat(appointment["start"])
-    end_existing = datetime.fromisoformat(appointment["end"])
-    # if not (slot ends before or starts after the appointment)
-    # then its an overlap
-    if not (end_new <= start_existing or start_new >= end_existing):
-      return True
-  return False
+# normalises an ISO string or datetime to an aware UTC datetime
+# (naive values are taken to be clinic-local time)
+def to_utc(value) -> datetime:
+  dt = to_datetime(value)
+  if dt.tzinfo is None:
+    dt = dt.replace(tzinfo=AEST)
+  return dt.astimezone(timezone.utc)
 
-# remove any slots that clash with existing appointments
-def filter_conflicts(slots: list[dict], existing: list[dict]) -> list[dict]:
-  result = []
-  for slot in slots:
-    # keep this slot only if it does NOT conflict with any in existing
-    if not is_conflict(slot, existing):
-      result.append(slot)
-  return result
+# clinic-local calendar day of an instant, as "YYYY-MM-DD"
+def day_key(dt: datetime) -> str:
+  return dt.astimezone(AEST).date().isoformat()
 
-def generate_ics(appointment: dict) -> str:
+class BusyIndex:
   """
-  Build a minimal .ics file content for the given appointment dict.
+  Interval index over existing appointments.
+  Each interval is parsed once and sorted by start; ``max_ends[i]`` holds the
+  latest end among the first i+1 intervals, so an overlap test is one bisect.
   """
-  # Ensure we have UTC datetimes for DTSTART/DTEND
-  dtstart = appointment["start"]
-  dtend   = appointment["end"]
-  if isinstance(dtstart, str):
-    # parse ISO back to datetime with tzinfo
-    dtstart = datetime.fromisoformat(dtstart)
-  if isinstance(dtend, str):
-    dtend = datetime.fromisoformat(dtend)
+  def __init__(self, existing: list[dict]):
+    intervals = sorted(
+      (to_datetime(appt["start"]), to_datetime(appt["end"]))
+      for appt in existing
+    )
+    self.starts = [s for s, _ in intervals]
+    self.max_ends = []
+    latest = None
+    for _, e in intervals:
+      latest = e if latest is None or e > latest else latest
+      self.max_ends.append(latest)
+
+  def overlaps(self, start: datetime, end: datetime) -> bool:
+    # intervals starting before the slot ends are the only candidates;
+    # among them, one overlaps iff the latest end is after the slot start
+    k = bisect_left(self.starts, end)
+    return k > 0 and self.max_ends[k - 1] > start
+
+# returns True if slot overlaps any appointment in the index; build the
+# BusyIndex once per request and reuse it for every slot checked
+def is_conflict(slot: dict, index: BusyIndex) -> bool:
+  return index.overlaps(
+    to_datetime(slot["start"]),
+    to_datetime(slot["end"])
+  )
+
+# remove any slots that clash with existing appointments
+# O((slots + bookings) log bookings), slot order is preserved
+@metrics.timed("conflicts")
+def filter_conflicts(slots: list[dict], existing: list[dict]) -> list[dict]:
+  index = BusyIndex(existing)
+  return [
+    slot for slot in slots
+    if not index.overlaps(to_datetime(slot["start"]), to_datetime(slot["end"]))
+  ]
 
+ICS_HEADER = "\r\n".join([
+  "BEGIN:VCALENDAR",
+  "VERSION:2.0",
+  "PRODID:-//Intelligent Scheduler//EN",
+  ""
+])
+ICS_FOOTER = "END:VCALENDAR\r\n"
+
+def _ics_time(value) -> str:
   # Convert to UTC for ICS standard
-  dtstart_utc = dtstart.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
-  dtend_utc   = dtend.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
-  dtstamp     = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
-  uid         = appointment.get("_id", uuid.uuid4())
+  return to_utc(value).strftime("%Y%m%dT%H%M%SZ")
+
+def ics_escape(text: str) -> str:
+  # RFC 5545 TEXT escaping
+  return (
+    text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+    .replace("\r\n", "\\n").replace("\n", "\\n")
+  )
 
-  summary = "Doctor's Appointment"
-  description = appointment.get("notes", "")
+def ics_fold(line: str) -> str:
+  # content lines longer than 75 octets continue on lines starting with a space
+  raw = line.encode()
+  if len(raw) <= 75:
+    return line
+  parts, chunk = [], b""
+  for ch in line:
+    b = ch.encode()
+    if len(chunk) + len(b) > (75 if not parts else 74):
+      parts.append(chunk.decode())
+      chunk = b""
+    chunk += b
+  parts.append(chunk.decode())
+  return "\r\n ".join(parts)
 
-  ics = "\r\n".join([
-    "BEGIN:VCALENDAR",
-    "VERSION:2.0",
-    "PRODID:-//Intelligent Scheduler//EN",
+def generate_ics_event(
+  appointment: dict,
+  summary: str = "Doctor's Appointment",
+  dtstamp: datetime | None = None
+) -> str:
+  """
+  Build one VEVENT block (CRLF-terminated) for the given appointment dict.
+  """
+  uid = appointment.get("_id", uuid.uuid4())
+  lines = [
     "BEGIN:VEVENT",
     f"UID:{uid}",
-    f"DTSTAMP:{dtstamp}",
-    f"DTSTART:{dtstart_utc}",
-    f"DTEND:{dtend_utc}",
-    f"SUMMARY:{summary}",
-    f"DESCRIPTION:{description}",
+    f"DTSTAMP:{_ics_time(dtstamp or datetime.now(timezone.utc))}",
+    f"DTSTART:{_ics_time(appointment['start'])}",
+    f"DTEND:{_ics_time(appointment['end'])}",
+    f"SUMMARY:{ics_escape(summary)}",
+    f"DESCRIPTION:{ics_escape(appointment.get('notes') or '')}",
     "END:VEVENT",
-    "END:VCALENDAR",
     ""
-  ])
-  return ics
+  ]
+  return "\r\n".join(ics_fold(line) for line in lines)
 
-def generate_monthly_slots(sample_providers: list[dict]):
-  """Generate half-hour slots 09:00–12:00 and 13:00–17:00 on each weekday from tomorrow to month-end."""
-  slots = []
-  today_aest = datetime.now(AEST).date()
-  year, month = today_aest.year, today_aest.month
-  last_day = calendar.monthrange(year, month)[1]
-  # slot hours: mornings 9–11, afternoons 13–16
-  hours = list(range(9, 12)) + list(range(13, 17))
-  for day in range(today_aest.day + 1, last_day + 1):
-    current = date(year, month, day)
-    # skip weekends
-    if current.weekday() >= 5:
-      continue
-    for hour in hours:
-      for minute in (0, 30):
-        start_dt = datetime(year, month, day, hour, minute, tzinfo=AEST)
-        end_dt   = start_dt + timedelta(minutes=30)
-        iso_start = start_dt.isoformat()
-        iso_end   = end_dt.isoformat()
-        for prov in sample_providers:
-          slots.append({
-            "provider_id": prov["id"],
-            "start": iso_start,
-            "end":   iso_end
-          })
-  return slots
\ No newline at end of file
+def generate_ics(appointment: dict) -> str:
+  """
+  Build a minimal .ics file content for the given appointment dict.
+  """
+  return ICS_HEADER + generate_ics_event(appointment) + ICS_FOOTER
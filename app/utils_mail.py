@@ -1,16 +1,18 @@
 import os
 import smtplib
 from email.message import EmailMessage
-from icalendar import Calendar, Event
 from datetime import datetime
 from email.utils import formataddr
 from zoneinfo import ZoneInfo
+from app import metrics
 
 SMTP_HOST     = os.getenv("SMTP_HOST")
 SMTP_PORT     = int(os.getenv("SMTP_PORT", 587))
 SMTP_USER     = os.getenv("SMTP_USER")
 SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
 SMTP_FROM     = os.getenv("SMTP_FROM")
+# set to false for a local debugging server without TLS/auth
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").lower() != "false"
 
 def format_slot(start_dt: datetime, end_dt: datetime) -> str:
   # e.g. "Tuesday, 12 May 2025, 10:00 AM – 10:30 AM AEST"
@@ -27,10 +29,13 @@ def format_slot(start_dt: datetime, end_dt: datetime) -> str:
 
   return f"{date_str}, {start_str} – {end_str} {tz_name}"
 
-def send_appointment_email(
+def build_appointment_message(
   to_email: str,
   appt: dict
-):
+) -> EmailMessage:
+  # icalendar is only needed by the mail sender, so it is imported here
+  from icalendar import Calendar, Event
+
   # build the ICS calendar invite
   cal = Calendar()
   cal.add('prodid', '-//Smart Scheduler//')
@@ -110,9 +115,50 @@ def send_appointment_email(
     subtype='calendar',
     filename='appointment.ics'
   )
+  return msg
+
+class SmtpSession:
+  """
+  One authenticated SMTP connection reused across many messages.
+  Not thread-safe: drive it from a single thread.
+  """
+  def __init__(self):
+    self._smtp: smtplib.SMTP | None = None
+
+  def _connect(self) -> smtplib.SMTP:
+    smtp = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=30)
+    if SMTP_STARTTLS:
+      smtp.starttls()
+    if SMTP_USER:
+      smtp.login(SMTP_USER, SMTP_PASSWORD)
+    return smtp
+
+  @metrics.timed("smtp", "send")
+  def send(self, msg: EmailMessage):
+    if self._smtp is None:
+      self._smtp = self._connect()
+    try:
+      self._smtp.send_message(msg)
+    except (smtplib.SMTPServerDisconnected, ConnectionError):
+      # the server dropped an idle connection: reconnect once and retry
+      self._smtp = self._connect()
+      self._smtp.send_message(msg)
 
-  # send via SMTP
-  with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as smtp:
-    smtp.starttls()
-    smtp.login(SMTP_USER, SMTP_PASSWORD)
-    smtp.send_message(msg)
+  def close(self):
+    if self._smtp is not None:
+      try:
+        self._smtp.quit()
+      except (smtplib.SMTPException, OSError):
+        pass
+      self._smtp = None
+
+def send_appointment_email(
+  to_email: str,
+  appt: dict
+):
+  # one-off send over a fresh connection; bookings go through mail_outbox
+  session = SmtpSession()
+  try:
+    session.send(build_appointment_message(to_email, appt))
+  finally:
+    session.close()
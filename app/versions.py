@@ -0,0 +1,31 @@
+from datetime import datetime, timezone
+from pymongo import ReturnDocument, UpdateOne
+from app.db import mongo
+
+# per-provider change counter stored in Mongo so every worker agrees on it;
+# bumped whenever a provider's appointments or open slots change
+
+async def bump(provider_id: str) -> dict:
+  return await mongo.provider_versions.find_one_and_update(
+    {"_id": provider_id},
+    {"$inc": {"version": 1}, "$set": {"updated_at": datetime.now(timezone.utc)}},
+    upsert=True,
+    return_document=ReturnDocument.AFTER
+  )
+
+async def bump_many(provider_ids):
+  now = datetime.now(timezone.utc)
+  ops = [
+    UpdateOne(
+      {"_id": pid},
+      {"$inc": {"version": 1}, "$set": {"updated_at": now}},
+      upsert=True
+    )
+    for pid in set(provider_ids)
+  ]
+  if ops:
+    await mongo.provider_versions.bulk_write(ops, ordered=False)
+
+async def get(provider_id: str) -> dict:
+  doc = await mongo.provider_versions.find_one({"_id": provider_id})
+  return doc or {"_id": provider_id, "version": 0, "updated_at": None}
@@ -0,0 +1,312 @@
+import os
+import asyncio
+from bisect import bisect_right
+from uuid import uuid4
+from datetime import datetime, timedelta, timezone
+from pymongo import ASCENDING, UpdateOne
+from app.db import mongo
+from app.slots import iter_free_slots
+from app.bookings import book_many
+from app.ranking import passes_hard_preferences, score_slot
+from app import llm_client
+
+# how far ahead opened slots are offered, and how much work one pass does
+WINDOW_DAYS = int(os.getenv("WAITLIST_WINDOW_DAYS", 14))
+MAX_PATIENTS = int(os.getenv("WAITLIST_BATCH_SIZE", 200))
+MAX_SLOTS = int(os.getenv("WAITLIST_MAX_SLOTS", 500))
+# options scoring within this of a patient's pick count as a tie (1 = a day)
+TIE_MARGIN = float(os.getenv("WAITLIST_TIE_MARGIN", 1.0))
+TIE_OPTIONS = 3
+# retry interval in seconds for openings a failed pass left behind (0 = only
+# when notified); entries claimed by a pass that never finished become
+# available again after FILL_LEASE
+SWEEP_INTERVAL = float(os.getenv("WAITLIST_SWEEP_INTERVAL", 300))
+FILL_LEASE = timedelta(minutes=5)
+
+WAITING = "waiting"
+FILLING = "filling"
+BOOKED = "booked"
+CANCELLED = "cancelled"
+
+# {"provider_id", "patient": {name, email, preferences, conditions},
+#  "notes", "status", "created_at", "fill_token", "fill_until",
+#  "appointment_id", "booked_at"}; appointments booked from the waitlist
+# carry the entry's _id as "waitlist_id"
+entries = mongo.waitlist
+
+stats = {"passes": 0, "filled": 0, "missed": 0, "tie_breaks": 0, "llm_calls": 0, "llm_failures": 0}
+# provider_id -> [(start, end)] windows where slots opened since the last pass
+_pending: dict[str, list[tuple[datetime, datetime]]] = {}
+_wakeup = asyncio.Event()
+
+async def ensure_indexes():
+  await entries.create_index(
+    [("provider_id", ASCENDING), ("status", ASCENDING), ("created_at", ASCENDING)]
+  )
+  await mongo.appointments.create_index("waitlist_id", sparse=True)
+
+def notify(opened):
+  """
+  Slots opened (released by a failed booking, or newly generated):
+  `opened` are {"provider_id", "start", "end"} slots or windows. Only
+  those are offered to the waitlist, on the next pass.
+  """
+  for o in opened:
+    _pending.setdefault(o["provider_id"], []).append((o["start"], o["end"]))
+  if _pending:
+    _wakeup.set()
+
+def _claimable(now: datetime) -> dict:
+  return {"$or": [
+    {"status": WAITING},
+    {"status": FILLING, "fill_until": {"$lt": now}},
+  ]}
+
+async def _claim_entries(provider_id: str) -> tuple[str, list[dict]]:
+  # take the provider's queue head so concurrent passes never share a patient
+  now = datetime.now(timezone.utc)
+  ids = [
+    doc["_id"] async for doc in
+    entries.find({"provider_id": provider_id, **_claimable(now)}, {"_id": 1})
+      .sort("created_at", 1).limit(MAX_PATIENTS)
+  ]
+  if not ids:
+    return "", []
+  token = uuid4().hex
+  await entries.update_many(
+    {"_id": {"$in": ids}, **_claimable(now)},
+    {"$set": {"status": FILLING, "fill_token": token, "fill_until": now + FILL_LEASE}}
+  )
+  claimed = await entries.find({"fill_token": token}).sort("created_at", 1).to_list(None)
+  # a pass that died after booking left its entries to expire: settle them
+  done = {
+    a["waitlist_id"]: str(a["_id"]) async for a in
+    mongo.appointments.find({"waitlist_id": {"$in": [e["_id"] for e in claimed]}}, {"waitlist_id": 1})
+  }
+  if done:
+    await _mark_booked(token, done)
+    claimed = [e for e in claimed if e["_id"] not in done]
+  return token, claimed
+
+def _merge(windows: list[tuple[datetime, datetime]]) -> list[tuple[datetime, datetime]]:
+  merged = []
+  for start, end in sorted(windows):
+    if merged and start <= merged[-1][1]:
+      merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+    else:
+      merged.append((start, end))
+  return merged
+
+async def _free_slots(provider_id: str, windows: list[tuple[datetime, datetime]], now: datetime) -> list[dict]:
+  # free slots lying inside the opened windows, within WINDOW_DAYS
+  horizon = now + timedelta(days=WINDOW_DAYS)
+  windows = [(max(s, now), min(e, horizon)) for s, e in _merge(windows)]
+  windows = [(s, e) for s, e in windows if s < e]
+  if not windows:
+    return []
+  starts = [s for s, _ in windows]
+  slots = []
+  async for slot in iter_free_slots(provider_id, windows[0][0], windows[-1][1]):
+    i = bisect_right(starts, slot["start"]) - 1
+    if i < 0 or slot["end"] > windows[i][1]:
+      continue
+    slots.append(slot)
+    if len(slots) == MAX_SLOTS:
+      break
+  return slots
+
+def _slot_key(slot: dict) -> tuple:
+  return slot["provider_id"], slot["start"]
+
+def _ranking(prefs: dict, slots: list[dict], now: datetime) -> list[tuple[float, dict]]:
+  # best first, earlier start on equal score
+  scored = [(score_slot(prefs, s, now), s) for s in slots if passes_hard_preferences(prefs, s)]
+  scored.sort(key=lambda item: (-item[0], item[1]["start"]))
+  return scored
+
+def assign(queue: list[dict], slots: list[dict], now: datetime) -> tuple[dict, dict]:
+  """
+  Deterministic first pass for one provider. Patients are served in queue
+  order, each taking their best-scoring remaining slot. Afterwards every
+  patient with unused slots scoring within TIE_MARGIN of their pick gets
+  those as tie options. Rankings are shared between patients with the
+  same preferences, so a long queue costs little more than a short one.
+  Returns ({entry _id: slot}, {entry _id: [pick, *options]}).
+  """
+  free = {_slot_key(s) for s in slots}
+  rankings: dict[tuple, list] = {}
+  def ranking(prefs: dict) -> list[tuple[float, dict]]:
+    key = tuple(sorted(name for name, on in prefs.items() if on))
+    if key not in rankings:
+      rankings[key] = _ranking(prefs, slots, now)
+    return rankings[key]
+
+  picks, scores = {}, {}
+  for entry in queue:
+    for score, slot in ranking(entry["patient"].get("preferences", {})):
+      if _slot_key(slot) in free:
+        free.discard(_slot_key(slot))
+        picks[entry["_id"]], scores[entry["_id"]] = slot, score
+        break
+
+  ties = {}
+  for entry in queue:
+    if entry["_id"] not in picks:
+      continue
+    floor = scores[entry["_id"]] - TIE_MARGIN
+    options = []
+    for score, slot in ranking(entry["patient"].get("preferences", {})):
+      if score < floor or len(options) == TIE_OPTIONS:
+        break
+      if _slot_key(slot) in free:
+        options.append(slot)
+    if options:
+      ties[entry["_id"]] = [picks[entry["_id"]], *options]
+  return picks, ties
+
+async def break_ties(queue: list[dict], picks: dict, ties: dict) -> dict:
+  """
+  One LLM call for every tied patient; swaps are applied in queue order
+  and only onto slots nobody holds, so no slot is ever given out twice.
+  Without the LLM (or on failure) the deterministic picks stand.
+  """
+  if not ties or not llm_client.llm_available():
+    return picks
+  tied = [e for e in queue if e["_id"] in ties]
+  stats["tie_breaks"] += len(tied)
+  stats["llm_calls"] += 1
+  try:
+    choices = await llm_client.allocate_ties([(e["patient"], ties[e["_id"]]) for e in tied])
+  except Exception as e:
+    stats["llm_failures"] += 1
+    print(f"⚠️ Waitlist tie-break failed, keeping ranked picks: {e}")
+    return picks
+  held = {_slot_key(s) for s in picks.values()}
+  picks = dict(picks)
+  for entry, choice in zip(tied, choices):
+    current = picks[entry["_id"]]
+    if choice is None or _slot_key(choice) == _slot_key(current) or _slot_key(choice) in held:
+      continue
+    held.discard(_slot_key(current))
+    held.add(_slot_key(choice))
+    picks[entry["_id"]] = choice
+  return picks
+
+async def _book(queue: list[dict], picks: dict, booked: dict) -> tuple[list[dict], list[dict]]:
+  # the same atomic bulk claim as /book/batch: a slot taken meanwhile
+  # fails that item, never double-books
+  order = [e for e in queue if e["_id"] in picks]
+  if not order:
+    return [], []
+  outcomes, released = await book_many([
+    {
+      "provider_id": e["provider_id"],
+      "start": picks[e["_id"]]["start"],
+      "end": picks[e["_id"]]["end"],
+      "notes": e.get("notes") or "Booked from the waitlist",
+      "patient": e["patient"],
+      "waitlist_id": e["_id"],
+    }
+    for e in order
+  ])
+  # committed before anything else can fail
+  for e, o in zip(order, outcomes):
+    if o["appointment_id"]:
+      booked[e["_id"]] = o["appointment_id"]
+  results = [
+    {"waitlist_id": str(e["_id"]), "provider_id": e["provider_id"],
+     "start": picks[e["_id"]]["start"], "end": picks[e["_id"]]["end"],
+     "appointment_id": o["appointment_id"], "error": o["error"]}
+    for e, o in zip(order, outcomes)
+  ]
+  return results, released
+
+async def _mark_booked(token: str, booked: dict):
+  now = datetime.now(timezone.utc)
+  await entries.bulk_write([
+    UpdateOne(
+      {"_id": entry_id, "fill_token": token},
+      {"$set": {"status": BOOKED, "appointment_id": appointment_id, "booked_at": now},
+       "$unset": {"fill_token": "", "fill_until": ""}}
+    )
+    for entry_id, appointment_id in booked.items()
+  ], ordered=False)
+
+async def _finish(token: str, booked: dict):
+  # entries without a committed appointment go back to waiting; if marking
+  # the booked ones fails they expire and _claim_entries settles them
+  await entries.update_many(
+    {"fill_token": token, "status": FILLING, "_id": {"$nin": list(booked)}},
+    {"$set": {"status": WAITING}, "$unset": {"fill_token": "", "fill_until": ""}}
+  )
+  if booked:
+    await _mark_booked(token, booked)
+
+async def fill(opened: dict[str, list[tuple[datetime, datetime]]]) -> list[dict]:
+  """
+  Offer the free slots inside the opened (provider_id -> [(start, end)])
+  windows, up to WINDOW_DAYS ahead, to the providers' waitlists in one
+  pass: deterministic assignment, one batched LLM call for the ties
+  across all providers, then one batch booking.
+  Returns the bookings made (and attempted).
+  """
+  now = datetime.now(timezone.utc)
+  stats["passes"] += 1
+  claims, queue, slots = [], [], []
+  for provider_id, windows in sorted(opened.items()):
+    token, claimed = await _claim_entries(provider_id)
+    if not claimed:
+      continue
+    claims.append(token)
+    queue.extend(claimed)
+    slots.extend(await _free_slots(provider_id, windows, now))
+
+  results, released, booked = [], [], {}
+  try:
+    picks = {}
+    by_provider = {}
+    for entry in queue:
+      by_provider.setdefault(entry["provider_id"], []).append(entry)
+    ties = {}
+    for provider_id, provider_queue in by_provider.items():
+      p, t = assign(provider_queue, [s for s in slots if s["provider_id"] == provider_id], now)
+      picks.update(p)
+      ties.update(t)
+    picks = await break_ties(queue, picks, ties)
+    results, released = await _book(queue, picks, booked)
+  finally:
+    for token in claims:
+      await _finish(token, booked)
+  # slots claimed for a booking that failed are free again
+  notify(released)
+
+  booked = [r for r in results if r["appointment_id"]]
+  stats["filled"] += len(booked)
+  stats["missed"] += len(results) - len(booked)
+  return results
+
+async def run():
+  # fills when notified (slots generated or released); openings a failed
+  # pass could not offer are retried on the next sweep
+  while True:
+    try:
+      await asyncio.wait_for(_wakeup.wait(), SWEEP_INTERVAL or None)
+    except asyncio.TimeoutError:
+      pass
+    _wakeup.clear()
+    opened = dict(_pending)
+    _pending.clear()
+    if not opened:
+      continue
+    try:
+      await fill(opened)
+    except Exception as e:
+      print(f"⚠️ Waitlist fill failed: {e}")
+      for provider_id, windows in opened.items():
+        _pending.setdefault(provider_id, []).extend(windows)
+
+def waitlist_stats() -> dict:
+  return {
+    **stats,
+    "llm_calls_per_filled_slot": stats["llm_calls"] / stats["filled"] if stats["filled"] else None,
+  }
@@ -0,0 +1,221 @@
+"""
+Per-slot documents vs per-day bitmaps (benchmarks.bitmaps).
+
+Compares document count, encoded bytes a month-window query ships, and the
+CPU time to compute free slots (one provider) and common free slots (all
+providers) for both layouts. Bytes use BSON when pymongo is installed,
+JSON otherwise.
+
+With --mongo-uri both layouts are also loaded into a scratch database and
+queried for real: the app's iter_free_slots against bitmap_store.find_free
+and find_common_free, plus a claim and release of one slot each way,
+reporting round-trip time and the reply bytes Mongo sent back.
+
+  python -m benchmarks.bench_bitmap [--mongo-uri mongodb://127.0.0.1:27017]
+"""
+import os
+import json
+import random
+import argparse
+import asyncio
+import time
+from uuid import uuid4
+from datetime import date, timedelta
+
+from benchmarks.bitmaps import (
+  WORDS, slots_to_bitmaps, interval_mask, free_slots, intersect, to_words,
+)
+from app.utils import day_key, filter_conflicts
+from app.slot_generator import iter_template_slots
+
+try:
+  import bson
+
+  def encoded_size(doc: dict) -> int:
+    return len(bson.encode(doc))
+  ENCODING = "bson"
+except ImportError:
+  def encoded_size(doc: dict) -> int:
+    return len(json.dumps(doc, default=str))
+  ENCODING = "json"
+
+def timed(fn, repeat: int = 5) -> float:
+  best = float("inf")
+  for _ in range(repeat):
+    t0 = time.perf_counter()
+    fn()
+    best = min(best, time.perf_counter() - t0)
+  return best * 1e3
+
+class ReplyBytes:
+  # pymongo command listener adding up the size of every server reply
+  def __init__(self):
+    self.total = 0
+
+  def started(self, event):
+    pass
+
+  def succeeded(self, event):
+    self.total += encoded_size(event.reply)
+
+  def failed(self, event):
+    pass
+
+REPLIES = ReplyBytes()
+
+async def mongo_round_trips(providers: list[dict], slots: list[dict], booked: list[dict], docs: list[dict], repeat: int) -> dict:
+  """Best-of-`repeat` ms and reply KB per operation, for both layouts."""
+  from app import db
+  from app.slots import claim_slot, iter_free_slots, release_slot
+  from benchmarks import bitmap_store
+
+  await db.ensure_indexes()
+  await bitmap_store.ensure_indexes()
+  taken = {(b["provider_id"], b["start"]) for b in booked}
+  free = [dict(s) for s in slots if (s["provider_id"], s["start"]) not in taken]
+  await db.mongo.availability.insert_many(free)
+  await db.mongo.appointments.insert_many([dict(b) for b in booked])
+  await bitmap_store.days.insert_many([dict(d) for d in docs])
+  start, end = min(s["start"] for s in slots), max(s["end"] for s in slots)
+  ids = [p["id"] for p in providers]
+  probe = next(s for s in free if s["provider_id"] == "p0")
+
+  async def slot_free():
+    return [s async for s in iter_free_slots("p0", start, end)]
+
+  async def slot_common():
+    free = [{(s["start"], s["end"]) async for s in iter_free_slots(pid, start, end)} for pid in ids]
+    return set.intersection(*free)
+
+  async def slot_claim():
+    claimed = await claim_slot("p0", probe["start"], probe["end"])
+    await release_slot(claimed)
+
+  async def bitmap_claim():
+    assert await bitmap_store.claim("p0", probe["start"], probe["end"])
+    await bitmap_store.release("p0", probe["start"], probe["end"])
+
+  ops = {
+    "slots": {"free": slot_free, "common": slot_common, "claim": slot_claim},
+    "bitmap": {
+      "free": lambda: bitmap_store.find_free("p0", start, end),
+      "common": lambda: bitmap_store.find_common_free(ids, start, end),
+      "claim": bitmap_claim,
+    },
+  }
+  results = {}
+  for layout, fns in ops.items():
+    for name, fn in fns.items():
+      best, size = float("inf"), 0
+      for _ in range(repeat):
+        REPLIES.total = 0
+        t0 = time.perf_counter()
+        await fn()
+        best = min(best, time.perf_counter() - t0)
+        size = REPLIES.total
+      results[(layout, name)] = (best * 1e3, size / 1024)
+  return results
+
+def use_scratch_db(uri: str) -> str:
+  from app import db
+  os.environ["MONGO_URI"] = uri
+  db.MONGO_TLS = False
+  db.DB_NAME = f"bench_bitmap_{uuid4().hex[:8]}"
+  return db.DB_NAME
+
+def drop_scratch_db(uri: str, name: str):
+  from pymongo import MongoClient
+  from app import db
+  db.close_client()
+  with MongoClient(uri) as client:
+    client.drop_database(name)
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--mongo-uri", help="also measure Mongo round trips against this server")
+  parser.add_argument("--repeat", type=int, default=5)
+  args = parser.parse_args()
+  if args.mongo_uri:
+    from pymongo import monitoring
+    monitoring.register(REPLIES)
+  rng = random.Random(7)
+  print(f"{'providers':>9} {'layout':>7} {'docs':>6} {f'{ENCODING} KB':>8} {'free ms':>8} {'common ms':>10}")
+  round_trips = []
+  for n_providers in (2, 10, 50):
+    providers = [{"id": f"p{i}"} for i in range(n_providers)]
+    # a month of the default template
+    first_day = date(2025, 6, 1)
+    slots = [
+      slot for p in providers
+      for slot in iter_template_slots(p, first_day, first_day + timedelta(days=29))
+    ]
+    booked = rng.sample(slots, len(slots) // 4)
+    booked_by_provider = {p["id"]: [] for p in providers}
+    for b in booked:
+      booked_by_provider[b["provider_id"]].append(b)
+
+    # per-slot layout: availability docs + appointments, filtered in Python
+    by_provider = {p["id"]: [s for s in slots if s["provider_id"] == p["id"]] for p in providers}
+    slot_bytes = sum(encoded_size(s) for s in slots) + sum(encoded_size(b) for b in booked)
+
+    def slot_free():
+      return filter_conflicts(by_provider["p0"], booked_by_provider["p0"])
+
+    def slot_common():
+      free = [
+        {(s["start"], s["end"]) for s in filter_conflicts(by_provider[p["id"]], booked_by_provider[p["id"]])}
+        for p in providers
+      ]
+      return set.intersection(*free)
+
+    # bitmap layout: one doc per provider per day, booked bits cleared
+    bitmaps = slots_to_bitmaps(slots)
+    for b in booked:
+      bitmaps[(b["provider_id"], day_key(b["start"]))] &= ~interval_mask(b["start"], b["end"])
+    docs = [
+      {
+        "provider_id": pid, "day": day,
+        "open": {f"w{i}": w for i, w in enumerate(to_words(bits))},
+        "booked": {f"w{i}": 0 for i in range(WORDS)},
+      }
+      for (pid, day), bits in bitmaps.items()
+    ]
+    bitmap_bytes = sum(encoded_size(d) for d in docs)
+    days = sorted({day for _, day in bitmaps})
+
+    def bitmap_free():
+      return [s for day in days for s in free_slots("p0", day, bitmaps[("p0", day)])]
+
+    def bitmap_common():
+      return [
+        s for day in days
+        for s in free_slots("*", day, intersect(bitmaps[(p["id"], day)] for p in providers))
+      ]
+
+    assert [(s["start"], s["end"]) for s in bitmap_free()] == [(s["start"], s["end"]) for s in slot_free()]
+    assert {(s["start"], s["end"]) for s in bitmap_common()} == slot_common()
+
+    print(
+      f"{n_providers:>9} {'slots':>7} {len(slots) + len(booked):>6} {slot_bytes / 1024:>8.1f} "
+      f"{timed(slot_free):>8.2f} {timed(slot_common):>10.2f}"
+    )
+    print(
+      f"{'':>9} {'bitmap':>7} {len(docs):>6} {bitmap_bytes / 1024:>8.1f} "
+      f"{timed(bitmap_free):>8.2f} {timed(bitmap_common):>10.2f}"
+    )
+
+    if args.mongo_uri:
+      name = use_scratch_db(args.mongo_uri)
+      try:
+        round_trips.append((n_providers, asyncio.run(mongo_round_trips(providers, slots, booked, docs, args.repeat))))
+      finally:
+        drop_scratch_db(args.mongo_uri, name)
+
+  if round_trips:
+    print(f"\n{'providers':>9} {'layout':>7} {'op':>7} {'rt ms':>8} {'reply KB':>9}")
+    for n_providers, results in round_trips:
+      for (layout, op), (ms, kb) in results.items():
+        print(f"{n_providers:>9} {layout:>7} {op:>7} {ms:>8.2f} {kb:>9.1f}")
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,115 @@
+"""
+Microbenchmarks for the CPU-bound helpers.
+
+filter_conflicts: the sorted interval index against the previous quadratic
+scan for a growing number of slots/bookings, checking that both return the
+same slots (the scan is skipped above LEGACY_MAX slots).
+iter_template_slots: the slot generator over the rolling horizon.
+
+Prints a table and optionally writes JSON so runs can be compared.
+
+  python -m benchmarks.bench_conflicts [--output micro.json]
+"""
+import json
+import random
+import argparse
+import platform
+import time
+from datetime import date, datetime, timedelta, timezone
+
+from app.utils import AEST, filter_conflicts
+from app.slot_generator import HORIZON_DAYS, iter_template_slots
+from benchmarks.report import commit
+
+LEGACY_MAX = 6000
+
+def legacy_filter_conflicts(slots: list[dict], existing: list[dict]) -> list[dict]:
+  # the original implementation, kept here as the baseline
+  result = []
+  for slot in slots:
+    start_new = datetime.fromisoformat(slot["start"])
+    end_new = datetime.fromisoformat(slot["end"])
+    clash = False
+    for appointment in existing:
+      start_existing = datetime.fromisoformat(appointment["start"])
+      end_existing = datetime.fromisoformat(appointment["end"])
+      if not (end_new <= start_existing or start_new >= end_existing):
+        clash = True
+        break
+    if not clash:
+      result.append(slot)
+  return result
+
+def make_intervals(n: int, origin: datetime, rng: random.Random) -> list[dict]:
+  intervals = []
+  for _ in range(n):
+    start = origin + timedelta(minutes=30 * rng.randrange(0, 60 * 48))
+    length = timedelta(minutes=rng.choice((15, 30, 45, 60)))
+    intervals.append({"start": start.isoformat(), "end": (start + length).isoformat()})
+  return intervals
+
+def timed(fn, repeat: int) -> dict:
+  runs = []
+  for _ in range(repeat):
+    t0 = time.perf_counter()
+    fn()
+    runs.append((time.perf_counter() - t0) * 1e3)
+  runs.sort()
+  return {"best_ms": round(runs[0], 3), "median_ms": round(runs[len(runs) // 2], 3)}
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--repeat", type=int, default=5)
+  parser.add_argument("--output", help="write results as JSON to this file")
+  args = parser.parse_args()
+  rng = random.Random(42)
+  origin = datetime(2025, 5, 1, 9, tzinfo=AEST)
+  results = []
+
+  print(f"{'slots':>7} {'bookings':>9} {'legacy ms':>10} {'sweep ms':>9} {'speedup':>8}")
+  for n_slots, n_booked in ((300, 50), (1000, 200), (3000, 1000), (6000, 3000), (50_000, 50_000)):
+    slots = make_intervals(n_slots, origin, rng)
+    booked = make_intervals(n_booked, origin, rng)
+    result = {
+      "name": "filter_conflicts", "slots": n_slots, "booked": n_booked,
+      **timed(lambda: filter_conflicts(slots, booked), args.repeat),
+    }
+    legacy = "-"
+    speedup = "-"
+    if n_slots <= LEGACY_MAX:
+      assert filter_conflicts(slots, booked) == legacy_filter_conflicts(slots, booked)
+      result["legacy_ms"] = timed(lambda: legacy_filter_conflicts(slots, booked), 1)["best_ms"]
+      legacy = f"{result['legacy_ms']:.1f}"
+      speedup = f"{result['legacy_ms'] / result['best_ms']:.0f}x"
+    results.append(result)
+    print(f"{n_slots:>7} {n_booked:>9} {legacy:>10} {result['best_ms']:>9.2f} {speedup:>8}")
+
+  # a fixed start so every run covers the same weekdays and DST changes
+  first_day = date(2025, 1, 1)
+  last_day = first_day + timedelta(days=HORIZON_DAYS)
+  print(f"\n{'providers':>9} {'days':>5} {'slots':>7} {'generate ms':>12}")
+  for n_providers in (1, 10, 100):
+    providers = [{"id": f"p{i}"} for i in range(n_providers)]
+
+    def generate():
+      return [slot for p in providers for slot in iter_template_slots(p, first_day, last_day)]
+    result = {
+      "name": "iter_template_slots", "providers": n_providers, "days": HORIZON_DAYS,
+      "slots": len(generate()),
+      **timed(generate, args.repeat),
+    }
+    results.append(result)
+    print(f"{n_providers:>9} {HORIZON_DAYS:>5} {result['slots']:>7} {result['best_ms']:>12.2f}")
+
+  if args.output:
+    with open(args.output, "w") as f:
+      json.dump({
+        "suite": "micro",
+        "commit": commit(),
+        "python": platform.python_version(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "results": results,
+      }, f, indent=2)
+
+if __name__ == "__main__":
+  main()
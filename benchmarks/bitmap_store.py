@@ -0,0 +1,117 @@
+from datetime import datetime, timedelta
+from pymongo import ASCENDING, UpdateOne
+from app.db import mongo
+from app.utils import day_key
+from benchmarks.bitmaps import (
+  WORDS, interval_mask, to_words, from_words,
+  slots_to_bitmaps, free_slots, intersect,
+)
+
+# Alternative availability layout: one document per provider per
+# clinic-local day instead of one per slot,
+#   {"provider_id", "day": "YYYY-MM-DD",
+#    "open":   {"w0": int, ..., "w5": int},   # bookable time
+#    "booked": {"w0": int, ..., "w5": int}}   # claimed time
+# Free time is open & ~booked. Booking sets bits with $bit, guarded by
+# $bitsAllSet/$bitsAllClear, so a claim is one atomic update.
+# Experiment only, measured against the per-slot collection by
+# benchmarks.bench_bitmap --mongo-uri; the app never reads or writes it.
+days = mongo.availability_days
+
+async def ensure_indexes():
+  await days.create_index([("provider_id", ASCENDING), ("day", ASCENDING)], unique=True)
+
+def _word_ops(mask: int) -> list[tuple[str, int]]:
+  return [(f"w{i}", word) for i, word in enumerate(to_words(mask)) if word]
+
+async def write_open(slots) -> int:
+  """
+  OR per-slot documents into the day bitmaps with one bulk write.
+  Idempotent: re-adding open time that is already set changes nothing.
+  """
+  ops = []
+  for (provider_id, day), bits in slots_to_bitmaps(slots).items():
+    update = {"$bit": {f"open.{w}": {"or": word} for w, word in _word_ops(bits)}}
+    # booked words must exist for $bitsAllClear to match
+    update["$setOnInsert"] = {f"booked.w{i}": 0 for i in range(WORDS)}
+    ops.append(UpdateOne({"provider_id": provider_id, "day": day}, update, upsert=True))
+  if not ops:
+    return 0
+  result = await days.bulk_write(ops, ordered=False)
+  return result.upserted_count + result.modified_count
+
+def _free_bits(doc: dict) -> int:
+  open_bits = from_words(doc.get("open", {}).get(f"w{i}", 0) for i in range(WORDS))
+  booked = from_words(doc.get("booked", {}).get(f"w{i}", 0) for i in range(WORDS))
+  return open_bits & ~booked
+
+async def _day_docs(provider_ids: list[str], start: datetime, end: datetime):
+  return await days.find({
+    "provider_id": {"$in": provider_ids},
+    "day": {"$gte": day_key(start), "$lte": day_key(end)},
+  }, {"_id": 0}).to_list(None)
+
+def _in_window(slots: list[dict], start: datetime, end: datetime) -> list[dict]:
+  return [s for s in slots if s["start"] >= start and s["end"] <= end]
+
+async def find_free(provider_id: str, start: datetime, end: datetime, duration: int = 30) -> list[dict]:
+  """Free `duration`-minute slots in [start, end] for one provider."""
+  slots = []
+  for doc in sorted(await _day_docs([provider_id], start, end), key=lambda d: d["day"]):
+    slots.extend(free_slots(provider_id, doc["day"], _free_bits(doc), duration))
+  return _in_window(slots, start, end)
+
+async def find_common_free(provider_ids: list[str], start: datetime, end: datetime, duration: int = 30) -> list[dict]:
+  """Slots when every listed provider is free: one AND per day."""
+  by_day: dict[str, list[int]] = {}
+  for doc in await _day_docs(provider_ids, start, end):
+    by_day.setdefault(doc["day"], []).append(_free_bits(doc))
+  slots = []
+  for day in sorted(by_day):
+    if len(by_day[day]) == len(provider_ids):
+      for slot in free_slots(",".join(provider_ids), day, intersect(by_day[day]), duration):
+        slot.pop("provider_id")
+        slot["provider_ids"] = provider_ids
+        slots.append(slot)
+  return _in_window(slots, start, end)
+
+def _claim_filter(provider_id: str, start: datetime, end: datetime) -> tuple[dict, list]:
+  words = _word_ops(interval_mask(start, end))
+  query = {"provider_id": provider_id, "day": day_key(start)}
+  for w, word in words:
+    query[f"open.{w}"] = {"$bitsAllSet": word}
+    query[f"booked.{w}"] = {"$bitsAllClear": word}
+  return query, words
+
+async def claim(provider_id: str, start: datetime, end: datetime) -> bool:
+  """Atomically flip the interval's bits to booked; False if any were taken."""
+  query, words = _claim_filter(provider_id, start, end)
+  if not words:
+    return False
+  result = await days.update_one(
+    query, {"$bit": {f"booked.{w}": {"or": word} for w, word in words}}
+  )
+  return result.modified_count == 1
+
+async def release(provider_id: str, start: datetime, end: datetime):
+  # clear the booked bits again (rollback or cancellation)
+  words = _word_ops(interval_mask(start, end))
+  if words:
+    await days.update_one(
+      {"provider_id": provider_id, "day": day_key(start)},
+      {"$bit": {f"booked.{w}": {"and": ~word} for w, word in words}}
+    )
+
+async def migrate_from_slots(start: datetime, end: datetime, chunk_days: int = 7) -> int:
+  """Copy the per-slot availability collection into the day bitmaps."""
+  written = 0
+  cursor_start = start
+  while cursor_start < end:
+    cursor_end = min(end, cursor_start + timedelta(days=chunk_days))
+    slots = await mongo.availability.find(
+      {"start": {"$gte": cursor_start, "$lt": cursor_end}},
+      {"_id": 0, "provider_id": 1, "start": 1, "end": 1}
+    ).to_list(None)
+    written += await write_open(slots)
+    cursor_start = cursor_end
+  return written
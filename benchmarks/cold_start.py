@@ -0,0 +1,90 @@
+"""
+Cold start per worker: how long `import app.main` takes in a fresh
+interpreter, and (with --serve) how long uvicorn takes until /health/live
+and /health/ready answer. Fails when the median is over the budget.
+
+  python -m benchmarks.cold_start --runs 5
+  MONGO_TLS=false MONGO_URI=mongodb://127.0.0.1:27017 \\
+    python -m benchmarks.cold_start --serve --output cold_start.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+from datetime import datetime, timezone
+import httpx
+
+from benchmarks.report import commit
+
+def import_seconds() -> float:
+  # timed inside the child so interpreter startup itself is excluded
+  code = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+  out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+  return float(out.stdout.strip().splitlines()[-1])
+
+def serve_seconds(port: int, timeout: float = 60) -> dict:
+  started = time.perf_counter()
+  proc = subprocess.Popen(
+    [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+    stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT,
+  )
+  result = {"live_s": None, "ready_s": None}
+  try:
+    with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=2) as client:
+      while time.perf_counter() - started < timeout and result["ready_s"] is None:
+        for name, path in (("live_s", "/health/live"), ("ready_s", "/health/ready")):
+          if result[name] is None:
+            try:
+              if client.get(path).status_code == 200:
+                result[name] = round(time.perf_counter() - started, 3)
+            except httpx.TransportError:
+              pass
+        time.sleep(0.05)
+  finally:
+    proc.terminate()
+    proc.wait(timeout=15)
+  return result
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--runs", type=int, default=5)
+  parser.add_argument("--serve", action="store_true", help="also time uvicorn until live/ready")
+  parser.add_argument("--port", type=int, default=8200)
+  parser.add_argument("--budget", type=float, default=float(os.getenv("STARTUP_BUDGET_SECONDS", 5)))
+  parser.add_argument("--output", help="write results as JSON to this file")
+  args = parser.parse_args()
+
+  imports = [import_seconds() for _ in range(args.runs)]
+  results = {"import_s": {
+    "median": round(statistics.median(imports), 3), "min": round(min(imports), 3), "max": round(max(imports), 3),
+  }}
+  print(f"import app.main  median {results['import_s']['median']:.3f}s  (budget {args.budget:.1f}s)")
+  worst = results["import_s"]["median"]
+  if args.serve:
+    runs = [serve_seconds(args.port) for _ in range(args.runs)]
+    for name in ("live_s", "ready_s"):
+      values = [r[name] for r in runs if r[name] is not None]
+      results[name] = {"median": round(statistics.median(values), 3) if values else None, "failed": len(runs) - len(values)}
+      print(f"{name[:-2]:>5} after   median {results[name]['median']}s  ({results[name]['failed']} never answered)")
+    worst = max(worst, results["ready_s"]["median"] or float("inf"))
+
+  if args.output:
+    with open(args.output, "w") as f:
+      json.dump({
+        "suite": "cold_start",
+        "commit": commit(),
+        "python": platform.python_version(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "budget_s": args.budget,
+        "within_budget": worst <= args.budget,
+        "results": results,
+      }, f, indent=2)
+  if worst > args.budget:
+    sys.exit(f"cold start {worst:.2f}s is over the {args.budget:.1f}s budget")
+
+if __name__ == "__main__":
+  main()
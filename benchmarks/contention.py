@@ -0,0 +1,53 @@
+"""
+Double-booking check: fire many parallel bookings at one open slot of a
+running server and verify exactly one succeeds (the rest get 409).
+
+  python -m benchmarks.contention --base-url http://localhost:8000 \
+    --provider sreshtaaias@gmail.com --requests 300
+"""
+import argparse
+import asyncio
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+import httpx
+
+async def first_open_slot(client: httpx.AsyncClient, provider_id: str) -> dict:
+  now = datetime.now(timezone.utc)
+  resp = await client.get(f"/availability/{provider_id}", params={
+    "start": now.isoformat(),
+    "end": (now + timedelta(days=31)).isoformat(),
+  })
+  resp.raise_for_status()
+  slots = resp.json()["available"]
+  if not slots:
+    raise SystemExit(f"no open slots for {provider_id}")
+  return slots[0]
+
+async def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--base-url", default="http://localhost:8000")
+  parser.add_argument("--provider", required=True)
+  parser.add_argument("--requests", type=int, default=300)
+  args = parser.parse_args()
+
+  limits = httpx.Limits(max_connections=args.requests)
+  async with httpx.AsyncClient(base_url=args.base_url, timeout=60, limits=limits) as client:
+    slot = await first_open_slot(client, args.provider)
+    body = {
+      "provider_id": args.provider,
+      "start": slot["start"],
+      "end": slot["end"],
+      "notes": "contention test",
+      "patient": {"name": "Load Test", "email": "load-test@example.com", "conditions": ""},
+    }
+    responses = await asyncio.gather(*(
+      client.post("/book/", json=body) for _ in range(args.requests)
+    ))
+
+  statuses = Counter(r.status_code for r in responses)
+  print(f"slot {slot['start']}: {dict(statuses)}")
+  if statuses.get(200) != 1:
+    raise SystemExit(f"expected exactly one winner, got {statuses.get(200, 0)}")
+
+if __name__ == "__main__":
+  asyncio.run(main())
@@ -0,0 +1,184 @@
+"""
+Local stand-ins for the external services, so the app can be benchmarked
+offline:
+
+  - Google Calendar REST (events list/insert/delete and the batch endpoint)
+  - an OpenAI-compatible chat completions server
+  - an SMTP sink that accepts and discards mail
+
+Each answers after a configurable latency.
+
+  python -m benchmarks.fake_services --calendar-port 9001 --openai-port 9002 \\
+    --smtp-port 1025 --calendar-latency 40 --openai-latency 600
+
+then run the app with
+  GOOGLE_CALENDAR_BASE_URL=http://127.0.0.1:9001
+  OPENAI_BASE_URL=http://127.0.0.1:9002/v1 OPENAI_API_KEY=fake
+  SMTP_HOST=127.0.0.1 SMTP_PORT=1025 SMTP_STARTTLS=false SMTP_USER=
+"""
+import re
+import json
+import time
+import asyncio
+import argparse
+from uuid import uuid4
+from fastapi import FastAPI, Request, Response
+import uvicorn
+
+stats = {"calendar_requests": 0, "openai_requests": 0, "smtp_messages": 0}
+
+# --- Google Calendar ---
+
+def calendar_app(latency: float) -> FastAPI:
+  app = FastAPI()
+
+  def event(body: dict) -> dict:
+    event_id = body.get("id") or uuid4().hex
+    return {**body, "id": event_id, "status": "confirmed", "htmlLink": f"http://fake-calendar/{event_id}"}
+
+  @app.get("/calendar/v3/calendars/{calendar_id}/events")
+  async def list_events(calendar_id: str):
+    stats["calendar_requests"] += 1
+    await asyncio.sleep(latency)
+    return {"items": [], "nextSyncToken": uuid4().hex}
+
+  @app.post("/calendar/v3/calendars/{calendar_id}/events")
+  async def insert_event(calendar_id: str, request: Request):
+    stats["calendar_requests"] += 1
+    await asyncio.sleep(latency)
+    return event(await request.json())
+
+  @app.delete("/calendar/v3/calendars/{calendar_id}/events/{event_id}")
+  async def delete_event(calendar_id: str, event_id: str):
+    stats["calendar_requests"] += 1
+    await asyncio.sleep(latency)
+    return Response(status_code=204)
+
+  @app.post("/batch/calendar/v3")
+  async def batch(request: Request):
+    # one round trip for the whole batch, like the real endpoint
+    stats["calendar_requests"] += 1
+    await asyncio.sleep(latency)
+    boundary = re.search(r"boundary=([^;]+)", request.headers["content-type"]).group(1).strip('"')
+    parts = []
+    for part in (await request.body()).decode().split(f"--{boundary}"):
+      part = part.strip()
+      if not part or part == "--":
+        continue
+      outer, _, inner = part.replace("\r\n", "\n").partition("\n\n")
+      content_id = re.search(r"Content-ID:\s*<item-(\d+)>", outer, re.I).group(1)
+      request_line, _, rest = inner.partition("\n")
+      method = request_line.split()[0]
+      _, _, payload = rest.partition("\n\n")
+      if method == "DELETE":
+        status, body = "204 No Content", ""
+      else:
+        status, body = "200 OK", json.dumps(event(json.loads(payload.strip() or "{}")))
+      parts.append(
+        f"--{boundary}\r\n"
+        "Content-Type: application/http\r\n"
+        f"Content-ID: <response-item-{content_id}>\r\n\r\n"
+        f"HTTP/1.1 {status}\r\n"
+        "Content-Type: application/json\r\n\r\n"
+        f"{body}\r\n"
+      )
+    parts.append(f"--{boundary}--\r\n")
+    return Response("".join(parts), media_type=f"multipart/mixed; boundary={boundary}")
+
+  return app
+
+# --- OpenAI ---
+
+def openai_app(latency: float) -> FastAPI:
+  app = FastAPI()
+
+  @app.post("/v1/chat/completions")
+  async def completions(request: Request):
+    stats["openai_requests"] += 1
+    body = await request.json()
+    await asyncio.sleep(latency)
+    prompt = body["messages"][-1]["content"]
+    # pick the first three candidate ids the prompt offers
+    ids = list(dict.fromkeys(re.findall(r"\bs\d+\b", prompt)))[:3]
+    content = json.dumps([{"id": i, "reason": "Fits the patient's preferences."} for i in ids])
+    return {
+      "id": f"chatcmpl-{uuid4().hex}",
+      "object": "chat.completion",
+      "created": int(time.time()),
+      "model": body.get("model", "fake"),
+      "choices": [{
+        "index": 0,
+        "message": {"role": "assistant", "content": content},
+        "finish_reason": "stop",
+      }],
+      "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4, "total_tokens": 0},
+    }
+
+  return app
+
+# --- SMTP sink ---
+
+async def smtp_session(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, latency: float):
+  def reply(line: str):
+    writer.write(f"{line}\r\n".encode())
+
+  reply("220 fake-smtp ready")
+  try:
+    while line := await reader.readline():
+      command = line.decode(errors="replace").strip().upper()
+      if command.startswith("EHLO"):
+        writer.write(b"250-fake-smtp\r\n250-8BITMIME\r\n250 SIZE 52428800\r\n")
+      elif command.startswith(("HELO", "MAIL", "RCPT", "RSET", "NOOP")):
+        reply("250 OK")
+      elif command == "DATA":
+        reply("354 End data with <CR><LF>.<CR><LF>")
+        await writer.drain()
+        while (await reader.readline()) not in (b".\r\n", b".\n", b""):
+          pass
+        await asyncio.sleep(latency)
+        stats["smtp_messages"] += 1
+        reply("250 OK queued")
+      elif command == "QUIT":
+        reply("221 Bye")
+        break
+      else:
+        reply("502 Command not implemented")
+      await writer.drain()
+  finally:
+    writer.close()
+
+# --- runner ---
+
+async def serve(args):
+  servers = [
+    uvicorn.Server(uvicorn.Config(
+      calendar_app(args.calendar_latency / 1e3), host=args.host, port=args.calendar_port, log_level="warning"
+    )),
+    uvicorn.Server(uvicorn.Config(
+      openai_app(args.openai_latency / 1e3), host=args.host, port=args.openai_port, log_level="warning"
+    )),
+  ]
+  smtp = await asyncio.start_server(
+    lambda r, w: smtp_session(r, w, args.smtp_latency / 1e3), args.host, args.smtp_port
+  )
+  print(
+    f"fake calendar :{args.calendar_port}, openai :{args.openai_port}, smtp :{args.smtp_port}",
+    flush=True,
+  )
+  async with smtp:
+    await asyncio.gather(*(server.serve() for server in servers))
+  print(json.dumps(stats), flush=True)
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--host", default="127.0.0.1")
+  parser.add_argument("--calendar-port", type=int, default=9001)
+  parser.add_argument("--openai-port", type=int, default=9002)
+  parser.add_argument("--smtp-port", type=int, default=1025)
+  parser.add_argument("--calendar-latency", type=float, default=40, help="ms per request")
+  parser.add_argument("--openai-latency", type=float, default=600, help="ms per completion")
+  parser.add_argument("--smtp-latency", type=float, default=5, help="ms per message")
+  asyncio.run(serve(parser.parse_args()))
+
+if __name__ == "__main__":
+  main()
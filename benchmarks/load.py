@@ -0,0 +1,253 @@
+"""
+Load driver for /availability, /recommend and /book.
+
+Starts the fake Calendar/OpenAI/SMTP services (benchmarks.fake_services),
+optionally a throwaway local mongod, and the app itself under uvicorn, then
+runs each endpoint at several concurrency levels and reports p50/p95/p99
+latency and throughput. Results go to stdout and, with --output, to JSON.
+
+  # local mongod already running without TLS
+  python -m benchmarks.load --mongo-uri mongodb://127.0.0.1:27017 --output load.json
+
+  # start a temporary mongod from PATH
+  python -m benchmarks.load --spawn-mongod --concurrency 1,8,32 --requests 400
+
+  # or drive an already running server (no services are started)
+  python -m benchmarks.load --base-url http://localhost:8000
+"""
+import os
+import sys
+import math
+import json
+import time
+import random
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+from collections import Counter
+from contextlib import ExitStack
+from datetime import datetime, timedelta, timezone
+import httpx
+
+from benchmarks.report import commit
+
+PROVIDERS = ["sreshtaaias@gmail.com", "sreshtaa.t@gmail.com"]
+
+def percentile(sorted_ms: list[float], p: float) -> float | None:
+  # nearest-rank
+  if not sorted_ms:
+    return None
+  return round(sorted_ms[max(0, math.ceil(p * len(sorted_ms)) - 1)], 2)
+
+def spawn(cmd: list[str], env: dict | None = None, log=None) -> subprocess.Popen:
+  return subprocess.Popen(cmd, env=env, stdout=log or subprocess.DEVNULL, stderr=subprocess.STDOUT)
+
+def stop(proc: subprocess.Popen):
+  proc.terminate()
+  try:
+    proc.wait(timeout=15)
+  except subprocess.TimeoutExpired:
+    proc.kill()
+
+async def wait_ready(base_url: str, timeout: float = 120):
+  deadline = time.monotonic() + timeout
+  async with httpx.AsyncClient(base_url=base_url, timeout=5) as client:
+    while time.monotonic() < deadline:
+      try:
+        if (await client.get("/health/ready")).status_code == 200:
+          return
+      except httpx.TransportError:
+        pass
+      await asyncio.sleep(0.5)
+  raise SystemExit(f"{base_url} did not come up within {timeout:.0f}s")
+
+def window(days: int) -> tuple[str, str]:
+  now = datetime.now(timezone.utc)
+  return now.isoformat(), (now + timedelta(days=days)).isoformat()
+
+def patient(i: int, unique: bool) -> dict:
+  # unique conditions defeat the recommendation cache so every call reaches the LLM
+  return {
+    "name": f"Load Test {i}",
+    "email": f"load{i}@example.com",
+    "preferences": {"prefers_morning": bool(i % 2)},
+    "conditions": f"checkup {i}" if unique else "checkup",
+  }
+
+async def free_slots(client: httpx.AsyncClient, days: int) -> list[dict]:
+  start, end = window(days)
+  slots = []
+  for pid in PROVIDERS:
+    resp = await client.get(f"/availability/{pid}", params={"start": start, "end": end})
+    resp.raise_for_status()
+    slots.extend(resp.json()["available"])
+  random.Random(1).shuffle(slots)
+  return slots
+
+def request_factory(endpoint: str, args, slots: list[dict]):
+  start, end = window(args.window_days)
+
+  def availability(i: int):
+    return "GET", f"/availability/{PROVIDERS[i % len(PROVIDERS)]}", {"params": {"start": start, "end": end}}
+
+  def recommend(i: int):
+    return "POST", "/recommend/", {"json": {
+      "provider_id": PROVIDERS[i % len(PROVIDERS)],
+      "start": start, "end": end,
+      "patient": patient(i, args.unique_patients),
+    }}
+
+  def book(i: int):
+    if not slots:
+      return None
+    slot = slots.pop()
+    return "POST", "/book/", {"json": {
+      "provider_id": slot["provider_id"],
+      "start": slot["start"], "end": slot["end"],
+      "notes": "load test",
+      "patient": patient(i, True),
+    }}
+
+  return {"availability": availability, "recommend": recommend, "book": book}[endpoint]
+
+async def run_level(client: httpx.AsyncClient, make_request, concurrency: int, total: int) -> dict:
+  latencies, statuses = [], Counter()
+  counter = iter(range(total))
+
+  async def worker():
+    for i in counter:
+      request = make_request(i)
+      if request is None:
+        statuses["skipped"] += 1
+        continue
+      method, url, kwargs = request
+      t0 = time.perf_counter()
+      try:
+        resp = await client.request(method, url, **kwargs)
+        statuses[str(resp.status_code)] += 1
+      except httpx.HTTPError as e:
+        statuses[type(e).__name__] += 1
+        continue
+      latencies.append((time.perf_counter() - t0) * 1e3)
+
+  started = time.perf_counter()
+  await asyncio.gather(*(worker() for _ in range(concurrency)))
+  elapsed = time.perf_counter() - started
+  latencies.sort()
+  ok = sum(n for s, n in statuses.items() if s.startswith("2"))
+  return {
+    "concurrency": concurrency,
+    "requests": sum(statuses.values()),
+    "ok": ok,
+    "statuses": dict(statuses),
+    "elapsed_s": round(elapsed, 3),
+    "throughput_rps": round(ok / elapsed, 2) if elapsed else None,
+    "latency_ms": {
+      "p50": percentile(latencies, 0.50),
+      "p95": percentile(latencies, 0.95),
+      "p99": percentile(latencies, 0.99),
+      "max": round(latencies[-1], 2) if latencies else None,
+      "mean": round(sum(latencies) / len(latencies), 2) if latencies else None,
+    },
+  }
+
+async def drive(args) -> list[dict]:
+  levels = [int(c) for c in args.concurrency.split(",")]
+  limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+  results = []
+  async with httpx.AsyncClient(base_url=args.base_url, timeout=120, limits=limits) as client:
+    for endpoint in args.endpoints.split(","):
+      # bookings consume slots: fetch enough open ones up front
+      slots = await free_slots(client, args.window_days) if endpoint == "book" else []
+      make_request = request_factory(endpoint, args, slots)
+      for concurrency in levels:
+        # warm-up pass so connection setup and cold caches are not measured
+        await run_level(client, make_request, concurrency, min(args.warmup, args.requests))
+        result = {"endpoint": endpoint, **await run_level(client, make_request, concurrency, args.requests)}
+        results.append(result)
+        lat = result["latency_ms"]
+        print(
+          f"{endpoint:>12} c={concurrency:<4} {result['throughput_rps'] or 0:>9.1f} req/s  "
+          f"p50 {lat['p50']} ms  p95 {lat['p95']} ms  p99 {lat['p99']} ms  {result['statuses']}",
+          flush=True,
+        )
+  return results
+
+def app_env(args, mongo_uri: str) -> dict:
+  return {
+    **os.environ,
+    "MONGO_URI": mongo_uri,
+    "MONGO_TLS": "false",
+    "GOOGLE_CALENDAR_BASE_URL": f"http://127.0.0.1:{args.calendar_port}",
+    "GOOGLE_APPLICATION_CREDENTIALS": "",
+    "OPENAI_BASE_URL": f"http://127.0.0.1:{args.openai_port}/v1",
+    "OPENAI_API_KEY": "fake",
+    "SMTP_HOST": "127.0.0.1",
+    "SMTP_PORT": str(args.smtp_port),
+    "SMTP_STARTTLS": "false",
+    "SMTP_USER": "",
+    "SMTP_FROM": "Load Test <load@example.com>",
+  }
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--base-url", help="drive this running server instead of starting one")
+  parser.add_argument("--mongo-uri", default="mongodb://127.0.0.1:27017")
+  parser.add_argument("--spawn-mongod", action="store_true", help="start a temporary mongod from PATH")
+  parser.add_argument("--app-port", type=int, default=8100)
+  parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the app")
+  parser.add_argument("--calendar-port", type=int, default=9001)
+  parser.add_argument("--openai-port", type=int, default=9002)
+  parser.add_argument("--smtp-port", type=int, default=1025)
+  parser.add_argument("--calendar-latency", type=float, default=40, help="ms")
+  parser.add_argument("--openai-latency", type=float, default=600, help="ms")
+  parser.add_argument("--endpoints", default="availability,recommend,book")
+  parser.add_argument("--concurrency", default="1,8,32,64")
+  parser.add_argument("--requests", type=int, default=200, help="per endpoint and concurrency level")
+  parser.add_argument("--warmup", type=int, default=20)
+  parser.add_argument("--window-days", type=int, default=14)
+  parser.add_argument("--unique-patients", action="store_true", help="bypass the recommendation cache")
+  parser.add_argument("--output", help="write results as JSON to this file")
+  args = parser.parse_args()
+
+  with ExitStack() as stack:
+    if not args.base_url:
+      mongo_uri = args.mongo_uri
+      if args.spawn_mongod:
+        dbpath = stack.enter_context(tempfile.TemporaryDirectory(prefix="bench-mongod-"))
+        mongod = spawn(["mongod", "--dbpath", dbpath, "--port", "27117", "--bind_ip", "127.0.0.1", "--quiet"])
+        stack.callback(stop, mongod)
+        mongo_uri = "mongodb://127.0.0.1:27117"
+      fakes = spawn([
+        sys.executable, "-m", "benchmarks.fake_services",
+        "--calendar-port", str(args.calendar_port), "--openai-port", str(args.openai_port),
+        "--smtp-port", str(args.smtp_port),
+        "--calendar-latency", str(args.calendar_latency), "--openai-latency", str(args.openai_latency),
+      ])
+      stack.callback(stop, fakes)
+      app = spawn([
+        sys.executable, "-m", "uvicorn", "app.main:app",
+        "--port", str(args.app_port), "--workers", str(args.workers), "--log-level", "warning",
+      ], env=app_env(args, mongo_uri))
+      stack.callback(stop, app)
+      args.base_url = f"http://127.0.0.1:{args.app_port}"
+      asyncio.run(wait_ready(args.base_url))
+
+    results = asyncio.run(drive(args))
+
+  if args.output:
+    options = {k: v for k, v in vars(args).items() if k != "output"}
+    with open(args.output, "w") as f:
+      json.dump({
+        "suite": "load",
+        "commit": commit(),
+        "python": platform.python_version(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "options": options,
+        "results": results,
+      }, f, indent=2)
+
+if __name__ == "__main__":
+  main()
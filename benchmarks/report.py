@@ -0,0 +1,11 @@
+import subprocess
+
+# shared by the suites that write JSON, so runs can be diffed by commit
+
+def commit() -> str | None:
+  try:
+    return subprocess.run(
+      ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+    ).stdout.strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
@@ -0,0 +1,141 @@
+import os
+import sys
+import time
+import shutil
+import socket
+import tempfile
+import threading
+import subprocess
+import socketserver
+from uuid import uuid4
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Tests that need Mongo run against a local mongod: MONGO_TEST_URI if set,
+# otherwise a throwaway one started from PATH. Without either (or without
+# Motor installed) they are skipped; the pure helpers always run.
+
+def _free_port() -> int:
+  with socket.socket() as s:
+    s.bind(("127.0.0.1", 0))
+    return s.getsockname()[1]
+
+def _wait_for_port(port: int, timeout: float):
+  deadline = time.monotonic() + timeout
+  while time.monotonic() < deadline:
+    try:
+      socket.create_connection(("127.0.0.1", port), timeout=1).close()
+      return
+    except OSError:
+      time.sleep(0.2)
+  raise RuntimeError(f"mongod did not listen on {port} within {timeout:.0f}s")
+
+@pytest.fixture(scope="session")
+def mongo_uri():
+  pytest.importorskip("motor")
+  if os.getenv("MONGO_TEST_URI"):
+    yield os.environ["MONGO_TEST_URI"]
+    return
+  mongod = shutil.which("mongod")
+  if mongod is None:
+    pytest.skip("needs a local mongod (on PATH, or MONGO_TEST_URI)")
+  with tempfile.TemporaryDirectory(prefix="test-mongod-") as dbpath:
+    port = _free_port()
+    proc = subprocess.Popen(
+      [mongod, "--dbpath", dbpath, "--port", str(port), "--bind_ip", "127.0.0.1", "--quiet"],
+      stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT
+    )
+    try:
+      _wait_for_port(port, 30)
+      yield f"mongodb://127.0.0.1:{port}"
+    finally:
+      proc.terminate()
+      proc.wait(timeout=15)
+
+@pytest.fixture
+def mongo_db(mongo_uri, monkeypatch):
+  # app.db.mongo pointed at a fresh database, dropped afterwards
+  from pymongo import MongoClient
+  from app import db
+  name = f"test_{uuid4().hex[:12]}"
+  monkeypatch.setenv("MONGO_URI", mongo_uri)
+  monkeypatch.setattr(db, "MONGO_TLS", False)
+  monkeypatch.setattr(db, "DB_NAME", name)
+  db.close_client()
+  yield name
+  db.close_client()
+  with MongoClient(mongo_uri) as client:
+    client.drop_database(name)
+
+# --- SMTP ---
+
+class _SmtpHandler(socketserver.StreamRequestHandler):
+  def reply(self, line: str):
+    self.wfile.write(f"{line}\r\n".encode())
+
+  def handle(self):
+    sink = self.server.sink
+    with sink.lock:
+      sink.connections += 1
+    self.reply("220 test-smtp ready")
+    while line := self.rfile.readline():
+      command = line.decode(errors="replace").strip().upper()
+      if command.startswith("EHLO"):
+        self.wfile.write(b"250-test-smtp\r\n250 8BITMIME\r\n")
+      elif command.startswith(("HELO", "MAIL", "RCPT", "RSET", "NOOP")):
+        self.reply("250 OK")
+      elif command == "DATA":
+        self.reply("354 End data with <CR><LF>.<CR><LF>")
+        while self.rfile.readline() not in (b".\r\n", b".\n", b""):
+          pass
+        with sink.lock:
+          rejected = sink.reject > 0
+          if rejected:
+            sink.reject -= 1
+          else:
+            sink.messages += 1
+        self.reply("451 Try again later" if rejected else "250 OK queued")
+        if sink.drop_after_message and not rejected:
+          return
+      elif command == "QUIT":
+        self.reply("221 Bye")
+        return
+      else:
+        self.reply("502 Command not implemented")
+
+class SmtpSink:
+  """
+  Local debugging SMTP server on a background thread. Counts connections
+  and accepted messages; `reject` makes the next n messages fail with a
+  451 and `drop_after_message` hangs up after every accepted one.
+  """
+  def __init__(self):
+    self.lock = threading.Lock()
+    self.connections = 0
+    self.messages = 0
+    self.reject = 0
+    self.drop_after_message = False
+    self.server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _SmtpHandler)
+    self.server.daemon_threads = True
+    self.server.sink = self
+    self.port = self.server.server_address[1]
+    self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+    self._thread.start()
+
+  def close(self):
+    self.server.shutdown()
+    self.server.server_close()
+
+@pytest.fixture
+def smtp_sink(monkeypatch):
+  # app.utils_mail pointed at the sink, plain SMTP without TLS or auth
+  from app import utils_mail
+  sink = SmtpSink()
+  monkeypatch.setattr(utils_mail, "SMTP_HOST", "127.0.0.1")
+  monkeypatch.setattr(utils_mail, "SMTP_PORT", sink.port)
+  monkeypatch.setattr(utils_mail, "SMTP_STARTTLS", False)
+  monkeypatch.setattr(utils_mail, "SMTP_USER", "")
+  monkeypatch.setattr(utils_mail, "SMTP_FROM", "test@example.com")
+  yield sink
+  sink.close()
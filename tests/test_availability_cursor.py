@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+
+pytest.importorskip("fastapi")
+from fastapi import HTTPException
+from app.routes.availability import decode_cursor, encode_cursor
+from app.utils import AEST
+
+def test_cursor_round_trip():
+  for start in (
+    datetime(2025, 6, 2, 23, 30, tzinfo=timezone.utc),
+    datetime(2025, 6, 2, 9, 0, 0, 123456, tzinfo=timezone.utc),
+    datetime(2025, 6, 2, 9, 30, tzinfo=AEST),
+  ):
+    cursor = encode_cursor(start)
+    assert "=" not in cursor and "/" not in cursor and "+" not in cursor
+    decoded = decode_cursor(cursor)
+    assert decoded == start
+    assert decoded.utcoffset() == timedelta(0)
+
+def test_bad_cursor_is_400():
+  for cursor in ("not-a-cursor", encode_cursor(datetime(2025, 6, 2, tzinfo=timezone.utc))[:-3]):
+    with pytest.raises(HTTPException) as e:
+      decode_cursor(cursor)
+    assert e.value.status_code == 400
+
+def test_ndjson_page_ends_with_cursor_after_last_slot():
+  import json
+  import asyncio
+  from app.routes.availability import _ndjson
+  base = datetime(2025, 6, 2, 9, tzinfo=timezone.utc)
+  closed = []
+
+  async def slots(n: int):
+    try:
+      for i in range(n):
+        start = base + timedelta(minutes=30 * i)
+        yield {"provider_id": "p", "start": start, "end": start + timedelta(minutes=30)}
+    finally:
+      closed.append(n)
+
+  async def lines(n: int, limit):
+    return [json.loads(line) async for line in _ndjson(slots(n), limit)]
+
+  page = asyncio.run(lines(5, 2))
+  assert [line.get("start") for line in page[:2]] == [base.isoformat(), (base + timedelta(minutes=30)).isoformat()]
+  assert decode_cursor(page[2]["next"]) == base + timedelta(minutes=30)
+  # a page that holds everything, or no limit at all, has no cursor
+  assert "next" not in asyncio.run(lines(2, 2))[-1]
+  assert len(asyncio.run(lines(3, None))) == 3
+  assert asyncio.run(lines(0, 2)) == []
+  assert closed == [5, 2, 3, 0]
@@ -0,0 +1,39 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from app.utils import AEST
+
+PROVIDER = "dr.test@example.com"
+
+def existing_slots(days: int = 3, per_day: int = 4) -> list[dict]:
+  # slots from before the counters existed, starting tomorrow 09:00 clinic time
+  tomorrow = datetime.now(AEST).date() + timedelta(days=1)
+  slots = []
+  for d in range(days):
+    nine = datetime.combine(tomorrow + timedelta(days=d), datetime.min.time(), tzinfo=AEST) + timedelta(hours=9)
+    for i in range(per_day):
+      start = (nine + timedelta(minutes=30 * i)).astimezone(timezone.utc)
+      slots.append({"provider_id": PROVIDER, "start": start, "end": start + timedelta(minutes=30)})
+  return slots
+
+def test_counters_built_for_existing_slots(mongo_db):
+  from app import db, availability_summary
+  from app.utils import day_key
+  from app.slots import claim_slot
+
+  async def scenario():
+    await db.ensure_indexes()
+    slots = existing_slots()
+    await db.mongo.availability.insert_many([dict(s) for s in slots])
+    built = await availability_summary.ensure_built([PROVIDER], 90)
+    again = await availability_summary.ensure_built([PROVIDER], 90)
+    # the first claim after the build decrements a real count, not zero
+    first = slots[0]
+    assert await claim_slot(PROVIDER, first["start"], first["end"]) is not None
+    days = sorted({day_key(s["start"]) for s in slots})
+    counts = await availability_summary.fetch([PROVIDER], days[0], days[-1])
+    return built, again, days, counts[PROVIDER]
+
+  built, again, days, counts = asyncio.run(scenario())
+  assert built == 3
+  assert again is None
+  assert counts == {days[0]: 3, days[1]: 4, days[2]: 4}
@@ -0,0 +1,99 @@
+from datetime import date, datetime, timedelta, timezone
+from app.utils import AEST
+from benchmarks.bitmaps import (
+  BITS_PER_DAY, DAY_MASK, RESOLUTION, WORDS,
+  aligned_starts, bit_time, day_key, free_runs, free_slots, from_words,
+  intersect, interval_mask, iter_bits, slots_to_bitmaps, to_words,
+)
+
+DAY = "2025-06-02"
+
+def local(hour: int, minute: int = 0, day: str = DAY) -> datetime:
+  return datetime.combine(date.fromisoformat(day), datetime.min.time(), tzinfo=AEST).replace(hour=hour, minute=minute)
+
+def bits(start_min: int, end_min: int) -> int:
+  return interval_mask(local(0) + timedelta(minutes=start_min), local(0) + timedelta(minutes=end_min))
+
+def test_interval_mask_covers_half_open_range():
+  mask = interval_mask(local(9), local(9, 30))
+  first = 9 * 60 // RESOLUTION
+  assert list(iter_bits(mask)) == list(range(first, first + 30 // RESOLUTION))
+  assert interval_mask(local(9), local(9)) == 0
+
+def test_interval_mask_runs_to_midnight_across_days():
+  mask = interval_mask(local(23, 30), local(0, 30, "2025-06-03"))
+  assert max(iter_bits(mask)) == BITS_PER_DAY - 1
+
+def test_words_round_trip_and_fit_int64():
+  value = bits(0, 24 * 60) ^ bits(600, 615)
+  words = to_words(value)
+  assert len(words) == WORDS
+  assert all(0 <= w < 2 ** 63 for w in words)
+  assert from_words(words) == value
+
+def test_free_slots_on_grid():
+  free = bits(9 * 60, 10 * 60 + 45)
+  slots = free_slots("p", DAY, free, 30)
+  assert [s["start"].astimezone(AEST).strftime("%H:%M") for s in slots] == ["09:00", "09:30", "10:00"]
+  assert all(s["end"] - s["start"] == timedelta(minutes=30) for s in slots)
+
+def test_aligned_starts_need_the_whole_slot_free():
+  # 09:05-09:35 is free but not on the half-hour grid
+  assert aligned_starts(bits(9 * 60 + 5, 9 * 60 + 35), 30) == 0
+
+def test_free_runs_and_intersect():
+  a = bits(9 * 60, 12 * 60)
+  b = bits(10 * 60, 13 * 60)
+  common = intersect([a, b])
+  assert common == bits(10 * 60, 12 * 60)
+  assert free_runs(a | bits(14 * 60, 15 * 60)) == [
+    (9 * 60 // RESOLUTION, 12 * 60 // RESOLUTION),
+    (14 * 60 // RESOLUTION, 15 * 60 // RESOLUTION),
+  ]
+  assert intersect([]) == DAY_MASK
+
+def test_slots_to_bitmaps_groups_by_clinic_day():
+  slots = [
+    {"provider_id": "p", "start": local(9), "end": local(9, 30)},
+    {"provider_id": "p", "start": local(9, 30), "end": local(10)},
+    {"provider_id": "p", "start": local(9, day="2025-06-03"), "end": local(9, 30, "2025-06-03")},
+  ]
+  days = slots_to_bitmaps(slots)
+  assert days[("p", DAY)] == bits(9 * 60, 10 * 60)
+  assert set(days) == {("p", DAY), ("p", "2025-06-03")}
+
+def test_dst_day_maps_wall_clock():
+  # 2025-04-06: Melbourne falls back from 03:00 AEDT to 02:00 AEST
+  day = "2025-04-06"
+  slot = free_slots("p", day, bits(9 * 60, 9 * 60 + 30), 30)[0]
+  assert slot["start"].astimezone(AEST).strftime("%H:%M") == "09:00"
+  assert slot["start"] == datetime(2025, 4, 5, 23, tzinfo=timezone.utc)
+  assert bit_time(day, 9 * 60 // RESOLUTION) == slot["start"]
+  assert day_key(slot["start"]) == day
+
+def test_store_claim_and_release(mongo_db):
+  import asyncio
+  from benchmarks import bitmap_store
+
+  async def scenario():
+    await bitmap_store.ensure_indexes()
+    nine = local(9).astimezone(timezone.utc)
+    await bitmap_store.write_open([
+      {"provider_id": "p", "start": nine + timedelta(minutes=30 * i), "end": nine + timedelta(minutes=30 * i + 30)}
+      for i in range(4)
+    ])
+    start, end = nine + timedelta(minutes=30), nine + timedelta(minutes=60)
+    first = await bitmap_store.claim("p", start, end)
+    again = await bitmap_store.claim("p", start, end)
+    # overlapping the claimed half hour fails too; time that was never open as well
+    overlap = await bitmap_store.claim("p", start + timedelta(minutes=15), end + timedelta(minutes=15))
+    closed = await bitmap_store.claim("p", nine + timedelta(hours=3), nine + timedelta(hours=3, minutes=30))
+    free = await bitmap_store.find_free("p", nine, nine + timedelta(hours=2))
+    await bitmap_store.release("p", start, end)
+    after = await bitmap_store.find_free("p", nine, nine + timedelta(hours=2))
+    return first, again, overlap, closed, free, after, start
+
+  first, again, overlap, closed, free, after, start = asyncio.run(scenario())
+  assert first and not again and not overlap and not closed
+  assert start not in [s["start"] for s in free] and len(free) == 3
+  assert start in [s["start"] for s in after] and len(after) == 4
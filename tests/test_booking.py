@@ -0,0 +1,42 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+import pytest
+
+pytest.importorskip("email_validator")
+from bson import ObjectId
+from app.routes import booking
+from app.provider_registry import registry
+
+PROVIDER = "dr.test@example.com"
+
+def test_saved_booking_survives_failed_post_steps(monkeypatch):
+  start = datetime(2025, 6, 2, 9, tzinfo=timezone.utc)
+  inserted = ObjectId()
+  saved = []
+
+  async def claim_slot(provider_id, s, e):
+    return {"provider_id": provider_id, "start": s, "end": e}
+
+  async def insert_one(doc):
+    saved.append(doc)
+    return SimpleNamespace(inserted_id=inserted)
+
+  async def broken(*args, **kwargs):
+    raise RuntimeError("mongo went away")
+
+  monkeypatch.setattr(booking, "claim_slot", claim_slot)
+  monkeypatch.setattr(booking, "mongo", SimpleNamespace(appointments=SimpleNamespace(insert_one=insert_one)))
+  monkeypatch.setattr(booking.versions, "bump", broken)
+  monkeypatch.setattr(booking, "enqueue_appointment_email", broken)
+  registry._rebuild([{"_id": 1, "id": PROVIDER, "name": "Dr Test", "specialties": []}])
+  request = booking.BookingRequest(
+    provider_id=PROVIDER, start=start, end=start + timedelta(minutes=30),
+    patient={"name": "Pat", "email": "pat@example.com", "conditions": ""},
+  )
+  try:
+    resp = asyncio.run(booking.book(request))
+  finally:
+    registry._rebuild([])
+  assert resp.appointment_id == str(inserted)
+  assert len(saved) == 1
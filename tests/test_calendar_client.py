@@ -0,0 +1,100 @@
+import json
+import asyncio
+import pytest
+
+pytest.importorskip("httpx")
+pytest.importorskip("fastapi")
+import httpx
+from app import calendar_client
+from app.calendar_client import CalendarError, _decode_batch, _encode_batch
+
+BOUNDARY = "batch_abc"
+
+def batch_response(parts: list[tuple[int, int, dict | None]], crlf: bool = True) -> httpx.Response:
+  # Google answers with one application/http part per call, in any order
+  nl = "\r\n" if crlf else "\n"
+  body = ""
+  for index, status, payload in parts:
+    text = json.dumps(payload) if payload is not None else ""
+    body += (
+      f"--{BOUNDARY}{nl}"
+      f"Content-Type: application/http{nl}"
+      f"Content-ID: <response-item-{index}>{nl}{nl}"
+      f"HTTP/1.1 {status} {'OK' if status < 400 else 'Error'}{nl}"
+      f"Content-Type: application/json; charset=UTF-8{nl}{nl}"
+      f"{text}{nl}"
+    )
+  body += f"--{BOUNDARY}--{nl}"
+  return httpx.Response(
+    200, headers={"Content-Type": f'multipart/mixed; boundary="{BOUNDARY}"'}, content=body.encode()
+  )
+
+def test_decode_batch_maps_parts_by_content_id():
+  resp = batch_response([
+    (1, 409, {"error": {"code": 409, "message": "duplicate"}}),
+    (0, 200, {"id": "evt0", "htmlLink": "http://x/evt0"}),
+    (2, 204, None),
+  ])
+  decoded = _decode_batch(resp)
+  assert decoded == {
+    0: (200, {"id": "evt0", "htmlLink": "http://x/evt0"}),
+    1: (409, {"error": {"code": 409, "message": "duplicate"}}),
+    2: (204, {}),
+  }
+
+def test_decode_batch_accepts_bare_newlines():
+  decoded = _decode_batch(batch_response([(0, 200, {"id": "a"})], crlf=False))
+  assert decoded == {0: (200, {"id": "a"})}
+
+def test_encode_batch_numbers_parts():
+  body = _encode_batch([
+    ("POST", "/calendar/v3/calendars/a/events", {"summary": "x"}),
+    ("DELETE", "/calendar/v3/calendars/a/events/e1", None),
+  ], BOUNDARY).decode()
+  assert body.count(f"--{BOUNDARY}\r\n") == 2
+  assert body.endswith(f"--{BOUNDARY}--\r\n")
+  assert "Content-ID: <item-0>" in body and "Content-ID: <item-1>" in body
+  assert 'POST /calendar/v3/calendars/a/events HTTP/1.1' in body
+  assert '{"summary": "x"}' in body
+
+def test_decode_batch_without_boundary_is_retryable():
+  resp = httpx.Response(200, headers={"Content-Type": "text/html"}, content=b"<html>Bad gateway</html>")
+  with pytest.raises(CalendarError) as e:
+    _decode_batch(resp)
+  assert e.value.status == 502 and "not multipart" in e.value.detail
+
+def test_batch_retries_an_unreadable_reply(monkeypatch):
+  replies = [
+    httpx.Response(200, headers={"Content-Type": "text/plain"}, content=b"oops"),
+    batch_response([(0, 200, {"id": "a"}), (1, 200, {"id": "b"})]),
+  ]
+
+  async def request(method, url, **kwargs):
+    return replies.pop(0)
+
+  monkeypatch.setattr(calendar_client, "_request", request)
+  monkeypatch.setattr(calendar_client, "_backoff", lambda attempt, resp=None: 0)
+  calls = [("POST", "/calendar/v3/calendars/a/events", {}), ("POST", "/calendar/v3/calendars/a/events", {})]
+  assert asyncio.run(calendar_client._batch(calls)) == [{"id": "a"}, {"id": "b"}]
+  assert replies == []
+
+def test_delete_availability_event_follows_pages(monkeypatch):
+  pages = {
+    None: {"items": [{"id": "e1", "summary": "Available slot"}, {"id": "x", "summary": "Lunch"}], "nextPageToken": "t2"},
+    "t2": {"items": [{"id": "e2", "summary": "Available slot"}], "nextPageToken": "t3"},
+    "t3": {"items": [{"id": "e3", "summary": "Available slot"}]},
+  }
+  deleted = []
+
+  async def list_events(calendar_id, **params):
+    return pages[params.get("pageToken")]
+
+  async def batch_delete_events(events):
+    deleted.extend(events)
+    return [{} for _ in events]
+
+  monkeypatch.setattr(calendar_client, "list_events", list_events)
+  monkeypatch.setattr(calendar_client, "batch_delete_events", batch_delete_events)
+  slot = {"start": "2025-06-02T09:00:00+00:00", "end": "2025-06-02T09:30:00+00:00"}
+  asyncio.run(calendar_client.delete_availability_event("cal", slot))
+  assert deleted == [("cal", "e1"), ("cal", "e2"), ("cal", "e3")]
@@ -0,0 +1,38 @@
+import pytest
+from app import feed_tokens
+
+PROVIDER = "dr.test@example.com"
+
+@pytest.fixture
+def secret(monkeypatch):
+  monkeypatch.setattr(feed_tokens, "FEED_SECRET", "s3cret")
+
+def test_token_is_per_provider(secret):
+  token = feed_tokens.feed_token(PROVIDER)
+  assert feed_tokens.token_valid(PROVIDER, token)
+  assert not feed_tokens.token_valid("other@example.com", token)
+  assert not feed_tokens.token_valid(PROVIDER, "0" * len(token))
+  assert not feed_tokens.token_valid(PROVIDER, None)
+
+def test_no_secret_means_no_feeds(monkeypatch):
+  monkeypatch.setattr(feed_tokens, "FEED_SECRET", "")
+  assert not feed_tokens.token_valid(PROVIDER, feed_tokens.feed_token(PROVIDER))
+
+def test_feed_refused_before_any_lookup(secret):
+  # no database is configured: a refused request must never reach it
+  pytest.importorskip("fastapi")
+  from fastapi import FastAPI
+  from fastapi.testclient import TestClient
+  from app.routes import providers
+  from app.provider_registry import registry
+  registry._rebuild([{"_id": 1, "id": PROVIDER, "name": "Dr Test", "specialties": []}])
+  app = FastAPI()
+  app.include_router(providers.router)
+  client = TestClient(app)
+  try:
+    for params in ({}, {"token": "guess"}, {"token": feed_tokens.feed_token("other@example.com")}):
+      resp = client.get(f"/providers/{PROVIDER}/calendar.ics", params=params)
+      assert resp.status_code == 404
+      assert "BEGIN:VEVENT" not in resp.text
+  finally:
+    registry._rebuild([])
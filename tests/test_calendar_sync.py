@@ -0,0 +1,66 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+import pytest
+from app import calendar_sync
+from app.calendar_client import CalendarError
+
+PROVIDER = "dr.test@example.com"
+
+def event(event_id: str, hour: int) -> dict:
+  start = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0) + timedelta(days=1, hours=hour)
+  return {
+    "id": event_id,
+    "start": {"dateTime": start.isoformat()},
+    "end": {"dateTime": (start + timedelta(hours=1)).isoformat()},
+  }
+
+@pytest.fixture
+def google(monkeypatch):
+  # list_events replaced by scripted pages, recording the params of each call
+  calls, pages = [], []
+
+  async def list_events(calendar_id, **params):
+    calls.append(dict(params))
+    page = pages.pop(0)
+    if isinstance(page, Exception):
+      raise page
+    return page
+
+  monkeypatch.setattr(calendar_sync, "list_events", list_events)
+  monkeypatch.setattr(calendar_sync, "_calendars", {})
+  return calls, pages
+
+def test_full_sync_is_bounded_and_paged(google):
+  calls, pages = google
+  pages += [
+    {"items": [event("a", 1)], "nextPageToken": "p2"},
+    {"items": [event("b", 3)], "nextSyncToken": "s1"},
+  ]
+  assert asyncio.run(calendar_sync.sync_provider(PROVIDER))
+  assert "syncToken" not in calls[0]
+  since = datetime.fromisoformat(calls[0]["timeMin"])
+  assert abs(datetime.now(timezone.utc) - calendar_sync.RETENTION - since) < timedelta(minutes=1)
+  assert calls[1]["pageToken"] == "p2"
+  assert calendar_sync._calendars[PROVIDER]["sync_token"] == "s1"
+  assert set(calendar_sync._calendars[PROVIDER]["events"]) == {"a", "b"}
+
+def test_expired_token_resyncs_in_a_loop(google):
+  calls, pages = google
+  pages += [
+    {"items": [event("a", 1)], "nextSyncToken": "s1"},
+    CalendarError(410, "Gone"),
+    {"items": [event("c", 5)], "nextSyncToken": "s2"},
+  ]
+  asyncio.run(calendar_sync.sync_provider(PROVIDER))
+  assert asyncio.run(calendar_sync.sync_provider(PROVIDER))
+  assert calls[1] == {"singleEvents": "true", "maxResults": 2500, "syncToken": "s1"}
+  # the resync is a bounded full sync that replaces the cache
+  assert "syncToken" not in calls[2] and "timeMin" in calls[2]
+  assert set(calendar_sync._calendars[PROVIDER]["events"]) == {"c"}
+  assert calendar_sync._calendars[PROVIDER]["sync_token"] == "s2"
+
+def test_gone_during_a_full_sync_is_raised(google):
+  _, pages = google
+  pages.append(CalendarError(410, "Gone"))
+  with pytest.raises(CalendarError):
+    asyncio.run(calendar_sync.sync_provider(PROVIDER))
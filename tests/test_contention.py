@@ -0,0 +1,92 @@
+import random
+import asyncio
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+import pytest
+
+# Double-booking checks against a real mongod (skipped without one):
+# hundreds of concurrent claims on the same slot, exactly one winner.
+
+PROVIDER = "dr.test@example.com"
+PARALLEL = 300
+
+def slots(n: int) -> list[dict]:
+  base = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0) + timedelta(days=1)
+  return [
+    {"provider_id": PROVIDER, "start": base + timedelta(minutes=30 * i), "end": base + timedelta(minutes=30 * i + 30)}
+    for i in range(n)
+  ]
+
+async def seed(n: int) -> list[dict]:
+  from app import db
+  await db.ensure_indexes()
+  seeded = slots(n)
+  await db.mongo.availability.insert_many([dict(s) for s in seeded])
+  return seeded
+
+def test_parallel_claims_one_winner(mongo_db):
+  from app import db
+  from app.slots import claim_slot
+
+  async def scenario():
+    slot = (await seed(1))[0]
+    won = await asyncio.gather(*(
+      claim_slot(PROVIDER, slot["start"], slot["end"]) for _ in range(PARALLEL)
+    ))
+    return won, await db.mongo.availability.count_documents({})
+
+  won, left = asyncio.run(scenario())
+  assert sum(w is not None for w in won) == 1
+  assert left == 0
+
+def test_parallel_bulk_claims_never_share_a_slot(mongo_db):
+  from app import db
+  from app.slots import claim_slots
+
+  async def scenario():
+    seeded = await seed(60)
+    keys = [(s["provider_id"], s["start"], s["end"]) for s in seeded]
+    rng = random.Random(3)
+    requests = [rng.sample(keys, 30) for _ in range(25)]
+    won = await asyncio.gather(*(claim_slots(r) for r in requests))
+    return keys, requests, won, await db.mongo.availability.count_documents({})
+
+  keys, requests, won, left = asyncio.run(scenario())
+  winners = Counter(key for claimed in won for key in claimed)
+  assert all(count == 1 for count in winners.values())
+  # everything somebody asked for went to exactly one caller
+  assert set(winners) == {key for r in requests for key in r}
+  assert left == len(keys) - len(winners)
+  for request, claimed in zip(requests, won):
+    assert set(claimed) <= set(request)
+
+def test_parallel_bookings_one_winner(mongo_db, monkeypatch):
+  pytest.importorskip("email_validator")
+  import httpx
+  from app import db
+  from app.main import app
+  from app.provider_registry import registry
+  monkeypatch.setattr(app.state, "ready", True, raising=False)
+  registry._rebuild([{"_id": 1, "id": PROVIDER, "name": "Dr Test", "specialties": []}])
+
+  async def scenario():
+    slot = (await seed(1))[0]
+    body = {
+      "provider_id": PROVIDER,
+      "start": slot["start"].isoformat(),
+      "end": slot["end"].isoformat(),
+      "notes": "contention test",
+      "patient": {"name": "Load Test", "email": "load-test@example.com", "conditions": ""},
+    }
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=60) as client:
+      responses = await asyncio.gather(*(client.post("/book/", json=body) for _ in range(PARALLEL)))
+    return responses, await db.mongo.appointments.count_documents({})
+
+  try:
+    responses, appointments = asyncio.run(scenario())
+  finally:
+    registry._rebuild([])
+  statuses = Counter(r.status_code for r in responses)
+  assert statuses == {200: 1, 409: PARALLEL - 1}
+  assert appointments == 1
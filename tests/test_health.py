@@ -0,0 +1,22 @@
+import pytest
+
+pytest.importorskip("fastapi")
+from fastapi.testclient import TestClient
+from app.main import app
+
+def test_not_ready_is_503_not_404():
+  # no lifespan: startup never finished, as when Mongo is down at boot
+  client = TestClient(app)
+  for method, path in (
+    ("GET", "/providers/"),
+    ("GET", "/availability/dr.test@example.com?start=2025-06-02T00:00:00Z&end=2025-06-03T00:00:00Z"),
+    ("POST", "/waitlist/fill"),
+  ):
+    resp = client.request(method, path)
+    assert resp.status_code == 503
+    assert resp.headers["retry-after"] == "5"
+
+def test_liveness_answers_while_starting():
+  client = TestClient(app)
+  assert client.get("/health/live").status_code == 200
+  assert client.get("/health/ready").status_code == 503
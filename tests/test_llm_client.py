@@ -0,0 +1,108 @@
+import time
+import asyncio
+from datetime import datetime, timedelta, timezone
+import pytest
+
+pytest.importorskip("openai")
+pytest.importorskip("fastapi")
+import httpx
+from openai import AsyncOpenAI
+from app import llm_client
+from benchmarks.fake_services import openai_app
+
+def slots(n: int = 6) -> list[dict]:
+  base = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0) + timedelta(days=2)
+  return [
+    {"provider_id": "p", "start": base + timedelta(hours=i), "end": base + timedelta(hours=i, minutes=30)}
+    for i in range(n)
+  ]
+
+def patient(tag: str) -> dict:
+  # distinct conditions give distinct cache keys
+  return {"name": "Pat", "email": "pat@example.com", "preferences": {}, "conditions": tag}
+
+@pytest.fixture
+def fake_openai(monkeypatch):
+  """
+  The benchmark's fake chat completions server, served in-process; records
+  how many requests reached it and the most it handled at once.
+  """
+  server = {"requests": 0, "active": 0, "peak": 0}
+
+  def start(latency: float, cap: int = 8, timeout: float = 8):
+    inner = openai_app(latency)
+
+    async def app(scope, receive, send):
+      if scope["type"] != "http":
+        return await inner(scope, receive, send)
+      server["requests"] += 1
+      server["active"] += 1
+      server["peak"] = max(server["peak"], server["active"])
+      try:
+        await inner(scope, receive, send)
+      finally:
+        server["active"] -= 1
+
+    http = httpx.AsyncClient(transport=httpx.ASGITransport(app=app))
+    monkeypatch.setattr(llm_client, "_client", AsyncOpenAI(
+      api_key="fake", base_url="http://fake/v1", max_retries=0, http_client=http
+    ))
+    monkeypatch.setattr(llm_client, "_semaphore", asyncio.Semaphore(cap))
+    monkeypatch.setattr(llm_client, "LLM_TIMEOUT", timeout)
+
+  monkeypatch.setenv("OPENAI_API_KEY", "fake")
+  monkeypatch.setattr(llm_client, "LLM_ENABLED", True)
+  monkeypatch.setattr(llm_client, "_inflight", {})
+  return start, server
+
+def test_identical_requests_share_one_call(fake_openai):
+  start, server = fake_openai
+  start(latency=0.05)
+  free = slots()
+
+  async def scenario():
+    return await asyncio.gather(*(
+      llm_client.recommend_slots(patient("coalesce"), free) for _ in range(20)
+    ))
+
+  answers = asyncio.run(scenario())
+  assert server["requests"] == 1
+  assert all(a == answers[0] for a in answers)
+  assert answers[0] and all("reason" in a for a in answers[0])
+
+def test_concurrency_cap(fake_openai):
+  start, server = fake_openai
+  start(latency=0.05, cap=3)
+  free = slots()
+
+  async def scenario():
+    return await asyncio.gather(*(
+      llm_client.recommend_slots(patient(f"cap-{i}"), free) for i in range(12)
+    ))
+
+  answers = asyncio.run(scenario())
+  assert server["requests"] == 12
+  assert server["peak"] == 3
+  assert all(answers)
+
+def test_deadline_falls_back_and_keeps_permits(fake_openai):
+  start, server = fake_openai
+  start(latency=0.2, cap=1, timeout=0.3)
+  free = slots()
+
+  async def scenario():
+    t0 = time.perf_counter()
+    answers = await asyncio.gather(*(
+      llm_client.recommend_slots(patient(f"slow-{i}"), free) for i in range(6)
+    ))
+    return answers, time.perf_counter() - t0
+
+  answers, elapsed = asyncio.run(scenario())
+  # the first call finishes; queued ones hit the deadline and use the ranker
+  assert elapsed < 1.0
+  assert all(len(a) == 3 for a in answers)
+  assert any(a[0]["reason"] == "Fits the patient's preferences." for a in answers)
+  assert any(a[0]["reason"] != "Fits the patient's preferences." for a in answers)
+  # no permit leaked, no counter left behind
+  assert llm_client._semaphore._value == 1
+  assert llm_client._counters["waiting"] == 0 and llm_client._counters["in_flight"] == 0
@@ -0,0 +1,133 @@
+import asyncio
+from email.message import EmailMessage
+from datetime import datetime, timedelta, timezone
+import pytest
+from app.utils_mail import SmtpSession
+
+def message(i: int) -> EmailMessage:
+  msg = EmailMessage()
+  msg["Subject"] = f"test {i}"
+  msg["From"] = "test@example.com"
+  msg["To"] = f"patient{i}@example.com"
+  msg.set_content("hello")
+  return msg
+
+def appointment(i: int) -> dict:
+  start = datetime(2025, 6, 2, 0, tzinfo=timezone.utc) + timedelta(minutes=30 * i)
+  return {
+    "provider_name": "Dr Test",
+    "patient": {"name": f"Patient {i}"},
+    "start": start,
+    "end": start + timedelta(minutes=30),
+    "notes": "checkup",
+  }
+
+def test_session_reuses_one_connection(smtp_sink):
+  session = SmtpSession()
+  try:
+    for i in range(5):
+      session.send(message(i))
+  finally:
+    session.close()
+  assert smtp_sink.messages == 5
+  assert smtp_sink.connections == 1
+
+def test_session_reconnects_after_server_hangs_up(smtp_sink):
+  smtp_sink.drop_after_message = True
+  session = SmtpSession()
+  try:
+    for i in range(3):
+      session.send(message(i))
+  finally:
+    session.close()
+  assert smtp_sink.messages == 3
+  assert smtp_sink.connections == 3
+
+def test_retry_delay_backs_off_exponentially():
+  pytest.importorskip("pymongo")
+  from app.outbox import Outbox
+  outbox = Outbox(None, None, base_delay=5.0)
+  for attempts, expected in ((1, 5), (2, 10), (4, 40)):
+    seconds = outbox._retry_delay(attempts).total_seconds()
+    assert expected * 0.8 <= seconds <= expected * 1.2
+
+@pytest.fixture
+def mail_outbox(mongo_db, smtp_sink, monkeypatch):
+  pytest.importorskip("icalendar")
+  from app import mail_outbox
+  # a fresh session per test, so no connection outlives its sink
+  monkeypatch.setattr(mail_outbox, "_session", SmtpSession())
+  yield mail_outbox
+  mail_outbox._session.close()
+
+def test_outbox_sends_over_one_connection(mail_outbox, smtp_sink):
+  async def scenario():
+    await mail_outbox.enqueue_appointment_emails([
+      (f"patient{i}@example.com", appointment(i)) for i in range(4)
+    ])
+    assert await mail_outbox.outbox.process_once() == 4
+    assert await mail_outbox.outbox.process_once() == 0
+    return await mail_outbox.mongo.mail_outbox.find().to_list(None)
+
+  docs = asyncio.run(scenario())
+  assert [d["status"] for d in docs] == ["done"] * 4
+  assert all(d["attempts"] == 1 and d["done_at"] for d in docs)
+  assert smtp_sink.messages == 4
+  assert smtp_sink.connections == 1
+
+def test_outbox_retries_with_backoff(mail_outbox, smtp_sink):
+  smtp_sink.reject = 1
+
+  async def scenario():
+    await mail_outbox.enqueue_appointment_email("patient@example.com", appointment(0))
+    before = datetime.now(timezone.utc)
+    await mail_outbox.outbox.process_once()
+    failed = await mail_outbox.mongo.mail_outbox.find_one()
+    # not due yet: the next pass leaves it alone
+    assert await mail_outbox.outbox.process_once() == 0
+    await mail_outbox.mongo.mail_outbox.update_one(
+      {"_id": failed["_id"]}, {"$set": {"next_attempt_at": before}}
+    )
+    await mail_outbox.outbox.process_once()
+    return before, failed, await mail_outbox.mongo.mail_outbox.find_one()
+
+  before, failed, sent = asyncio.run(scenario())
+  assert failed["status"] == "pending"
+  assert failed["attempts"] == 1
+  assert "451" in failed["last_error"]
+  base = mail_outbox.outbox.base_delay
+  assert failed["next_attempt_at"] >= before + timedelta(seconds=base * 0.8)
+  assert sent["status"] == "done"
+  assert sent["attempts"] == 2
+  assert smtp_sink.messages == 1
+
+def test_outbox_dead_letters_after_max_attempts(mail_outbox, smtp_sink, monkeypatch):
+  monkeypatch.setattr(mail_outbox.outbox, "base_delay", 0)
+  monkeypatch.setattr(mail_outbox.outbox, "max_attempts", 3)
+  smtp_sink.reject = 10
+
+  async def scenario():
+    await mail_outbox.enqueue_appointment_email("patient@example.com", appointment(0))
+    passes = 0
+    while await mail_outbox.outbox.process_once():
+      passes += 1
+    return passes, await mail_outbox.mongo.mail_outbox.find_one()
+
+  passes, doc = asyncio.run(scenario())
+  assert passes == 3
+  assert doc["status"] == "dead"
+  assert doc["attempts"] == 3
+  assert smtp_sink.messages == 0
+
+def test_delivered_mail_expires(mongo_db):
+  from app import db
+
+  async def scenario():
+    await db.ensure_indexes()
+    # a second run with the same retention is a no-op
+    await db.ensure_indexes()
+    return await db.mongo.mail_outbox.index_information()
+
+  indexes = asyncio.run(scenario())
+  ttl = [i for i in indexes.values() if i["key"] == [("done_at", 1)]]
+  assert ttl and ttl[0]["expireAfterSeconds"] == int(db.MAIL_RETENTION_DAYS * 86400)
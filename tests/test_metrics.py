@@ -0,0 +1,32 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from app import metrics
+
+PROVIDER = "dr.test@example.com"
+
+def test_free_slot_stream_times_conflicts(mongo_db):
+  from app import db
+  from app.slots import iter_free_slots
+  base = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0) + timedelta(days=1)
+  slots = [
+    {"provider_id": PROVIDER, "start": base + timedelta(minutes=30 * i), "end": base + timedelta(minutes=30 * i + 30)}
+    for i in range(8)
+  ]
+
+  async def scenario():
+    await db.ensure_indexes()
+    await db.mongo.availability.insert_many([dict(s) for s in slots])
+    await db.mongo.appointments.insert_one({"provider_id": PROVIDER, "start": base, "end": base + timedelta(hours=1)})
+    # as TimingMiddleware does for a request
+    timings = {}
+    token = metrics._timings.set(timings)
+    try:
+      free = [s async for s in iter_free_slots(PROVIDER, base, base + timedelta(days=1))]
+    finally:
+      metrics._timings.reset(token)
+    return free, timings
+
+  free, timings = asyncio.run(scenario())
+  assert len(free) == 6
+  assert timings["conflicts"][1] == 1
+  assert ("conflicts", "iter_free_slots") in metrics._stages
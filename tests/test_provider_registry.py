@@ -0,0 +1,64 @@
+import asyncio
+from contextlib import asynccontextmanager
+from app import provider_registry
+from app.provider_registry import ProviderRegistry
+
+def doc(oid: int, pid: str | None, *specialties) -> dict:
+  d = {"_id": oid, "name": f"Dr {oid}", "specialties": list(specialties)}
+  if pid is not None:
+    d["id"] = pid
+  return d
+
+def test_malformed_documents_are_skipped():
+  registry = ProviderRegistry()
+  registry._rebuild([doc(1, "a", "Cardiology"), doc(2, None, "Cardiology"), doc(3, "c", None, "GP")])
+  assert registry.ids() == ["a", "c"]
+  assert [p["id"] for p in registry.find("cardiology")] == ["a"]
+  assert [p["id"] for p in registry.find("gp")] == ["c"]
+
+def test_bad_change_does_not_stop_the_watcher(monkeypatch):
+  registry = ProviderRegistry()
+  changes = [
+    {"operationType": "insert", "documentKey": {"_id": 2}, "fullDocument": doc(2, None)},
+    {"operationType": "update", "documentKey": {"_id": 3}, "fullDocument": "not a document"},
+    {"operationType": "insert", "documentKey": {"_id": 4}, "fullDocument": doc(4, "d")},
+  ]
+
+  class Stream:
+    def __aiter__(self):
+      return self
+
+    async def __anext__(self):
+      if changes:
+        return changes.pop(0)
+      # nothing more: park like an idle stream
+      await asyncio.sleep(3600)
+
+  @asynccontextmanager
+  async def watch(**kwargs):
+    yield Stream()
+
+  class Cursor:
+    async def to_list(self, length):
+      return [doc(1, "a")]
+
+  class Providers:
+    def watch(self, **kwargs):
+      return watch(**kwargs)
+
+    def find(self, query):
+      return Cursor()
+
+  monkeypatch.setattr(provider_registry, "mongo", type("Mongo", (), {"providers": Providers()})())
+
+  async def scenario():
+    task = asyncio.create_task(registry.watch())
+    while changes:
+      await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    alive = not task.done()
+    task.cancel()
+    return alive
+
+  assert asyncio.run(scenario())
+  assert sorted(registry.ids()) == ["a", "d"]
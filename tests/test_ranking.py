@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta, timezone
+from app.utils import AEST
+from app.ranking import PER_DAY, encode_slots, fallback_recommendations, rank_slots
+
+def slot(day: int, hour: int, minute: int = 0, minutes: int = 30) -> dict:
+  # clinic-local time, `day` days from tomorrow
+  d = datetime.now(AEST).date() + timedelta(days=1 + day)
+  start = datetime.combine(d, datetime.min.time(), tzinfo=AEST).replace(hour=hour, minute=minute)
+  start = start.astimezone(timezone.utc)
+  return {"provider_id": "p", "start": start, "end": start + timedelta(minutes=minutes)}
+
+def local_hour(s: dict) -> int:
+  return s["start"].astimezone(AEST).hour
+
+def week() -> list[dict]:
+  return [slot(d, h) for d in range(7) for h in (9, 10, 11, 13, 14, 15, 16)]
+
+def test_hard_preference_filters():
+  ranked = rank_slots({"morning_only": True}, week(), k=50)
+  assert ranked and all(local_hour(s) < 12 for s in ranked)
+  ranked = rank_slots({"afternoon_only": True}, week(), k=50)
+  assert ranked and all(local_hour(s) >= 12 for s in ranked)
+
+def test_earliest_first_and_capped_per_day():
+  ranked = rank_slots({}, week(), k=6)
+  assert len(ranked) == 6
+  days = [s["start"].astimezone(AEST).date() for s in ranked]
+  assert all(days.count(d) <= PER_DAY for d in days)
+  # spread over the first days, each day's earliest slots first
+  assert ranked[:PER_DAY] == sorted(ranked[:PER_DAY], key=lambda s: s["start"])
+  assert ranked[0] == min(week(), key=lambda s: s["start"])
+
+def test_soft_preference_outweighs_a_day():
+  ranked = rank_slots({"prefers_afternoon": True}, [slot(0, 9), slot(1, 14)], k=2)
+  assert local_hour(ranked[0]) == 14
+
+def test_tops_up_past_per_day_when_days_run_out():
+  one_day = [slot(0, h) for h in (9, 10, 11, 13, 14)]
+  assert len(rank_slots({}, one_day, k=5)) == 5
+
+def test_deterministic_ties():
+  slots = week()
+  assert rank_slots({}, slots) == rank_slots({}, list(reversed(slots)))
+
+def test_encode_slots_compact_lines():
+  ranked = [slot(0, 10), slot(0, 9), slot(1, 13, 30)]
+  text, ids = encode_slots(ranked)
+  assert ids == {"s1": ranked[0], "s2": ranked[1], "s3": ranked[2]}
+  lines = text.split("\n")
+  assert lines[0] == "(times are Melbourne local, each slot 30 min)"
+  # one line per day, slots in time order, ids in rank order
+  assert lines[1].endswith(": s2 09:00, s1 10:00")
+  assert lines[2].endswith(": s3 13:30")
+
+def test_encode_slots_mixed_durations_show_end():
+  text, _ = encode_slots([slot(0, 9), slot(0, 10, minutes=60)])
+  assert "(times are" not in text
+  assert "s1 09:00-09:30" in text and "s2 10:00-11:00" in text
+
+def test_encode_slots_empty():
+  assert encode_slots([]) == ("", {})
+
+def test_fallback_reasons():
+  recs = fallback_recommendations({"prefers_morning": True}, [slot(0, 9), slot(0, 10)], n=1)
+  assert len(recs) == 1
+  assert "prefers morning" in recs[0]["reason"]
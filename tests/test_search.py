@@ -0,0 +1,79 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+import pytest
+from app import search
+
+BASE = datetime(2025, 6, 2, 0, tzinfo=timezone.utc)
+START, END = BASE, BASE + timedelta(days=7)
+HALF_HOUR = timedelta(minutes=30)
+
+def at(minutes: int) -> datetime:
+  return BASE + timedelta(minutes=minutes)
+
+def run(starts: list[int]) -> list[dict]:
+  # back-to-back half-hour slots starting at these minutes
+  return [{"start": at(m), "end": at(m) + HALF_HOUR} for m in starts]
+
+@pytest.fixture
+def free(monkeypatch):
+  """
+  Per-provider free slots served in start order in place of the Mongo
+  sweep, recording how many slots each stream handed out.
+  """
+  slots: dict[str, list[dict]] = {}
+  pulled: dict[str, int] = {}
+
+  async def iter_free_slots(provider_id, start, end):
+    for slot in sorted(slots.get(provider_id, []), key=lambda s: s["start"]):
+      if slot["start"] >= start and slot["end"] <= end:
+        pulled[provider_id] = pulled.get(provider_id, 0) + 1
+        yield {"provider_id": provider_id, **slot}
+
+  monkeypatch.setattr(search, "iter_free_slots", iter_free_slots)
+  return slots, pulled
+
+def intervals(results: list[dict]) -> list[tuple]:
+  return [(r.get("provider_id"), r["start"], r["end"]) for r in results]
+
+def test_free_intervals_merge_adjacent_slots(free):
+  slots, _ = free
+  slots["a"] = run([0, 30, 60, 180, 300, 330])
+
+  async def collect(min_duration):
+    return [iv async for iv in search.iter_free_intervals("a", START, END, min_duration)]
+
+  assert asyncio.run(collect(HALF_HOUR)) == [(at(0), at(90)), (at(180), at(210)), (at(300), at(360))]
+  assert asyncio.run(collect(timedelta(hours=1))) == [(at(0), at(90)), (at(300), at(360))]
+
+def test_earliest_any_merges_providers_in_start_order(free):
+  slots, _ = free
+  slots["a"] = run([60, 300])
+  slots["b"] = run([0, 120, 720])
+  results = asyncio.run(search.earliest_any(["a", "b"], START, END, 3, HALF_HOUR))
+  assert intervals(results) == [
+    ("b", at(0), at(30)), ("a", at(60), at(90)), ("b", at(120), at(150)),
+  ]
+
+def test_earliest_any_stops_reading_once_n_found(free):
+  slots, pulled = free
+  slots["a"] = run(range(0, 30 * 200, 60))
+  slots["b"] = run(range(3000, 6000, 60))
+  results = asyncio.run(search.earliest_any(["a", "b"], START, END, 2, HALF_HOUR))
+  assert len(results) == 2
+  # a few look-ahead slots per stream, not the whole window
+  assert pulled["a"] <= 4 and pulled["b"] <= 2
+
+def test_earliest_common_overlaps(free):
+  slots, _ = free
+  slots["a"] = run([0, 30, 60, 90, 240, 270])       # 00:00-02:00, 04:00-05:00
+  slots["b"] = run([60, 90, 120, 150, 270, 300])    # 01:00-03:00, 04:30-05:30
+  results = asyncio.run(search.earliest_common(["a", "b"], START, END, 5, HALF_HOUR))
+  assert [(r["start"], r["end"]) for r in results] == [(at(60), at(120)), (at(270), at(300))]
+  assert all(r["provider_ids"] == ["a", "b"] for r in results)
+
+def test_earliest_common_respects_min_duration_and_empty(free):
+  slots, _ = free
+  slots["a"] = run([0, 30, 60])
+  slots["b"] = run([60, 90])
+  assert asyncio.run(search.earliest_common(["a", "b"], START, END, 5, timedelta(hours=1))) == []
+  assert asyncio.run(search.earliest_common(["a", "c"], START, END, 5, HALF_HOUR)) == []
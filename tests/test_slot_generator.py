@@ -0,0 +1,31 @@
+from datetime import date, timedelta, timezone
+import pytest
+
+pytest.importorskip("motor")
+from app.slot_generator import iter_template_slots
+from app.utils import AEST
+
+def provider(weekly: dict, minutes: int = 60) -> dict:
+  return {"id": "p", "schedule": {"timezone": "Australia/Melbourne", "slot_minutes": minutes, "weekly": weekly}}
+
+def local_times(slots) -> list[str]:
+  return [s["start"].astimezone(AEST).strftime("%H:%M%z") for s in slots]
+
+def test_default_schedule_weekdays_only():
+  # Mon 2 June - Sun 8 June 2025
+  slots = list(iter_template_slots({"id": "p"}, date(2025, 6, 2), date(2025, 6, 8)))
+  assert len(slots) == 5 * 14
+  assert {s["start"].astimezone(AEST).weekday() for s in slots} == set(range(5))
+  assert all(s["end"] - s["start"] == timedelta(minutes=30) for s in slots)
+  assert all(s["start"].tzinfo == timezone.utc for s in slots)
+
+def test_dst_fall_back_yields_both_instants():
+  # Sun 6 April 2025: 03:00 AEDT becomes 02:00 AEST, so 02:00-03:00 happens twice
+  slots = list(iter_template_slots(provider({"sun": [["01:00", "04:00"]]}), date(2025, 4, 6), date(2025, 4, 6)))
+  assert local_times(slots) == ["01:00+1100", "02:00+1100", "02:00+1000", "03:00+1000"]
+  assert len({s["start"] for s in slots}) == len(slots)
+
+def test_dst_spring_forward_skips_missing_hour():
+  # Sun 5 October 2025: 02:00 AEST jumps to 03:00 AEDT
+  slots = list(iter_template_slots(provider({"sun": [["01:00", "04:00"]]}), date(2025, 10, 5), date(2025, 10, 5)))
+  assert local_times(slots) == ["01:00+1000", "03:00+1100"]
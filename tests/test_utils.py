@@ -0,0 +1,71 @@
+import random
+from datetime import datetime, timedelta, timezone
+from app.utils import AEST, BusyIndex, filter_conflicts, ics_escape, ics_fold, is_conflict, to_utc
+
+BASE = datetime(2025, 6, 2, 0, tzinfo=timezone.utc)
+
+def at(minutes: int) -> datetime:
+  return BASE + timedelta(minutes=minutes)
+
+def interval(start: int, end: int) -> dict:
+  return {"start": at(start), "end": at(end)}
+
+def test_busy_index_half_open_overlap():
+  index = BusyIndex([interval(60, 90)])
+  assert index.overlaps(at(30), at(61))
+  assert index.overlaps(at(70), at(80))
+  assert index.overlaps(at(89), at(120))
+  # touching ends do not overlap
+  assert not index.overlaps(at(30), at(60))
+  assert not index.overlaps(at(90), at(120))
+
+def test_busy_index_long_interval_hidden_behind_short_ones():
+  # the latest end so far decides, not the end of the nearest interval
+  index = BusyIndex([interval(0, 600), interval(100, 110), interval(200, 210)])
+  assert index.overlaps(at(300), at(330))
+  assert not index.overlaps(at(600), at(630))
+
+def test_busy_index_empty_and_iso_strings():
+  assert not BusyIndex([]).overlaps(at(0), at(30))
+  index = BusyIndex([{"start": at(0).isoformat(), "end": at(30).isoformat()}])
+  assert index.overlaps(at(15), at(45))
+
+def test_is_conflict_reuses_one_index():
+  index = BusyIndex([interval(60, 90)])
+  assert is_conflict({"start": at(70).isoformat(), "end": at(100).isoformat()}, index)
+  assert not is_conflict(interval(90, 120), index)
+
+def test_filter_conflicts_matches_brute_force():
+  rng = random.Random(1)
+  slots = [interval(30 * i, 30 * i + 30) for i in range(200)]
+  booked = []
+  for _ in range(80):
+    start = rng.randrange(0, 6000, 5)
+    booked.append(interval(start, start + rng.choice((15, 30, 45, 90))))
+  expected = [
+    s for s in slots
+    if not any(b["start"] < s["end"] and b["end"] > s["start"] for b in booked)
+  ]
+  assert filter_conflicts(slots, booked) == expected
+
+def test_to_utc_takes_naive_times_as_clinic_local():
+  assert to_utc("2025-06-02T09:00:00") == datetime(2025, 6, 2, 9, tzinfo=AEST).astimezone(timezone.utc)
+  assert to_utc("2025-06-02T09:00:00+00:00") == datetime(2025, 6, 2, 9, tzinfo=timezone.utc)
+
+def test_ics_escape():
+  assert ics_escape("a;b,c\\d\ne") == "a\\;b\\,c\\\\d\\ne"
+
+def test_ics_fold_short_line_unchanged():
+  line = "SUMMARY:" + "x" * 67
+  assert len(line) == 75
+  assert ics_fold(line) == line
+
+def test_ics_fold_limits_octets_and_unfolds():
+  for line in ("DESCRIPTION:" + "abc " * 60, "DESCRIPTION:" + "é" * 100 + "ü"):
+    folded = ics_fold(line)
+    parts = folded.split("\r\n")
+    assert len(parts) > 1
+    assert all(len(p.encode()) <= 75 for p in parts)
+    assert all(p.startswith(" ") for p in parts[1:])
+    # unfolding (drop CRLF + one space) gives the original back
+    assert folded.replace("\r\n ", "") == line
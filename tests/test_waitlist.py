@@ -0,0 +1,110 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+import pytest
+from app import waitlist
+
+PROVIDER = "dr.test@example.com"
+HALF_HOUR = timedelta(minutes=30)
+
+def tomorrow(hour: int, minute: int = 0) -> datetime:
+  day = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+  return day + timedelta(hours=hour, minutes=minute)
+
+def slot(hour: int, minute: int = 0) -> dict:
+  start = tomorrow(hour, minute)
+  return {"provider_id": PROVIDER, "start": start, "end": start + HALF_HOUR}
+
+def test_only_slots_inside_opened_windows_are_offered(monkeypatch):
+  inventory = [slot(h, m) for h in range(9, 17) for m in (0, 30)]
+
+  async def iter_free_slots(provider_id, start, end):
+    for s in inventory:
+      if s["start"] >= start and s["end"] <= end:
+        yield s
+
+  monkeypatch.setattr(waitlist, "iter_free_slots", iter_free_slots)
+  windows = [
+    (tomorrow(10), tomorrow(10, 30)),    # one released slot
+    (tomorrow(14), tomorrow(15)),        # a generated hour...
+    (tomorrow(14, 30), tomorrow(15, 30)),  # ...overlapping another
+  ]
+  now = datetime.now(timezone.utc)
+  offered = asyncio.run(waitlist._free_slots(PROVIDER, windows, now))
+  assert [s["start"] for s in offered] == [tomorrow(10), tomorrow(14), tomorrow(14, 30), tomorrow(15)]
+  # beyond WINDOW_DAYS nothing is offered
+  far = now + timedelta(days=waitlist.WINDOW_DAYS + 1)
+  assert asyncio.run(waitlist._free_slots(PROVIDER, [(far, far + HALF_HOUR)], now)) == []
+
+def test_notify_collects_windows_per_provider(monkeypatch):
+  monkeypatch.setattr(waitlist, "_pending", {})
+  waitlist.notify([])
+  assert waitlist._pending == {}
+  waitlist.notify([slot(9), slot(11)])
+  assert waitlist._pending == {PROVIDER: [(tomorrow(9), tomorrow(9, 30)), (tomorrow(11), tomorrow(11, 30))]}
+
+def _join(n: int) -> list[dict]:
+  now = datetime.now(timezone.utc)
+  return [
+    {"provider_id": PROVIDER, "notes": "", "status": waitlist.WAITING,
+     "created_at": now + timedelta(seconds=i),
+     "patient": {"name": f"P{i}", "email": f"p{i}@example.com", "preferences": {}, "conditions": ""}}
+    for i in range(n)
+  ]
+
+@pytest.fixture
+def clinic(mongo_db):
+  from app import db
+  from app.provider_registry import registry
+  registry._rebuild([{"_id": 1, "id": PROVIDER, "name": "Dr Test", "specialties": []}])
+
+  async def seed(slots: list[dict], patients: int):
+    await db.ensure_indexes()
+    await waitlist.ensure_indexes()
+    if slots:
+      await db.mongo.availability.insert_many([dict(s) for s in slots])
+    await waitlist.entries.insert_many(_join(patients))
+
+  yield seed
+  registry._rebuild([])
+
+def test_fill_books_only_opened_slots(clinic):
+  from app import db
+
+  async def scenario():
+    await clinic([slot(9), slot(10), slot(11)], patients=2)
+    results = await waitlist.fill({PROVIDER: [(tomorrow(10), tomorrow(10, 30))]})
+    statuses = sorted(e["status"] async for e in waitlist.entries.find())
+    return results, statuses, await db.mongo.availability.count_documents({})
+
+  results, statuses, left = asyncio.run(scenario())
+  assert [r["start"] for r in results if r["appointment_id"]] == [tomorrow(10)]
+  assert statuses == [waitlist.BOOKED, waitlist.WAITING]
+  assert left == 2
+
+def test_booked_entries_never_requeued(clinic, monkeypatch):
+  from app import db
+
+  async def fail_once(token, booked):
+    monkeypatch.setattr(waitlist, "_mark_booked", real)
+    raise RuntimeError("lost the connection")
+  real = waitlist._mark_booked
+  monkeypatch.setattr(waitlist, "_mark_booked", fail_once)
+
+  async def scenario():
+    await clinic([slot(9), slot(10)], patients=1)
+    opened = {PROVIDER: [(tomorrow(9), tomorrow(10, 30))]}
+    with pytest.raises(RuntimeError):
+      await waitlist.fill(opened)
+    # the committed booking is not put back in the queue...
+    entry = await waitlist.entries.find_one()
+    assert entry["status"] == waitlist.FILLING
+    # ...and once its lease lapses the next pass settles it instead of rebooking
+    await waitlist.entries.update_one({}, {"$set": {"fill_until": datetime.now(timezone.utc)}})
+    results = await waitlist.fill(opened)
+    entry = await waitlist.entries.find_one()
+    return results, entry, await db.mongo.appointments.count_documents({})
+
+  results, entry, appointments = asyncio.run(scenario())
+  assert results == []
+  assert entry["status"] == waitlist.BOOKED and entry["appointment_id"]
+  assert appointments == 1